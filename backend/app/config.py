@@ -3,6 +3,8 @@ Application configuration using environment variables.
 Uses OpenRouter as the AI provider.
 """
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -16,6 +18,62 @@ class Settings(BaseSettings):
     # OpenRouter
     openrouter_api_key: str
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    # Embedding model until the first re-embed swap; after that the model the
+    # swap recorded (embedding_config) is used, re-read every cache_seconds
+    embed_model: str = "intfloat/e5-large-v2"
+    embed_model_cache_seconds: int = 30
+
+    # Embedding search: query wire format to the match RPCs ("json", or base64
+    # "f32"/"f16") and index ("vector" exact HNSW, "halfvec" float16 HNSW or
+    # "binary" hamming HNSW; the quantized ones over-fetch rerank_factor x
+    # limit candidates and re-rank them on the float32 vectors)
+    embedding_wire_encoding: Literal["json", "f32", "f16"] = "json"
+    embedding_index_mode: Literal["vector", "halfvec", "binary"] = "vector"
+    embedding_rerank_factor: int = 8
+
+    # HNSW: build parameters for the embedding indexes (passed as -v m= and
+    # -v ef_construction= to supabase/scripts/build_embedding_indexes.sql)
+    # and the per-query ef_search, which scales with the number of
+    # candidates a query needs (limit, or limit x rerank_factor) and is
+    # clamped to [min, max].
+    # Filtered searches scan iteratively, visiting at most max_scan_tuples
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search_factor: float = 2.0
+    hnsw_ef_search_min: int = 40
+    hnsw_ef_search_max: int = 1000
+    hnsw_max_scan_tuples: int = 20000
+
+    # Search re-ranking: POST /search fetches limit x overfetch_factor (at most
+    # max_candidates) neighbors and orders them by a weighted composite of
+    # interest similarity, ideological diversity and proximity
+    # (app.core.ranking). Weight overrides are JSON, e.g.
+    # {"interest_similarity": 0.6, "geographic": 0.2}, merged over the defaults
+    search_rerank_enabled: bool = True
+    search_overfetch_factor: int = 5
+    search_max_candidates: int = 300
+    search_harmony_weights: dict[str, float] = {}
+    search_contrast_weights: dict[str, float] = {}
+    search_geo_scale_km: float = 500.0  # proximity = exp(-km / scale)
+    # MMR diversity over the best limit x mmr_pool_factor re-ranked candidates
+    # (0 = composite order, the default: MMR loads the whole pool with
+    # embeddings; SearchRequest.diversity overrides per request).
+    # Pairwise similarity blends embedding cosine with geographic closeness
+    search_mmr_diversity: float = 0.0
+    search_mmr_pool_factor: int = 3
+    search_mmr_geo_weight: float = 0.3
+    search_mmr_geo_scale_km: float = 25.0
+
+    # Map tiles: individual markers above map_cluster_max_zoom (up to
+    # map_tile_max_markers per tile), grid clusters of map_cluster_grid cells
+    # per tile side below it; Cache-Control max-age for tile responses
+    map_cluster_max_zoom: int = 9
+    map_cluster_grid: int = 32
+    map_tile_max_markers: int = 5000
+    map_tile_max_age_seconds: int = 60
+    # Serve cluster tiles from the Redis pyramid (python -m app.core.map_clusters
+    # --rebuild) and keep it updated on profile writes
+    map_clusters_enabled: bool = True
 
     # Spotify (optional)
     spotipy_client_id: str = ""
@@ -47,8 +105,68 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://localhost:6379"
 
+    # Background profile jobs (python -m app.core.jobs runs the worker)
+    profile_jobs_enabled: bool = False  # default for ?background= on pipeline routes
+    profile_job_concurrency: int = 4  # pipelines (LLM calls) in flight per worker
+    profile_job_ttl_seconds: int = 86400
+    # Liveness of a worker (its claimed jobs are requeued after 3 missed
+    # beats) and how many claims a job gets before it is failed
+    profile_job_heartbeat_seconds: int = 10
+    profile_job_max_attempts: int = 3
+
+    # Profile pipeline: reuse platform data fetched within this window (0 = always refetch)
+    platform_data_max_age_seconds: int = 0
+
+    # Per-(user, provider) platform interest cache in Redis, TTLs in seconds
+    platform_cache_enabled: bool = True
+    platform_cache_ttl_youtube: int = 6 * 3600
+    platform_cache_ttl_steam: int = 3600
+    platform_cache_ttl_discord: int = 6 * 3600
+    platform_cache_ttl_github: int = 6 * 3600
+
+    # YouTube: items per list (subscriptions, likes), pages per list, and a
+    # per-user daily quota budget in API units (0 = unlimited)
+    youtube_max_results: int = 10
+    youtube_max_pages: int = 1
+    youtube_user_daily_quota: int = 0
+
+    # Proactive OAuth token refresh (runs in the job worker)
+    token_refresh_enabled: bool = True
+    token_refresh_interval_seconds: int = 300  # how often to scan oauth_accounts
+    token_refresh_window_seconds: int = 900  # refresh tokens expiring within this
+    token_refresh_batch_size: int = 100
+    token_refresh_concurrency: int = 8
+    token_refresh_provider_concurrency: int = 4  # per-provider cap within a pass
+    token_refresh_lock_timeout_seconds: int = 15  # wait for another refresh
+    token_refresh_lock_ttl_seconds: int = 30
+
+    # Color new profiles by the nearest stored embedding centroid (learned by
+    # python -m app.core.cluster_centroids); keywords are used while none exist
+    cluster_centroids_enabled: bool = True
+    cluster_centroids_cache_seconds: int = 300
+
+    # Similarity summaries: shared interests are found and described locally;
+    # the LLM writes the sentence only when nothing is shared, or rewords the
+    # templated one when polish is enabled
+    similarity_summary_llm_polish: bool = False
+    similarity_summary_fuzzy_threshold: float = 0.6  # trigram similarity
+
+    # Analytics rollups: refresh from the job worker (when pg_cron does not
+    # run refresh_analytics) and Cache-Control max-age of /analytics responses
+    analytics_refresh_enabled: bool = False
+    analytics_refresh_interval_seconds: int = 300
+    analytics_max_age_seconds: int = 60
+
+    # Single-flight dedup of pipeline runs, token refreshes and similarity
+    # summaries; Redis mode also dedups across workers
+    singleflight_redis_enabled: bool = False
+    singleflight_wait_timeout_seconds: int = 120
+    singleflight_result_ttl_seconds: int = 10
+
     # App settings
     debug: bool = False
+    # Root log level for the API process (tracing logs one INFO line per request)
+    log_level: str = "INFO"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,60 @@
+"""
+Scheduled refresh of the analytics rollups (GET /analytics/*).
+
+``refresh_analytics()`` in the database does the work: it drains the
+queues that triggers fill on message inserts and profile / interest writes
+(supabase/migrations/015_incremental_analytics.sql) into the rollups, so a
+run costs what changed since the last one. Where pg_cron is installed the migration schedules it
+there; otherwise enable ANALYTICS_REFRESH_ENABLED and the job worker calls
+it every ``analytics_refresh_interval_seconds``. Overlapping runs skip
+(advisory lock), so both at once is harmless.
+
+  python -m app.core.analytics_refresher            # loop forever
+  python -m app.core.analytics_refresher --once     # one refresh, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+
+from app.config import settings
+from app.db.supabase_client import refresh_analytics
+
+logger = logging.getLogger(__name__)
+
+
+def run_scheduler(
+    interval_seconds: int | None = None, stop: threading.Event | None = None
+) -> None:
+    """Refresh the rollups every ``interval_seconds`` until ``stop`` is set."""
+    interval_seconds = interval_seconds or settings.analytics_refresh_interval_seconds
+    stop = stop or threading.Event()
+    logger.info("Analytics refresher started (every %ss)", interval_seconds)
+    while not stop.is_set():
+        try:
+            logger.info("Analytics refresh: %s", refresh_analytics())
+        except Exception:
+            logger.exception("Analytics refresh failed")
+        stop.wait(interval_seconds)
+
+
+def start_scheduler_thread(stop: threading.Event) -> threading.Thread:
+    thread = threading.Thread(
+        target=run_scheduler, kwargs={"stop": stop}, name="analytics-refresher", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the analytics rollups.")
+    parser.add_argument("--once", action="store_true", help="Refresh once and exit")
+    parser.add_argument("--interval", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        print(refresh_analytics())
+    else:
+        run_scheduler(args.interval)
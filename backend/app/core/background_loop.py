@@ -0,0 +1,82 @@
+"""
+A long-lived asyncio event loop on a daemon thread.
+
+Sync code (routes, the profile pipeline, job workers) uses this to run async
+integration clients without paying for ``asyncio.run`` per call, and so that
+pooled ``httpx.AsyncClient`` connections survive between calls. Coroutines
+run with a copy of the caller's contextvars, so tracing spans still land on
+the request that started them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="background-loop", daemon=True
+                )
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+    """Schedule ``coro`` on the background loop in the caller's context."""
+    loop = get_loop()
+    future: concurrent.futures.Future[T] = concurrent.futures.Future()
+
+    def _start() -> None:
+        task = loop.create_task(coro)
+
+        def _done(t: asyncio.Task[T]) -> None:
+            if t.cancelled():
+                future.cancel()
+            elif t.exception() is not None:
+                future.set_exception(t.exception())  # type: ignore[arg-type]
+            else:
+                future.set_result(t.result())
+
+        task.add_done_callback(_done)
+
+    # Tasks inherit the context current when they are created, so creating
+    # the task inside a callback run under the copied context propagates it.
+    loop.call_soon_threadsafe(_start, context=contextvars.copy_context())
+    return future
+
+
+def run_sync(coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+    """Run ``coro`` on the background loop and block for its result."""
+    if _loop is not None and _running_loop() is _loop:
+        raise RuntimeError("run_sync() called from the background loop itself")
+    return submit(coro).result(timeout=timeout)
+
+
+async def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Await ``coro`` on the background loop from another event loop."""
+    if _running_loop() is get_loop():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
@@ -0,0 +1,333 @@
+"""
+Marker colors from embedding centroids.
+
+An offline job learns ``k`` centroids with spherical mini-batch k-means over
+the profile embeddings, which is the cosine space matching runs in. The
+embeddings are streamed from ``profiles`` in keyset pages, so memory stays at
+one page plus the centroids. A final pass assigns every profile and labels
+each centroid with an ``InterestCluster`` from the keyword scores of its
+members (``app.core.clusters``); with exactly one centroid per cluster the
+labeling is the one-to-one match with the most keyword mass. The centroids
+are stored in ``cluster_centroids`` (supabase/migrations/013_cluster_centroids.sql)
+and changed marker colors are written in batches.
+
+``run_profile_pipeline`` then colors a new profile with one (k x dims)
+matrix-vector product against the stored centroids, cached per process,
+falling back to keywords while no centroids exist for the current
+embedding model.
+
+  python -m app.core.cluster_centroids --epochs 3 --batch-size 1024
+  python -m app.core.cluster_centroids --k 8 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.core.clusters import (
+    CLUSTER_ORDER,
+    DEFAULT_CLUSTER,
+    cluster_for_color,
+    profile_pages,
+    score_interests,
+    write_marker_colors,
+)
+from app.core.embedding_codec import as_vector
+from app.core.openrouter_logic import embed_model
+from app.db.supabase_client import get_cluster_centroids, replace_cluster_centroids
+from app.models.schemas import CLUSTER_COLORS, InterestCluster
+
+logger = logging.getLogger(__name__)
+
+INIT_SAMPLE = 20_000
+
+
+@dataclass
+class Centroids:
+    """Unit-norm centroids and the cluster each one colors."""
+
+    vectors: np.ndarray  # (k, dims) float32
+    clusters: list[InterestCluster]
+    model: str
+
+    def assign(self, embeddings: np.ndarray) -> np.ndarray:
+        """Index of the nearest (cosine) centroid per row."""
+        return np.argmax(_unit(embeddings) @ self.vectors.T, axis=-1)
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _embedding_batches(
+    page_size: int, batch_size: int
+) -> Iterable[tuple[list[dict[str, Any]], np.ndarray]]:
+    """(rows, unit embeddings) mini-batches over every profile with an embedding."""
+    for page in profile_pages(page_size, with_embeddings=True):
+        rows, vectors = [], []
+        for row in page:
+            vector = as_vector(row.get("embedding"))
+            if vector is not None:
+                rows.append(row)
+                vectors.append(vector)
+        for i in range(0, len(rows), batch_size):
+            yield rows[i : i + batch_size], _unit(np.asarray(vectors[i : i + batch_size]))
+
+
+def kmeans_plus_plus(sample: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding on unit vectors with cosine distance."""
+    centers = [sample[rng.integers(len(sample))]]
+    distance = 1 - sample @ centers[0]
+    for _ in range(1, k):
+        weights = np.clip(distance, 0, None)
+        total = weights.sum()
+        if total > 0:
+            index = rng.choice(len(sample), p=weights / total)
+        else:
+            index = rng.integers(len(sample))
+        centers.append(sample[index])
+        distance = np.minimum(distance, 1 - sample @ sample[index])
+    return np.stack(centers)
+
+
+def minibatch_kmeans(
+    batches: Callable[[], Iterable[np.ndarray]],
+    k: int,
+    *,
+    epochs: int = 3,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical mini-batch k-means (Sculley 2010) over unit vectors.
+
+    ``batches()`` streams the data once and is called once per epoch; the
+    first batches (up to ``INIT_SAMPLE`` rows) also seed k-means++.
+    Returns (unit centroids, rows seen per centroid).
+    """
+    rng = np.random.default_rng(seed)
+    iterator = iter(batches())
+    seed_rows: list[np.ndarray] = []
+    held = 0
+    for batch in iterator:
+        seed_rows.append(batch)
+        held += len(batch)
+        if held >= INIT_SAMPLE:
+            break
+    if held < k:
+        raise ValueError(f"need at least {k} embeddings, found {held}")
+    centers = kmeans_plus_plus(np.concatenate(seed_rows)[:INIT_SAMPLE], k, rng)
+    counts = np.zeros(k, dtype=np.float64)
+
+    def step(batch: np.ndarray) -> None:
+        labels = np.argmax(batch @ centers.T, axis=1)
+        sizes = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+        hit = sizes > 0
+        counts[hit] += sizes[hit]
+        # Per-center learning rate n/count moves each center to the running mean.
+        eta = (sizes[hit] / counts[hit])[:, None].astype(np.float32)
+        centers[hit] = (1 - eta) * centers[hit] + eta * (sums[hit] / sizes[hit][:, None])
+        centers[hit] = _unit(centers[hit])
+
+    for batch in itertools.chain(seed_rows, iterator):
+        step(batch)
+    for _ in range(epochs - 1):
+        for batch in batches():
+            step(batch)
+    return centers, counts
+
+
+def label_centroids(mass: np.ndarray, fallback: Sequence[InterestCluster]) -> list[InterestCluster]:
+    """Cluster per centroid from its members' keyword mass, (k, clusters).
+
+    One centroid per cluster: the one-to-one assignment with the most mass
+    (every color is used). Otherwise each centroid takes its dominant
+    cluster; centroids without any keyword mass keep ``fallback``.
+    """
+    k, n = mass.shape
+    share = mass / np.maximum(mass.sum(axis=1, keepdims=True), 1e-9)
+    if k == n:
+        best = max(itertools.permutations(range(n)), key=lambda p: share[np.arange(k), p].sum())
+        return [CLUSTER_ORDER[j] for j in best]
+    return [
+        CLUSTER_ORDER[int(np.argmax(share[i]))] if mass[i].sum() > 0 else fallback[i]
+        for i in range(k)
+    ]
+
+
+def train(
+    *,
+    k: int = len(CLUSTER_ORDER),
+    epochs: int = 3,
+    batch_size: int = 1024,
+    page_size: int = 5000,
+    seed: int = 0,
+    write_batch_size: int = 1000,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """Learn centroids, store them and recolor every profile."""
+    started = time.perf_counter()
+
+    def batches() -> Iterable[np.ndarray]:
+        return (vectors for _, vectors in _embedding_batches(page_size, batch_size))
+
+    vectors, seen = minibatch_kmeans(batches, k, epochs=epochs, seed=seed)
+
+    # Final pass: assign everyone, gather keyword mass and current colors per centroid.
+    mass = np.zeros((k, len(CLUSTER_ORDER)), dtype=np.float64)
+    current: list[Counter] = [Counter() for _ in range(k)]
+    members = np.zeros(k, dtype=np.int64)
+    assigned: list[tuple[str, str | None, int]] = []
+    for rows, unit in _embedding_batches(page_size, batch_size):
+        labels = np.argmax(unit @ vectors.T, axis=1)
+        for row, label in zip(rows, labels):
+            interests = row.get("all_interests")
+            scores = score_interests(interests if isinstance(interests, list) else [])
+            if scores.sum() > 0:
+                mass[label] += scores / scores.sum()
+            current[label][cluster_for_color(row.get("marker_color")) or DEFAULT_CLUSTER] += 1
+            assigned.append((row["id"], row.get("marker_color"), int(label)))
+        members += np.bincount(labels, minlength=k)
+
+    clusters = label_centroids(
+        mass, [c.most_common(1)[0][0] if c else DEFAULT_CLUSTER for c in current]
+    )
+    changes = [
+        {"id": user_id, "marker_color": CLUSTER_COLORS[clusters[label]]}
+        for user_id, color, label in assigned
+        if (color or "").upper() != CLUSTER_COLORS[clusters[label]]
+    ]
+
+    written = 0
+    if not dry_run:
+        replace_cluster_centroids(
+            [
+                {
+                    "idx": i,
+                    "cluster": clusters[i].value,
+                    "marker_color": CLUSTER_COLORS[clusters[i]],
+                    "centroid": vectors[i].tolist(),
+                    "members": int(members[i]),
+                    "embed_model": embed_model(),
+                }
+                for i in range(k)
+            ]
+        )
+        _cache.clear()
+        written = write_marker_colors(changes, write_batch_size)
+
+    result = {
+        "profiles": len(assigned),
+        "k": k,
+        "centroids": [
+            {"cluster": clusters[i].value, "members": int(members[i]), "seen": int(seen[i])}
+            for i in range(k)
+        ],
+        "changed": len(changes),
+        "written": written,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info("Cluster centroids: %s", result)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Online assignment
+# ---------------------------------------------------------------------------
+
+
+class _CentroidCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value: Centroids | None = None
+        self._loaded_at = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def get(self) -> Centroids | None:
+        with self._lock:
+            if time.monotonic() - self._loaded_at < settings.cluster_centroids_cache_seconds:
+                return self._value
+            model = embed_model()
+            rows = get_cluster_centroids(model)
+            self._value = (
+                Centroids(
+                    vectors=_unit(
+                        np.asarray([as_vector(r["centroid"]) for r in rows], dtype=np.float32)
+                    ),
+                    clusters=[InterestCluster(r["cluster"]) for r in rows],
+                    model=model,
+                )
+                if rows
+                else None
+            )
+            self._loaded_at = time.monotonic()
+            return self._value
+
+
+_cache = _CentroidCache()
+
+
+def nearest_cluster(embedding: Sequence[float] | str | None) -> InterestCluster | None:
+    """Cluster of the nearest stored centroid, None when there are none to use.
+
+    ``embedding`` may be a float sequence or pgvector text.
+    """
+    if not settings.cluster_centroids_enabled:
+        return None
+    embedding = as_vector(embedding)
+    if not embedding:
+        return None
+    try:
+        centroids = _cache.get()
+    except Exception as exc:
+        logger.warning("Loading cluster centroids failed: %s", exc)
+        return None
+    if centroids is None:
+        return None
+    if centroids.vectors.shape[1] != len(embedding):
+        logger.warning(
+            "Embedding has %d dims, stored centroids %d; using keywords",
+            len(embedding),
+            centroids.vectors.shape[1],
+        )
+        return None
+    return centroids.clusters[int(centroids.assign(np.asarray(embedding)))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn embedding centroids for marker colors.")
+    parser.add_argument("--k", type=int, default=len(CLUSTER_ORDER), help="Number of centroids")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1024, help="Rows per k-means step")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    print(
+        train(
+            k=args.k,
+            epochs=args.epochs,
+            batch_size=args.batch_size,
+            page_size=args.page_size,
+            seed=args.seed,
+            write_batch_size=args.write_batch_size,
+            dry_run=args.dry_run,
+        )
+    )
@@ -0,0 +1,358 @@
+"""
+Interest cluster (marker color) assignment.
+
+Every ``InterestCluster`` is scored at once. A single compiled regex with
+word boundaries finds all cluster keywords in an interest ("ai" no longer
+matches "rain", nor "dev" "device"), and tagged platform interests count
+toward their obvious cluster even without a keyword (a "Recently played:"
+title is a game, a GitHub language is tech). Each interest adds at most one
+point per cluster, so a single long string cannot outvote the rest. The
+highest score wins; ties go to the earlier cluster in ``CLUSTER_ORDER``.
+
+Profiles with no keyword signal get a fallback: in the pipeline, the
+profile's current cluster (else ``DEFAULT_CLUSTER``); in the batch job, the
+nearest centroid of the embeddings of the profiles that did match.
+
+Recolor every profile after a taxonomy change (profiles are streamed page
+by page and only changed colors are written, in batched RPCs; the map
+cluster pyramid is rebuilt afterwards):
+
+  python -m app.core.clusters --dry-run
+  python -m app.core.clusters --batch-size 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.core.embedding_codec import as_vector
+from app.core.similarity_summary import parse_interest
+from app.db.supabase_client import get_profile_clusters_page, set_marker_colors
+from app.models.schemas import CLUSTER_COLORS, InterestCluster
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_ORDER: tuple[InterestCluster, ...] = tuple(InterestCluster)
+DEFAULT_CLUSTER = InterestCluster.TECH_DEV
+
+# Normalized (see similarity_summary.normalize) keywords; a plural "s"/"es"
+# is also matched.
+CLUSTER_KEYWORDS: dict[InterestCluster, tuple[str, ...]] = {
+    InterestCluster.TECH_DEV: (
+        "code", "coding", "coder", "programming", "programmer", "developer",
+        "development", "dev", "software", "engineer", "engineering", "ai",
+        "artificial intelligence", "machine learning", "ml", "data science", "tech",
+        "technology", "computer science", "python", "javascript", "typescript",
+        "rust", "golang", "java", "linux", "open source", "web development",
+        "startup", "robotics", "hackathon", "cybersecurity", "llm",
+    ),
+    InterestCluster.CREATIVE_ARTS: (
+        "art", "artist", "design", "designer", "music", "musician", "creative",
+        "photo", "photography", "film", "filmmaking", "cinema", "painting",
+        "drawing", "illustration", "animation", "writing", "poetry", "guitar",
+        "piano", "singing", "dance", "theatre", "theater", "fashion", "sculpture",
+        "ceramics", "concert",
+    ),
+    InterestCluster.GAMING: (
+        "game", "gaming", "gamer", "esports", "steam", "video game", "nintendo",
+        "playstation", "xbox", "minecraft", "fortnite", "league of legends",
+        "valorant", "counter strike", "speedrun", "twitch", "rpg", "mmo", "fps",
+    ),
+    InterestCluster.FITNESS: (
+        "fitness", "gym", "workout", "run", "running", "runner", "marathon", "yoga",
+        "sport", "calisthenics", "weightlifting", "powerlifting", "bodybuilding",
+        "crossfit", "cycling", "swimming", "hiking", "climbing", "bouldering",
+        "soccer", "football", "basketball", "tennis", "martial arts", "boxing",
+        "pilates", "nutrition", "strava", "hevy",
+    ),
+}
+
+# Platform interest kinds (similarity_summary.PREFIX_KINDS) that imply a cluster.
+KIND_CLUSTERS = {
+    "game": InterestCluster.GAMING,
+    "language": InterestCluster.TECH_DEV,
+    "repo": InterestCluster.TECH_DEV,
+}
+
+_CLUSTER_INDEX = {cluster: i for i, cluster in enumerate(CLUSTER_ORDER)}
+_KEYWORD_CLUSTER = {
+    keyword: _CLUSTER_INDEX[cluster]
+    for cluster, keywords in CLUSTER_KEYWORDS.items()
+    for keyword in keywords
+}
+_KEYWORD_RE = re.compile(
+    r"\b("
+    + "|".join(re.escape(k) for k in sorted(_KEYWORD_CLUSTER, key=len, reverse=True))
+    + r")(?:e?s)?\b"
+)
+_COLOR_CLUSTER = {color: cluster for cluster, color in CLUSTER_COLORS.items()}
+
+
+def cluster_for_color(color: str | None) -> InterestCluster | None:
+    return _COLOR_CLUSTER.get((color or "").upper())
+
+
+@lru_cache(maxsize=1 << 16)
+def _interest_hits(raw: str) -> np.ndarray:
+    """Read-only 0/1 row (``CLUSTER_ORDER``) of the clusters one interest hits."""
+    hits = np.zeros(len(CLUSTER_ORDER), dtype=np.float32)
+    interest = parse_interest(raw)
+    if interest is not None:
+        for m in _KEYWORD_RE.finditer(interest.key):
+            hits[_KEYWORD_CLUSTER[m.group(1)]] = 1
+        if interest.kind in KIND_CLUSTERS:
+            hits[_CLUSTER_INDEX[KIND_CLUSTERS[interest.kind]]] = 1
+    hits.setflags(write=False)
+    return hits
+
+
+def score_interests(interests: Iterable[str]) -> np.ndarray:
+    """Per-cluster scores (``CLUSTER_ORDER``) of one interest list."""
+    scores = np.zeros(len(CLUSTER_ORDER), dtype=np.float32)
+    for raw in interests:
+        scores += _interest_hits(raw)
+    return scores
+
+
+def score_batch(interest_lists: Sequence[Iterable[str]]) -> np.ndarray:
+    """(n, clusters) score matrix for many profiles.
+
+    Each distinct interest string is matched once (and cached across
+    batches); the per-profile sums are one scatter-add.
+    """
+    rows: list[int] = []
+    codes: list[int] = []
+    distinct: dict[str, int] = {}
+    for row, interests in enumerate(interest_lists):
+        for raw in interests:
+            rows.append(row)
+            codes.append(distinct.setdefault(raw, len(distinct)))
+    scores = np.zeros((len(interest_lists), len(CLUSTER_ORDER)), dtype=np.float32)
+    if distinct:
+        hits = np.stack([_interest_hits(raw) for raw in distinct])
+        np.add.at(scores, np.asarray(rows), hits[np.asarray(codes)])
+    return scores
+
+
+def best_clusters(scores: np.ndarray) -> np.ndarray:
+    """Index into ``CLUSTER_ORDER`` per row, -1 where nothing matched."""
+    best = np.argmax(scores, axis=1)  # first maximum, i.e. CLUSTER_ORDER breaks ties
+    return np.where(scores.max(axis=1) > 0, best, -1)
+
+
+def choose_cluster(
+    interests: list[str], default: InterestCluster = DEFAULT_CLUSTER
+) -> InterestCluster:
+    """Highest-scoring cluster for one profile, ``default`` without any signal."""
+    scores = score_interests(interests)
+    return CLUSTER_ORDER[int(np.argmax(scores))] if scores.max() > 0 else default
+
+
+def _unit_rows(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    unit = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(unit, axis=1)
+    return unit / np.where(norms == 0, 1, norms)[:, None], norms
+
+
+def centroid_sums(labels: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+    """(clusters, dims) sums of the unit ``embeddings`` of rows with a label."""
+    unit, _ = _unit_rows(embeddings)
+    sums = np.zeros((len(CLUSTER_ORDER), unit.shape[1]), dtype=np.float32)
+    known = labels >= 0
+    np.add.at(sums, labels[known], unit[known])
+    return sums
+
+
+def assign_clusters(
+    interest_lists: Sequence[Iterable[str]],
+    embeddings: np.ndarray | None = None,
+    defaults: Sequence[InterestCluster | None] | None = None,
+    sums: np.ndarray | None = None,
+) -> list[InterestCluster]:
+    """Clusters for a batch of profiles.
+
+    Rows without keyword signal go to the nearest (cosine) centroid, from
+    ``sums`` (see ``centroid_sums``) or else the ``embeddings`` of rows in
+    this batch that have one; rows with neither (all-zero embedding) keep
+    their entry in ``defaults``, else ``DEFAULT_CLUSTER``.
+    """
+    labels = best_clusters(score_batch(interest_lists))
+    if embeddings is not None and len(labels):
+        unit, norms = _unit_rows(embeddings)
+        if sums is None:
+            sums = centroid_sums(labels, unit)
+        missing = (labels < 0) & (norms > 0)
+        present = np.flatnonzero(np.linalg.norm(sums, axis=1) > 0)
+        if present.size and missing.any():
+            centroids, _ = _unit_rows(sums[present])
+            labels[missing] = present[np.argmax(unit[missing] @ centroids.T, axis=1)]
+    return [
+        CLUSTER_ORDER[label]
+        if label >= 0
+        else (defaults[i] if defaults is not None and defaults[i] else DEFAULT_CLUSTER)
+        for i, label in enumerate(labels)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Offline recolor
+# ---------------------------------------------------------------------------
+
+
+def profile_pages(page_size: int, with_embeddings: bool) -> Iterable[list[dict[str, Any]]]:
+    """Every profile's (id, marker_color, all_interests[, embedding]), a page at a time."""
+    after_id = None
+    while True:
+        page = get_profile_clusters_page(
+            after_id, limit=page_size, with_embedding=with_embeddings
+        )
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]["id"]
+
+
+def page_interests(page: list[dict[str, Any]]) -> list[list[str]]:
+    return [
+        value if isinstance(value := row.get("all_interests"), list) else [] for row in page
+    ]
+
+
+def page_embeddings(page: list[dict[str, Any]]) -> np.ndarray | None:
+    """(rows, dims) float32 embeddings of a page, zero rows where missing.
+
+    None when the page has no embeddings or mixes sizes (mid re-embed).
+    """
+    vectors = [as_vector(row.get("embedding")) for row in page]
+    dims = {len(v) for v in vectors if v is not None}
+    if len(dims) != 1:
+        if dims:
+            logger.warning("Mixed embedding sizes %s; skipping nearest-centroid fallback", dims)
+        return None
+    embeddings = np.zeros((len(page), dims.pop()), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            embeddings[i] = vector
+    return embeddings
+
+
+def refresh_map_clusters() -> None:
+    if settings.map_clusters_enabled:
+        # Imported here: map_clusters is only needed when colors changed.
+        from app.core.map_clusters import rebuild
+
+        rebuild()
+
+
+def write_marker_colors(
+    changes: list[dict[str, Any]], batch_size: int = 1000, refresh_map: bool = True
+) -> int:
+    """Write {"id", "marker_color"} rows in batched RPCs, then refresh the map clusters."""
+    written = 0
+    for i in range(0, len(changes), batch_size):
+        written += set_marker_colors(changes[i : i + batch_size])
+    if written and refresh_map:
+        refresh_map_clusters()
+    return written
+
+
+def keyword_centroid_sums(page_size: int) -> np.ndarray | None:
+    """``centroid_sums`` over every profile, streamed; None without embeddings."""
+    sums: np.ndarray | None = None
+    for page in profile_pages(page_size, with_embeddings=True):
+        embeddings = page_embeddings(page)
+        if embeddings is None:
+            continue
+        labels = best_clusters(score_batch(page_interests(page)))
+        page_sums = centroid_sums(labels, embeddings)
+        if sums is None:
+            sums = page_sums
+        elif sums.shape == page_sums.shape:
+            sums += page_sums
+        else:
+            logger.warning("Mixed embedding sizes; skipping nearest-centroid fallback")
+            return None
+    return sums
+
+
+def recolor_profiles(
+    *,
+    batch_size: int = 1000,
+    page_size: int = 5000,
+    use_embeddings: bool = True,
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """Reassign every profile's cluster and write the colors that changed.
+
+    Streams the profiles page by page, so memory stays at one page plus the
+    (clusters x dims) centroid sums. With embeddings, a first pass sums the
+    embeddings of keyword-matched profiles into the fallback centroids.
+    """
+    started = time.perf_counter()
+    sums = keyword_centroid_sums(page_size) if use_embeddings else None
+    profiles = changed = written = 0
+    counts: Counter = Counter()
+    for page in profile_pages(page_size, use_embeddings and sums is not None):
+        embeddings = page_embeddings(page) if sums is not None else None
+        if embeddings is not None and embeddings.shape[1] != sums.shape[1]:
+            embeddings = None
+        colors = [row.get("marker_color") for row in page]
+        clusters = assign_clusters(
+            page_interests(page), embeddings, [cluster_for_color(c) for c in colors], sums
+        )
+        changes = [
+            {"id": row["id"], "marker_color": CLUSTER_COLORS[cluster]}
+            for row, color, cluster in zip(page, colors, clusters)
+            if (color or "").upper() != CLUSTER_COLORS[cluster]
+        ]
+        profiles += len(page)
+        changed += len(changes)
+        counts.update(cluster.value for cluster in clusters)
+        if not dry_run:
+            written += write_marker_colors(changes, batch_size, refresh_map=False)
+
+    if written:
+        refresh_map_clusters()
+
+    result = {
+        "profiles": profiles,
+        "changed": changed,
+        "written": written,
+        "clusters": dict(counts),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info("Recolor: %s", result)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute every profile's marker color.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per update RPC")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument(
+        "--no-embeddings",
+        action="store_true",
+        help="Skip the nearest-centroid fallback (profiles without keywords get the default)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    print(
+        recolor_profiles(
+            batch_size=args.batch_size,
+            page_size=args.page_size,
+            use_embeddings=not args.no_embeddings,
+            dry_run=args.dry_run,
+        )
+    )
@@ -0,0 +1,44 @@
+"""
+Compact wire encoding for embeddings.
+
+A 1024-dim embedding as a JSON float list is ~20 KB; as base64 of
+little-endian float32 it is ~5.5 KB, and ~2.7 KB as float16. The compact
+match RPCs (supabase/migrations/006_compact_embeddings.sql) decode these with
+``decode_embedding(text, encoding)`` on the database side.
+
+PostgREST returns pgvector columns as "[0.1,0.2,...]" text; ``as_vector``
+turns that (or a float list) into a list, and ``encode_embedding`` accepts
+either form.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Sequence
+
+import numpy as np
+
+ENCODINGS = {"f32": "<f4", "f16": "<f2"}
+
+
+def as_vector(value: Any) -> list[float] | None:
+    """A vector column value (pgvector text or a sequence) as a float list, None if empty."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if value is None or len(value) == 0:
+        return None
+    return [float(x) for x in value]
+
+
+def encode_embedding(embedding: Sequence[float] | str, encoding: str = "f32") -> str:
+    """Base64 of the little-endian float32/float16 bytes of ``embedding``."""
+    dtype = ENCODINGS[encoding]
+    vector = as_vector(embedding) or []
+    return base64.b64encode(np.asarray(vector, dtype=dtype).tobytes()).decode("ascii")
+
+
+def decode_embedding(payload: str, encoding: str = "f32") -> list[float]:
+    """Inverse of ``encode_embedding``."""
+    dtype = ENCODINGS[encoding]
+    return np.frombuffer(base64.b64decode(payload), dtype=dtype).astype(np.float64).tolist()
@@ -0,0 +1,35 @@
+"""ETag / Cache-Control responses for cacheable endpoints."""
+
+from __future__ import annotations
+
+import hashlib
+
+from fastapi import Response
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def cacheable_response(
+    body: bytes,
+    *,
+    media_type: str,
+    max_age: int,
+    if_none_match: str | None = None,
+    private: bool = False,
+) -> Response:
+    """``body`` with a strong ETag; 304 when the client has it.
+
+    Public responses may be stored by CDNs. ``private`` ones (per-user or
+    authenticated data) only by the client's own cache.
+    """
+    scope = "private" if private else "public"
+    headers = {
+        "ETag": etag(body),
+        "Cache-Control": f"{scope}, max-age={max_age}, stale-while-revalidate={max_age * 5}",
+        "Vary": "Accept-Encoding, Authorization" if private else "Accept-Encoding",
+    }
+    if if_none_match and headers["ETag"] in {t.strip() for t in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,327 @@
+"""
+Redis-backed background jobs for the profile pipeline.
+
+/ingest, PUT /profile/interests and POST /profile/refresh can hand their work
+to a worker instead of running the pipeline (platform fetches, LLM summary,
+embedding) on the request thread. A job is a Redis hash ``job:{id}`` plus an
+entry on the ``jobs:profile`` list; workers pop ids, run the pipeline, write
+the profile and publish the outcome on the user's ``chat:{user_id}`` channel
+so an open WebSocket hears about it.
+
+Delivery is at-least-once. A worker claims an id with BLMOVE into its own
+``jobs:profile:processing:{worker}`` list and removes it only when the job
+is done, while a heartbeat key with a short TTL says the worker is alive.
+Every worker periodically (and at startup) moves the processing lists of
+workers whose heartbeat expired back onto the queue, so a crash or deploy
+mid-pipeline delays a job instead of losing it. A job that keeps taking
+its worker down is failed after ``profile_job_max_attempts`` claims.
+
+Run a worker with:
+  python -m app.core.jobs --concurrency 4
+
+The worker also runs the proactive OAuth token refresher
+(app.core.token_refresher) unless TOKEN_REFRESH_ENABLED=false, and the
+analytics rollup refresh (app.core.analytics_refresher) when
+ANALYTICS_REFRESH_ENABLED=true.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+import redis
+
+from app.config import settings
+from app.core import analytics_refresher
+from app.core.profile_pipeline import ingest_profile, regenerate_profile
+from app.core.pubsub import get_redis_sync, publish_message_sync
+from app.core.token_refresher import start_scheduler_thread
+from app.core.tracing import span
+from app.db.supabase_client import get_profile_by_id
+from app.models.schemas import IngestRequest, ProfileJobResponse
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "jobs:profile"
+JOB_KEY_PREFIX = "job:"
+WORKERS_KEY = "jobs:profile:workers"
+PROCESSING_KEY = "jobs:profile:processing:{worker}"
+HEARTBEAT_KEY = "jobs:profile:heartbeat:{worker}"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _job_key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+def _decode(raw: dict[str, str]) -> dict[str, Any]:
+    job: dict[str, Any] = dict(raw)
+    for field in ("payload", "result"):
+        if job.get(field):
+            job[field] = json.loads(job[field])
+    return job
+
+
+def enqueue_job(kind: str, user_id: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """Store the job input and push it onto the queue. Returns the job record."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    record = {
+        "id": job_id,
+        "kind": kind,
+        "user_id": user_id,
+        "status": STATUS_QUEUED,
+        "payload": json.dumps(payload),
+        "created_at": _now(),
+        "updated_at": _now(),
+    }
+    client = get_redis_sync()
+    with span("redis", "enqueue_job"):
+        pipe = client.pipeline()
+        pipe.hset(_job_key(job_id), mapping=record)
+        pipe.expire(_job_key(job_id), settings.profile_job_ttl_seconds)
+        pipe.lpush(QUEUE_KEY, job_id)
+        pipe.execute()
+    return _decode(record)
+
+
+def get_job(job_id: str) -> dict[str, Any] | None:
+    """Fetch a job record, or None if unknown/expired."""
+    with span("redis", "get_job"):
+        raw = get_redis_sync().hgetall(_job_key(job_id))
+    return _decode(raw) if raw else None
+
+
+def to_job_response(job: dict[str, Any]) -> ProfileJobResponse:
+    return ProfileJobResponse(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        result=job.get("result"),
+        error=job.get("error"),
+        created_at=job.get("created_at"),
+        updated_at=job.get("updated_at"),
+    )
+
+
+def _update_job(job_id: str, **fields: Any) -> None:
+    mapping = {
+        k: json.dumps(v) if k == "result" else v
+        for k, v in fields.items()
+        if v is not None
+    }
+    mapping["updated_at"] = _now()
+    get_redis_sync().hset(_job_key(job_id), mapping=mapping)
+
+
+# ============================================================================
+# Handlers
+# ============================================================================
+
+
+def _run_ingest(user_id: str, payload: dict[str, Any]) -> dict[str, Any]:
+    request = IngestRequest.model_validate(payload["request"])
+    profile, result = ingest_profile(
+        user_id=user_id,
+        request=request,
+        interests=payload["interests"],
+        avatar_url=payload.get("avatar_url"),
+    )
+    return {"user_id": str(profile["id"]), "marker_color": result.marker_color}
+
+
+def _run_regenerate(user_id: str, payload: dict[str, Any]) -> dict[str, Any]:
+    profile = get_profile_by_id(user_id)
+    if not profile:
+        raise LookupError("Profile not found")
+    interests = payload.get("interests")
+    if interests is None:
+        interests = (profile.get("metadata") or {}).get("all_interests") or []
+    if not interests:
+        raise ValueError("No interests found")
+
+    result = regenerate_profile(
+        user_id=user_id,
+        profile=profile,
+        user_interests=interests,
+        avatar_url=payload.get("avatar_url"),
+    )
+    return {
+        "success": True,
+        "interests_count": len(result.all_interests),
+        "dna_string": result.dna_string,
+    }
+
+
+JOB_HANDLERS: dict[str, Callable[[str, dict[str, Any]], dict[str, Any]]] = {
+    "ingest": _run_ingest,
+    "update_interests": _run_regenerate,
+    "refresh": _run_regenerate,
+}
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+
+def run_job(job_id: str) -> None:
+    """Execute a single queued job and publish its outcome."""
+    job = get_job(job_id)
+    if not job:
+        logger.warning("Job %s expired before it could run", job_id)
+        return
+
+    attempts = get_redis_sync().hincrby(_job_key(job_id), "attempts", 1)
+    _update_job(job_id, status=STATUS_RUNNING)
+    user_id = job["user_id"]
+    try:
+        if attempts > settings.profile_job_max_attempts:
+            raise RuntimeError(f"Gave up after {attempts - 1} interrupted attempts")
+        result = JOB_HANDLERS[job["kind"]](user_id, job["payload"])
+    except Exception as exc:
+        logger.warning("Job %s (%s) failed: %s", job_id, job["kind"], exc)
+        _update_job(job_id, status=STATUS_FAILED, error=str(exc))
+        outcome: dict[str, Any] = {"status": STATUS_FAILED, "error": str(exc)}
+    else:
+        _update_job(job_id, status=STATUS_SUCCEEDED, result=result)
+        outcome = {"status": STATUS_SUCCEEDED, "result": result}
+
+    try:
+        publish_message_sync(
+            user_id,
+            {"type": "profile_job", "job_id": job_id, "kind": job["kind"], **outcome},
+        )
+    except redis.RedisError as exc:
+        logger.warning("Could not publish job %s outcome: %s", job_id, exc)
+
+
+def requeue_stale_jobs(client: redis.Redis | None = None) -> int:
+    """Put the claimed jobs of workers whose heartbeat expired back on the queue."""
+    client = client or get_redis_sync()
+    requeued = 0
+    for worker_id in client.smembers(WORKERS_KEY):
+        if client.exists(HEARTBEAT_KEY.format(worker=worker_id)):
+            continue
+        processing = PROCESSING_KEY.format(worker=worker_id)
+        # Onto the popping end, so interrupted jobs run next.
+        while (job_id := client.lmove(processing, QUEUE_KEY, "RIGHT", "RIGHT")) is not None:
+            if client.exists(_job_key(job_id)):
+                _update_job(job_id, status=STATUS_QUEUED)
+            requeued += 1
+        client.srem(WORKERS_KEY, worker_id)
+    if requeued:
+        logger.warning("Requeued %d jobs from stopped workers", requeued)
+    return requeued
+
+
+def _run_heartbeat(worker_id: str, stop: threading.Event) -> None:
+    """Keep ``worker_id`` alive and reclaim dead workers' jobs until ``stop``."""
+    client = get_redis_sync()
+    interval = settings.profile_job_heartbeat_seconds
+    while True:
+        try:
+            client.set(HEARTBEAT_KEY.format(worker=worker_id), _now(), ex=interval * 3)
+            requeue_stale_jobs(client)
+        except redis.RedisError as exc:
+            logger.warning("Job heartbeat failed: %s", exc)
+        if stop.wait(interval):
+            return
+
+
+def run_worker(
+    concurrency: int | None = None, stop: threading.Event | None = None
+) -> None:
+    """Pop jobs forever, running at most ``concurrency`` pipelines at once."""
+    concurrency = concurrency or settings.profile_job_concurrency
+    stop = stop or threading.Event()
+    client = get_redis_sync()
+    slots = threading.BoundedSemaphore(concurrency)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    processing = PROCESSING_KEY.format(worker=worker_id)
+    # Heartbeat before registering, so no other worker sees us as dead.
+    client.set(
+        HEARTBEAT_KEY.format(worker=worker_id),
+        _now(),
+        ex=settings.profile_job_heartbeat_seconds * 3,
+    )
+    client.sadd(WORKERS_KEY, worker_id)
+    heartbeat_stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_run_heartbeat,
+        args=(worker_id, heartbeat_stop),
+        name="job-heartbeat",
+        daemon=True,
+    )
+    heartbeat.start()
+    logger.info("Profile job worker %s started (concurrency=%d)", worker_id, concurrency)
+    if settings.token_refresh_enabled:
+        # Keep OAuth tokens fresh so pipeline runs never pay for a refresh.
+        start_scheduler_thread(stop)
+    if settings.analytics_refresh_enabled:
+        analytics_refresher.start_scheduler_thread(stop)
+
+    def _run_and_release(job_id: str) -> None:
+        try:
+            run_job(job_id)
+            client.lrem(processing, 1, job_id)
+        except redis.RedisError as exc:
+            # Left on the processing list: requeued if this worker dies.
+            logger.warning("Job %s not acknowledged: %s", job_id, exc)
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stop.is_set():
+                # Only take a job off the queue when a slot is free, so queued
+                # work stays visible to (and claimable by) other workers.
+                slots.acquire()
+                try:
+                    job_id = client.blmove(QUEUE_KEY, processing, 1, src="RIGHT", dest="LEFT")
+                except redis.RedisError as exc:
+                    slots.release()
+                    logger.warning("Job queue unavailable: %s", exc)
+                    stop.wait(1)
+                    continue
+                if job_id is None:
+                    slots.release()
+                    continue
+                pool.submit(_run_and_release, job_id)
+    finally:
+        # The pool has drained; anything still on the processing list was not
+        # acknowledged and is requeued once the heartbeat lapses.
+        heartbeat_stop.set()
+        heartbeat.join()
+        try:
+            if not client.llen(processing):
+                client.delete(HEARTBEAT_KEY.format(worker=worker_id))
+                client.srem(WORKERS_KEY, worker_id)
+        except redis.RedisError as exc:
+            logger.warning("Could not deregister worker %s: %s", worker_id, exc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the profile job worker.")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_worker(args.concurrency)
@@ -0,0 +1,52 @@
+"""Helpers for PostGIS location values returned by PostgREST."""
+
+from __future__ import annotations
+
+import struct
+
+
+def parse_location(location: str | dict | None) -> tuple[float, float] | None:
+    """Parse PostGIS EWKB hex string OR GeoJSON dict to (latitude, longitude) tuple."""
+    if not location:
+        return None
+
+    # Handle GeoJSON dict (typically returned by PostgREST 9+)
+    if isinstance(location, dict):
+        try:
+            coords = location.get("coordinates")
+            if coords and len(coords) >= 2:
+                # GeoJSON coordinates are [lon, lat]
+                return (float(coords[1]), float(coords[0]))
+        except (IndexError, ValueError, TypeError):
+            return None
+        return None
+
+    # Handle WKT string (e.g. "POINT(lon lat)")
+    if isinstance(location, str) and "POINT" in location:
+        try:
+            inner = location.split("(")[1].split(")")[0]
+            parts = inner.strip().split()
+            lon, lat = float(parts[0]), float(parts[1])
+            return (lat, lon)
+        except (IndexError, ValueError, AttributeError):
+            return None
+
+    # Handle WKB hex string
+    try:
+        # bytes.fromhex raises TypeError if input is not str
+        if isinstance(location, str):
+            wkb = bytes.fromhex(location)
+            if len(wkb) < 25:
+                return None
+            lon = struct.unpack_from("<d", wkb, 9)[0]
+            lat = struct.unpack_from("<d", wkb, 17)[0]
+            return (lat, lon)
+    except (ValueError, TypeError, struct.error):
+        pass
+
+    return None
+
+
+def to_wkt(latitude: float, longitude: float) -> str:
+    """Build the EWKT point string the profiles.location column expects."""
+    return f"SRID=4326;POINT({longitude} {latitude})"
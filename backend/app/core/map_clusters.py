@@ -0,0 +1,365 @@
+"""
+Precomputed marker clusters for the low-zoom map tiles.
+
+A grid pyramid over Web Mercator: at zoom ``z`` the world is split into
+``2**z * settings.map_cluster_grid`` cells per side, so every cell nests in
+exactly one cell of the zoom below and a tile covers ``map_cluster_grid``
+cells per side. Each cell keeps a point count, coordinate sums (for the mean
+position) and a histogram of ``marker_color``.
+
+Everything lives in Redis, one hash per (zoom, tile)::
+
+    map_clusters:{version}:{z}:{tx}:{ty}
+        "{cx}:{cy}:n"        point count
+        "{cx}:{cy}:lat"      sum of latitudes
+        "{cx}:{cy}:lon"      sum of longitudes
+        "{cx}:{cy}:c:{hex}"  points with that marker color ("-" when unset)
+    map_clusters:{version}:points
+        user_id -> "lat,lon,color", the contribution each profile made
+
+so serving a tile is one HGETALL, O(clusters in the tile), and never touches
+the profiles table. ``rebuild`` streams profiles once (id, location,
+marker_color only) into a new version and then flips the version pointer.
+After that, the profile save paths (the pipeline and PATCH /profile) call
+``record_profile``, which moves the profile's contribution between cells
+atomically (a Lua compare-and-set against its stored point). Updates that land while a
+rebuild runs go to the old version; rebuild during quiet periods or run it
+twice.
+
+  python -m app.core.map_clusters --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+import numpy as np
+import redis
+
+from app.config import settings
+from app.core.location import parse_location
+from app.core.pubsub import get_redis_sync
+from app.core.tracing import traced
+from app.db.supabase_client import get_profile_markers_page
+
+logger = logging.getLogger(__name__)
+
+# The pointer is per grid layout, so changing MAP_CLUSTER_GRID/MAX_ZOOM falls
+# back to SQL clustering until the next rebuild.
+VERSION_KEY = "map_clusters:version:{grid}:{max_zoom}"
+TILE_KEY = "map_clusters:{version}:{z}:{tx}:{ty}"
+POINTS_KEY = "map_clusters:{version}:points"
+NO_COLOR = "-"
+MAX_MERCATOR_LAT = 85.0511287798
+REBUILD_PAGE_SIZE = 5000
+MAX_CAS_ATTEMPTS = 5
+
+# KEYS[1] = points hash; ARGV = user_id, expected old point ("" = none),
+# new point ("" = remove), JSON list of [tile key, cell, sign, lat, lon, color].
+_MOVE_POINT_LUA = """
+local current = redis.call('HGET', KEYS[1], ARGV[1]) or ''
+if current ~= ARGV[2] then
+    return 0
+end
+if ARGV[3] == '' then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+end
+for _, op in ipairs(cjson.decode(ARGV[4])) do
+    local key, cell, sign = op[1], op[2], op[3]
+    local n = redis.call('HINCRBY', key, cell .. ':n', sign)
+    local color = redis.call('HINCRBY', key, cell .. ':c:' .. op[6], sign)
+    if color <= 0 then
+        redis.call('HDEL', key, cell .. ':c:' .. op[6])
+    end
+    if n <= 0 then
+        redis.call('HDEL', key, cell .. ':n', cell .. ':lat', cell .. ':lon')
+    else
+        redis.call('HINCRBYFLOAT', key, cell .. ':lat', sign * op[4])
+        redis.call('HINCRBYFLOAT', key, cell .. ':lon', sign * op[5])
+    end
+end
+return 1
+"""
+
+_move_point_script: Any = None
+
+
+@dataclass
+class Cluster:
+    lat: float
+    lon: float
+    count: int
+    colors: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def marker_color(self) -> str | None:
+        if not self.colors:
+            return None
+        color = max(self.colors.items(), key=lambda item: item[1])[0]
+        return None if color == NO_COLOR else color
+
+
+def mercator(lat: Any, lon: Any) -> tuple[np.ndarray, np.ndarray]:
+    """Normalized Web Mercator coordinates in [0, 1) (y grows southwards)."""
+    lat = np.radians(
+        np.clip(np.asarray(lat, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    )
+    x = (np.asarray(lon, dtype=np.float64) + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+
+def zoom_levels() -> range:
+    return range(settings.map_cluster_max_zoom + 1)
+
+
+def _cell_ops(version: str, point: str, sign: int) -> list[list[Any]]:
+    """Per-zoom hash increments that add (sign=1) or remove (-1) a stored point."""
+    lat_s, lon_s, color = point.split(",", 2)
+    lat, lon = float(lat_s), float(lon_s)
+    x, y = mercator(lat, lon)
+    grid = settings.map_cluster_grid
+    ops = []
+    for z in zoom_levels():
+        cx, cy = int(x * 2**z * grid), int(y * 2**z * grid)
+        key = TILE_KEY.format(version=version, z=z, tx=cx // grid, ty=cy // grid)
+        ops.append([key, f"{cx}:{cy}", sign, lat, lon, color])
+    return ops
+
+
+def _encode_point(lat: float, lon: float, color: str | None) -> str:
+    return f"{lat:.6f},{lon:.6f},{color or NO_COLOR}"
+
+
+def _version_key() -> str:
+    return VERSION_KEY.format(
+        grid=settings.map_cluster_grid, max_zoom=settings.map_cluster_max_zoom
+    )
+
+
+def current_version(client: redis.Redis | None = None) -> str | None:
+    return (client or get_redis_sync()).get(_version_key())
+
+
+def record_point(user_id: str, lat: float | None, lon: float | None, color: str | None) -> bool:
+    """Move a profile's contribution to its new cell (or drop it when lat/lon is None).
+
+    Returns False when there is no pyramid yet or the update kept racing.
+    """
+    global _move_point_script
+    client = get_redis_sync()
+    version = current_version(client)
+    if not version:
+        return False
+    if _move_point_script is None:
+        _move_point_script = client.register_script(_MOVE_POINT_LUA)
+    points_key = POINTS_KEY.format(version=version)
+    new = _encode_point(lat, lon, color) if lat is not None and lon is not None else ""
+    for _ in range(MAX_CAS_ATTEMPTS):
+        old = client.hget(points_key, user_id) or ""
+        if old == new:
+            return True
+        ops = (_cell_ops(version, old, -1) if old else []) + (
+            _cell_ops(version, new, 1) if new else []
+        )
+        if _move_point_script(
+            keys=[points_key], args=[user_id, old, new, json.dumps(ops)], client=client
+        ):
+            return True
+    logger.warning("Map cluster update for %s kept racing; giving up", user_id)
+    return False
+
+
+@traced("redis")
+def record_profile(profile: dict[str, Any]) -> None:
+    """Best-effort hook for profile writes; a Redis outage only delays the map."""
+    if not settings.map_clusters_enabled or not profile.get("id"):
+        return
+    location = parse_location(profile.get("location"))
+    lat, lon = location if location else (None, None)
+    try:
+        record_point(str(profile["id"]), lat, lon, profile.get("marker_color"))
+    except redis.RedisError as exc:
+        logger.warning("Map cluster update failed for %s: %s", profile["id"], exc)
+
+
+def get_tile_clusters(z: int, x: int, y: int) -> list[Cluster] | None:
+    """Clusters in one tile, or None when the pyramid is missing or too shallow."""
+    if not settings.map_clusters_enabled or z > settings.map_cluster_max_zoom:
+        return None
+    try:
+        client = get_redis_sync()
+        version = current_version(client)
+        if not version:
+            return None
+        fields = client.hgetall(TILE_KEY.format(version=version, z=z, tx=x, ty=y))
+    except redis.RedisError as exc:
+        logger.warning("Map cluster read failed: %s", exc)
+        return None
+
+    cells: dict[str, dict[str, Any]] = defaultdict(lambda: {"colors": {}})
+    for name, value in fields.items():
+        cx, cy, stat = name.split(":", 2)
+        cell = cells[f"{cx}:{cy}"]
+        if stat.startswith("c:"):
+            cell["colors"][stat[2:]] = int(value)
+        else:
+            cell[stat] = float(value)
+    return [
+        Cluster(
+            lat=cell["lat"] / cell["n"],
+            lon=cell["lon"] / cell["n"],
+            count=int(cell["n"]),
+            colors=cell["colors"],
+        )
+        for cell in cells.values()
+        if cell.get("n", 0) > 0
+    ]
+
+
+def build_pyramid(
+    lat: np.ndarray, lon: np.ndarray, colors: list[str]
+) -> dict[tuple[int, int, int], dict[str, Any]]:
+    """Hash contents per (z, tx, ty) for the given points (vectorized per zoom).
+
+    Every field is a sum, so pyramids of disjoint point sets add up.
+    """
+    x, y = mercator(lat, lon)
+    grid = settings.map_cluster_grid
+    palette, color_idx = np.unique(np.asarray(colors, dtype=str), return_inverse=True)
+    tiles: dict[tuple[int, int, int], dict[str, Any]] = defaultdict(dict)
+    for z in zoom_levels():
+        side = 2**z * grid
+        cell_id = (y * side).astype(np.int64) * side + (x * side).astype(np.int64)
+        cells, inverse = np.unique(cell_id, return_inverse=True)
+        counts = np.bincount(inverse)
+        lat_sums = np.bincount(inverse, weights=lat)
+        lon_sums = np.bincount(inverse, weights=lon)
+        for i, cell in enumerate(cells.tolist()):
+            cy, cx = divmod(cell, side)
+            fields = tiles[(z, cx // grid, cy // grid)]
+            fields[f"{cx}:{cy}:n"] = int(counts[i])
+            fields[f"{cx}:{cy}:lat"] = float(lat_sums[i])
+            fields[f"{cx}:{cy}:lon"] = float(lon_sums[i])
+        pairs, pair_counts = np.unique(
+            np.stack([inverse, color_idx]), axis=1, return_counts=True
+        )
+        for (i, c), count in zip(pairs.T.tolist(), pair_counts.tolist()):
+            cy, cx = divmod(int(cells[i]), side)
+            tiles[(z, cx // grid, cy // grid)][f"{cx}:{cy}:c:{palette[c]}"] = count
+    return tiles
+
+
+def _profile_points(
+    page: list[dict[str, Any]],
+) -> tuple[list[str], list[float], list[float], list[str]]:
+    """Ids, coordinates (rounded like the stored points) and colors of located profiles."""
+    ids: list[str] = []
+    lats: list[float] = []
+    lons: list[float] = []
+    colors: list[str] = []
+    for row in page:
+        location = parse_location(row.get("location"))
+        if not location:
+            continue
+        ids.append(row["id"])
+        lats.append(round(location[0], 6))
+        lons.append(round(location[1], 6))
+        colors.append(row.get("marker_color") or NO_COLOR)
+    return ids, lats, lons, colors
+
+
+def _profile_pages(page_size: int = REBUILD_PAGE_SIZE) -> Iterable[list[dict[str, Any]]]:
+    after_id: str | None = None
+    while True:
+        page = get_profile_markers_page(after_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]["id"]
+
+
+def _flush(pipe: Any, force: bool = False) -> None:
+    """Send the queued commands once there are ``REBUILD_PAGE_SIZE`` of them."""
+    if len(pipe) and (force or len(pipe) >= REBUILD_PAGE_SIZE):
+        pipe.execute()
+
+
+def rebuild() -> dict[str, Any]:
+    """Build a new pyramid version from all profiles and switch to it.
+
+    Profiles are streamed a page at a time: each page's points and cell
+    increments go to the new (not yet visible) version in pipelines of at
+    most ``REBUILD_PAGE_SIZE`` commands, so memory stays at one page.
+    """
+    started = time.perf_counter()
+    client = get_redis_sync()
+    old_version = current_version(client)
+    version = str(time.time_ns())
+    points_key = POINTS_KEY.format(version=version)
+    pipe = client.pipeline(transaction=False)
+    profiles = 0
+    tile_keys: set[tuple[int, int, int]] = set()
+    for page in _profile_pages():
+        ids, lats, lons, colors = _profile_points(page)
+        if not ids:
+            continue
+        profiles += len(ids)
+        pipe.hset(
+            points_key,
+            mapping={
+                user_id: _encode_point(lat, lon, color)
+                for user_id, lat, lon, color in zip(ids, lats, lons, colors)
+            },
+        )
+        tiles = build_pyramid(np.asarray(lats), np.asarray(lons), colors)
+        tile_keys.update(tiles)
+        for (z, tx, ty), fields in tiles.items():
+            key = TILE_KEY.format(version=version, z=z, tx=tx, ty=ty)
+            for name, value in fields.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(key, name, value)
+                else:
+                    pipe.hincrby(key, name, value)
+            _flush(pipe)
+    _flush(pipe, force=True)
+    client.set(_version_key(), version)
+
+    if old_version:
+        stale: list[str] = []
+        for key in client.scan_iter(match=f"map_clusters:{old_version}:*", count=1000):
+            stale.append(key)
+            if len(stale) == 1000:
+                client.unlink(*stale)
+                stale.clear()
+        if stale:
+            client.unlink(*stale)
+    result = {
+        "version": version,
+        "profiles": profiles,
+        "tiles": len(tile_keys),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info("Rebuilt map clusters: %s", result)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputed map cluster pyramid.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild from all profiles")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.rebuild:
+        print(rebuild())
+    else:
+        print({"version": current_version()})
@@ -0,0 +1,162 @@
+"""
+Map tiles for the mosaic: compact marker data per Web Mercator XYZ tile.
+
+Above ``settings.map_cluster_max_zoom`` a tile holds individual markers
+(falling back to clusters when it has more than ``map_tile_max_markers``);
+at lower zooms markers are aggregated on a grid of
+``map_cluster_grid`` x ``map_cluster_grid`` cells per tile, aligned to tile
+edges so a cluster never straddles two tiles. Cluster tiles come from the
+precomputed pyramid in Redis (``app.core.map_clusters``) and fall back to
+aggregating in SQL when it is missing.
+
+Tiles are columnar. As JSON::
+
+    {"z", "x", "y", "clustered", "id": [...], "lat": [...], "lon": [...],
+     "color": [...], "count": [...], "histogram": [{color: n}, ...]}
+
+``histogram`` is only present for pyramid clusters.
+
+As binary (``application/octet-stream``, little-endian, 32 bytes per point,
+every column 4-byte aligned so it maps onto typed arrays)::
+
+    magic   4 bytes  b"MTL1"
+    flags   u32      bit 0: clustered
+    n       u32
+    z, x, y u32 x 3
+    lat     f32[n]
+    lon     f32[n]
+    color   u32[n]   0xRRGGBB, 0xFFFFFFFF when unset
+    count   u32[n]   1 for single markers
+    id      16 bytes x n, UUID bytes (zero for clusters of more than one)
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.core.map_clusters import get_tile_clusters
+from app.db.supabase_client import get_map_clusters, get_map_markers
+
+MAX_ZOOM = 22
+MAGIC = b"MTL1"
+NO_COLOR = 0xFFFFFFFF
+
+
+@dataclass
+class MapTile:
+    z: int
+    x: int
+    y: int
+    clustered: bool
+    ids: list[str | None]
+    lat: np.ndarray
+    lon: np.ndarray
+    colors: list[str | None]
+    counts: np.ndarray
+    histograms: list[dict[str, int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of an XYZ tile."""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def _tile_from_rows(z: int, x: int, y: int, rows: list[dict[str, Any]], clustered: bool) -> MapTile:
+    return MapTile(
+        z=z,
+        x=x,
+        y=y,
+        clustered=clustered,
+        ids=[row.get("id") for row in rows],
+        lat=np.asarray([row["lat"] for row in rows], dtype=np.float32),
+        lon=np.asarray([row["lon"] for row in rows], dtype=np.float32),
+        colors=[row.get("marker_color") for row in rows],
+        counts=np.asarray([row.get("point_count", 1) for row in rows], dtype=np.uint32),
+    )
+
+
+def load_tile(z: int, x: int, y: int) -> MapTile:
+    """Markers (via the location index) or clusters (pyramid, else SQL) for one tile."""
+    bbox = tile_bounds(z, x, y)
+    if z > settings.map_cluster_max_zoom:
+        limit = settings.map_tile_max_markers
+        rows = get_map_markers(bbox, limit=limit + 1)
+        if len(rows) <= limit:
+            return _tile_from_rows(z, x, y, rows, clustered=False)
+    clusters = get_tile_clusters(z, x, y)
+    if clusters is not None:
+        return MapTile(
+            z=z,
+            x=x,
+            y=y,
+            clustered=True,
+            ids=[None] * len(clusters),
+            lat=np.asarray([c.lat for c in clusters], dtype=np.float32),
+            lon=np.asarray([c.lon for c in clusters], dtype=np.float32),
+            colors=[c.marker_color for c in clusters],
+            counts=np.asarray([c.count for c in clusters], dtype=np.uint32),
+            histograms=[c.colors for c in clusters],
+        )
+    rows = get_map_clusters(bbox, world_cells=2**z * settings.map_cluster_grid)
+    return _tile_from_rows(z, x, y, rows, clustered=True)
+
+
+def _color_value(color: str | None) -> int:
+    if not color or not color.startswith("#") or len(color) != 7:
+        return NO_COLOR
+    try:
+        return int(color[1:], 16)
+    except ValueError:
+        return NO_COLOR
+
+
+def encode_json(tile: MapTile) -> dict[str, Any]:
+    data = {
+        "z": tile.z,
+        "x": tile.x,
+        "y": tile.y,
+        "clustered": tile.clustered,
+        "id": tile.ids,
+        "lat": np.round(tile.lat.astype(np.float64), 5).tolist(),
+        "lon": np.round(tile.lon.astype(np.float64), 5).tolist(),
+        "color": tile.colors,
+        "count": tile.counts.tolist(),
+    }
+    if tile.histograms is not None:
+        data["histogram"] = tile.histograms
+    return data
+
+
+def encode_binary(tile: MapTile) -> bytes:
+    header = MAGIC + struct.pack("<5I", int(tile.clustered), len(tile), tile.z, tile.x, tile.y)
+    colors = np.asarray([_color_value(c) for c in tile.colors], dtype="<u4")
+    ids = b"".join(uuid.UUID(i).bytes if i else bytes(16) for i in tile.ids)
+    return b"".join(
+        [
+            header,
+            tile.lat.astype("<f4").tobytes(),
+            tile.lon.astype("<f4").tobytes(),
+            colors.tobytes(),
+            tile.counts.astype("<u4").tobytes(),
+            ids,
+        ]
+    )
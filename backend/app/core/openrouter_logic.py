@@ -2,15 +2,46 @@
 
 from __future__ import annotations
 
+import logging
+import threading
+import time
 from typing import Iterable, List
 
 from openai import OpenAI
 
 from app.config import settings
+from app.core.tracing import span
+from app.db.supabase_client import get_active_embed_model
+
+logger = logging.getLogger(__name__)
 
-EMBED_MODEL = "intfloat/e5-large-v2"
 TEXT_MODEL = "openai/gpt-4o-mini"
 
+_embed_model_lock = threading.Lock()
+_embed_model: tuple[str, float] | None = None  # (model, loaded at)
+
+
+def embed_model() -> str:
+    """Model profiles are embedded with.
+
+    Changing it needs a re-embed of every profile (python -m app.core.reembed),
+    whose swap records the new model in the database; it is picked up here
+    within settings.embed_model_cache_seconds, without a redeploy.
+    settings.embed_model applies until the first swap.
+    """
+    global _embed_model
+    with _embed_model_lock:
+        now = time.monotonic()
+        if _embed_model and now - _embed_model[1] < settings.embed_model_cache_seconds:
+            return _embed_model[0]
+        try:
+            model = get_active_embed_model() or settings.embed_model
+        except Exception as exc:
+            logger.warning("Reading the active embedding model failed: %s", exc)
+            model = _embed_model[0] if _embed_model else settings.embed_model
+        _embed_model = (model, now)
+        return model
+
 
 def _client() -> OpenAI:
     return OpenAI(
@@ -24,25 +55,30 @@ def _client() -> OpenAI:
     )
 
 
-def get_embedding(dna_string: str) -> List[float]:
-    """Return a single embedding for the provided dna_string."""
+def get_embedding(dna_string: str, model: str | None = None) -> List[float]:
+    """Return one embedding of ``dna_string`` (``model`` defaults to embed_model())."""
     if not dna_string or not dna_string.strip():
         raise ValueError("dna_string must be a non-empty string.")
 
     client = _client()
-    response = client.embeddings.create(model=EMBED_MODEL, input=dna_string)
+    with span("openrouter", "embeddings"):
+        response = client.embeddings.create(
+            model=model or embed_model(), input=dna_string
+        )
     return response.data[0].embedding
 
 
-def get_embeddings(texts: Iterable[str]) -> List[List[float]]:
-    """Return embeddings for a batch of strings."""
+def get_embeddings(texts: Iterable[str], model: str | None = None) -> List[List[float]]:
+    """Return embeddings for a batch of strings (``model`` defaults to embed_model())."""
     batch = [t for t in texts if t and t.strip()]
     if not batch:
         raise ValueError("texts must contain at least one non-empty string.")
 
     client = _client()
-    response = client.embeddings.create(model=EMBED_MODEL, input=batch)
-    return [item.embedding for item in response.data]
+    with span("openrouter", "embeddings"):
+        response = client.embeddings.create(model=model or embed_model(), input=batch)
+    # Keep input order even if the provider returns items out of order.
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
 
 def generate_profile_summary(
@@ -53,6 +89,7 @@ def generate_profile_summary(
     youtube_interests: list[str],
     steam_interests: list[str],
     discord_interests: list[str] | None = None,
+    github_interests: list[str] | None = None,
 ) -> str:
     """Generate a short natural-language profile summary for dna_string."""
     client = _client()
@@ -67,21 +104,23 @@ def generate_profile_summary(
         "youtube_interests": youtube_interests[:30],
         "steam_interests": steam_interests[:30],
         "discord_interests": (discord_interests or [])[:30],
+        "github_interests": (github_interests or [])[:30],
     }
-    response = client.chat.completions.create(
-        model=TEXT_MODEL,
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": system},
-            {
-                "role": "user",
-                "content": (
-                "Write a profile summary paragraph based on this data:\n"
-                    f"{user}"
-                ),
-            },
-        ],
-    )
+    with span("openrouter", "chat.profile_summary"):
+        response = client.chat.completions.create(
+            model=TEXT_MODEL,
+            temperature=0.2,
+            messages=[
+                {"role": "system", "content": system},
+                {
+                    "role": "user",
+                    "content": (
+                        "Write a profile summary paragraph based on this data:\n"
+                        f"{user}"
+                    ),
+                },
+            ],
+        )
     content = response.choices[0].message.content or ""
     return content.strip()
 
@@ -116,23 +155,47 @@ def generate_similarity_summary(interests_1: list[str], interests_2: list[str])
         "Start with 'You both' and mention why these matches could spark a connection."
     )
     
-    response = client.chat.completions.create(
-        model=TEXT_MODEL,
-        temperature=0.4,
-        max_tokens=100,
-        messages=[
-            {"role": "system", "content": system},
-            {
-                "role": "user",
-                "content": (
-                    f"User 1 interests: {interests_1_str}\n\n"
-                    f"User 2 interests: {interests_2_str}\n\n"
-                    "What specific things do they have in common?"
-                ),
-            },
-        ],
-    )
+    with span("openrouter", "chat.similarity_summary"):
+        response = client.chat.completions.create(
+            model=TEXT_MODEL,
+            temperature=0.4,
+            max_tokens=100,
+            messages=[
+                {"role": "system", "content": system},
+                {
+                    "role": "user",
+                    "content": (
+                        f"User 1 interests: {interests_1_str}\n\n"
+                        f"User 2 interests: {interests_2_str}\n\n"
+                        "What specific things do they have in common?"
+                    ),
+                },
+            ],
+        )
     content = response.choices[0].message.content or ""
     return content.strip()
 
 
+def polish_similarity_summary(draft: str, shared: list[str]) -> str:
+    """Reword a templated similarity summary without changing its facts."""
+    client = _client()
+    system = (
+        "You rewrite one sentence about what two users have in common so it reads "
+        "naturally and warmly (20-35 words). Keep every named item exactly as written, "
+        "do not add new ones, and start with 'You both'."
+    )
+    with span("openrouter", "chat.similarity_polish"):
+        response = client.chat.completions.create(
+            model=TEXT_MODEL,
+            temperature=0.4,
+            max_tokens=100,
+            messages=[
+                {"role": "system", "content": system},
+                {
+                    "role": "user",
+                    "content": f"Shared items: {', '.join(shared)}\n\nSentence: {draft}",
+                },
+            ],
+        )
+    content = response.choices[0].message.content or ""
+    return content.strip() or draft
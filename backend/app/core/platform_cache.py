@@ -0,0 +1,266 @@
+"""
+Per-(user, provider) cache of platform interest fetches.
+
+Two layers, both in Redis and both best-effort (a Redis outage is a miss):
+
+* Interest results: the list a ``fetch_*_interests`` call produced, kept for a
+  provider-specific TTL so repeat pipeline runs skip the external API.
+* Conditional requests: raw response bodies keyed by URL + params with their
+  ETag, so expired entries can be revalidated with ``If-None-Match``
+  (YouTube). A 304 costs no quota and no response body. GitHub's GraphQL API
+  has no conditional requests, so GitHub relies on the result TTL alone.
+
+Hit/miss/revalidation counters are exported on GET /metrics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Mapping
+
+import httpx
+import redis
+import requests
+
+from app.config import settings
+from app.core.pubsub import get_redis_sync
+
+logger = logging.getLogger(__name__)
+
+INTEREST_KEY = "platform_cache:{provider}:{user_id}"
+HTTP_KEY = "platform_http:{provider}:{user_id}:{request_hash}"
+
+# Raw bodies outlive the interest TTL so an expired entry can still revalidate.
+HTTP_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+_stats: Counter[tuple[str, str]] = Counter()
+_stats_lock = threading.Lock()
+
+
+def provider_ttl(provider: str) -> int:
+    """Interest-result TTL for a provider, in seconds (0 disables caching)."""
+    return {
+        "youtube": settings.platform_cache_ttl_youtube,
+        "steam": settings.platform_cache_ttl_steam,
+        "discord": settings.platform_cache_ttl_discord,
+        "github": settings.platform_cache_ttl_github,
+    }.get(provider, 0)
+
+
+def _count(provider: str, outcome: str) -> None:
+    with _stats_lock:
+        _stats[(provider, outcome)] += 1
+
+
+def cache_stats() -> dict[str, dict[str, Any]]:
+    """Per-provider counters plus the interest-cache hit rate."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    result: dict[str, dict[str, Any]] = {}
+    for (provider, outcome), count in snapshot.items():
+        result.setdefault(provider, {})[outcome] = count
+    for counts in result.values():
+        lookups = counts.get("hit", 0) + counts.get("miss", 0)
+        counts["hit_rate"] = counts.get("hit", 0) / lookups if lookups else 0.0
+    return result
+
+
+def render_prometheus() -> str:
+    """Cache counters in the Prometheus text exposition format."""
+    lines = ["# TYPE mosaic_platform_cache_events_total counter"]
+    with _stats_lock:
+        items = sorted(_stats.items())
+    for (provider, outcome), count in items:
+        lines.append(
+            f'mosaic_platform_cache_events_total{{provider="{provider}",'
+            f'outcome="{outcome}"}} {count}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _enabled() -> bool:
+    return settings.platform_cache_enabled
+
+
+# ============================================================================
+# Interest results
+# ============================================================================
+
+
+def cached_interests(
+    user_id: str, provider: str, fetch: Callable[[], list[str]]
+) -> list[str]:
+    """Return cached interests for (user, provider) or call ``fetch`` and store them.
+
+    Empty results are not cached: they usually mean a missing account, an
+    expired token or a rate limit, and should be retried next time.
+    """
+    ttl = provider_ttl(provider)
+    if not _enabled() or ttl <= 0:
+        return fetch()
+
+    key = INTEREST_KEY.format(provider=provider, user_id=user_id)
+    try:
+        raw = get_redis_sync().get(key)
+    except redis.RedisError as exc:
+        logger.warning("Platform cache read failed for %s: %s", key, exc)
+        raw = None
+    if raw:
+        _count(provider, "hit")
+        return json.loads(raw)
+
+    _count(provider, "miss")
+    interests = fetch()
+    if interests:
+        try:
+            get_redis_sync().set(key, json.dumps(interests), ex=ttl)
+        except redis.RedisError as exc:
+            logger.warning("Platform cache write failed for %s: %s", key, exc)
+    return interests
+
+
+def invalidate(user_id: str, provider: str) -> None:
+    """Drop cached interests for (user, provider), e.g. after reconnecting."""
+    providers = {"google", "youtube"} if provider in {"google", "youtube"} else {provider}
+    keys = [INTEREST_KEY.format(provider=p, user_id=user_id) for p in providers]
+    try:
+        get_redis_sync().delete(*keys)
+    except redis.RedisError as exc:
+        logger.warning("Platform cache invalidation failed for %s: %s", keys, exc)
+
+
+# ============================================================================
+# Conditional requests (ETag / If-None-Match)
+# ============================================================================
+
+
+def _http_key(provider: str, user_id: str, url: str, params: dict[str, Any] | None) -> str:
+    request_id = json.dumps([url, params or {}], sort_keys=True, default=str)
+    request_hash = hashlib.sha256(request_id.encode()).hexdigest()[:24]
+    return HTTP_KEY.format(provider=provider, user_id=user_id, request_hash=request_hash)
+
+
+def get_validator(
+    provider: str, user_id: str, url: str, params: dict[str, Any] | None = None
+) -> tuple[str | None, str | None]:
+    """Return (etag, cached body) stored for this request, if any."""
+    if not _enabled():
+        return None, None
+    try:
+        raw = get_redis_sync().get(_http_key(provider, user_id, url, params))
+    except redis.RedisError as exc:
+        logger.warning("Platform HTTP cache read failed: %s", exc)
+        return None, None
+    if not raw:
+        return None, None
+    entry = json.loads(raw)
+    return entry.get("etag"), entry.get("body")
+
+
+def store_validator(
+    provider: str,
+    user_id: str,
+    url: str,
+    params: dict[str, Any] | None,
+    *,
+    etag: str,
+    body: str,
+) -> None:
+    """Remember a 200 response body together with its ETag."""
+    if not _enabled() or not etag:
+        return
+    try:
+        get_redis_sync().set(
+            _http_key(provider, user_id, url, params),
+            json.dumps({"etag": etag, "body": body}),
+            ex=HTTP_CACHE_TTL_SECONDS,
+        )
+    except redis.RedisError as exc:
+        logger.warning("Platform HTTP cache write failed: %s", exc)
+
+
+# The cached body is stored decoded, so these no longer describe the replay.
+_REPLAY_DROP_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+
+def _replay_headers(headers: Mapping[str, str]) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in _REPLAY_DROP_HEADERS}
+
+
+def conditional_get(
+    provider: str,
+    user_id: str,
+    url: str,
+    *,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, str],
+    send: Callable[..., requests.Response] = requests.get,
+    timeout: float = 10,
+) -> requests.Response:
+    """GET with If-None-Match; a 304 is turned back into the cached 200."""
+    etag, cached_body = get_validator(provider, user_id, url, params)
+    request_headers = dict(headers)
+    if etag and cached_body is not None:
+        request_headers["If-None-Match"] = etag
+
+    resp = send(url, params=params, headers=request_headers, timeout=timeout)
+
+    if resp.status_code == 304 and cached_body is not None:
+        _count(provider, "not_modified")
+        replay = requests.Response()
+        replay.status_code = 200
+        replay._content = cached_body.encode("utf-8")
+        replay.headers.update(_replay_headers(resp.headers))
+        replay.url = resp.url
+        replay.request = resp.request
+        return replay
+
+    if resp.ok and resp.headers.get("ETag"):
+        store_validator(
+            provider, user_id, url, params, etag=resp.headers["ETag"], body=resp.text
+        )
+    return resp
+
+
+async def conditional_get_async(
+    provider: str,
+    user_id: str,
+    url: str,
+    *,
+    params: dict[str, Any] | None = None,
+    headers: dict[str, str],
+    send: Callable[..., Awaitable[httpx.Response]],
+) -> httpx.Response:
+    """Async ``conditional_get`` for pooled httpx clients (``send`` is ``client.get``)."""
+    etag, cached_body = await asyncio.to_thread(get_validator, provider, user_id, url, params)
+    request_headers = dict(headers)
+    if etag and cached_body is not None:
+        request_headers["If-None-Match"] = etag
+
+    resp = await send(url, params=params, headers=request_headers)
+
+    if resp.status_code == 304 and cached_body is not None:
+        _count(provider, "not_modified")
+        return httpx.Response(
+            200,
+            content=cached_body.encode("utf-8"),
+            headers=_replay_headers(resp.headers),
+            request=resp.request,
+        )
+
+    if resp.is_success and resp.headers.get("ETag"):
+        await asyncio.to_thread(
+            store_validator,
+            provider,
+            user_id,
+            url,
+            params,
+            etag=resp.headers["ETag"],
+            body=resp.text,
+        )
+    return resp
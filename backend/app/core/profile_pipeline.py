@@ -2,29 +2,34 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
 from typing import Any
 
-from app.core.openrouter_logic import generate_profile_summary, get_embedding
-from app.db.supabase_client import get_oauth_account
+from app.config import settings
+from app.core.location import parse_location, to_wkt
+from app.core.openrouter_logic import (
+    embed_model,
+    generate_profile_summary,
+    get_embedding,
+)
+from app.core import singleflight
+from app.core.cluster_centroids import nearest_cluster
+from app.core.clusters import DEFAULT_CLUSTER, choose_cluster, cluster_for_color
+from app.core.embedding_codec import as_vector
+from app.core.map_clusters import record_profile
+from app.core.platform_cache import cached_interests
+from app.db.supabase_client import get_oauth_account, sync_user_interests, upsert_profile
 from app.integrations.discord import fetch_discord_interests
+from app.integrations.github import fetch_github_interests
 from app.integrations.steam import fetch_steam_interests_sync
 from app.integrations.youtube import fetch_youtube_interests
-from app.models.schemas import CLUSTER_COLORS, InterestCluster
+from app.models.schemas import CLUSTER_COLORS, IngestRequest
 
-
-def choose_cluster(interests: list[str]) -> InterestCluster:
-    """Determine user cluster based on interest keywords."""
-    blob = " ".join(interests).lower()
-    if any(k in blob for k in ["code", "dev", "developer", "software", "ai", "tech"]):
-        return InterestCluster.TECH_DEV
-    if any(k in blob for k in ["art", "design", "music", "creative", "photo", "film"]):
-        return InterestCluster.CREATIVE_ARTS
-    if any(k in blob for k in ["game", "gaming", "esports", "steam", "discord"]):
-        return InterestCluster.GAMING
-    if any(k in blob for k in ["fitness", "gym", "workout", "run", "yoga", "sport"]):
-        return InterestCluster.FITNESS
-    return InterestCluster.TECH_DEV
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -33,30 +38,55 @@ class PlatformInterests:
     youtube: list[str]
     steam: list[str]
     discord: list[str]
+    github: list[str] = field(default_factory=list)
+
+
+def _fetch_steam_for_user(user_id: str) -> list[str]:
+    steam_account = get_oauth_account(user_id, "steam")
+    if not steam_account or not steam_account.get("provider_user_id"):
+        return []
+    return fetch_steam_interests_sync(steam_account["provider_user_id"]) or []
 
 
 def fetch_platform_interests(user_id: str) -> PlatformInterests:
-    """Fetch interests from all connected platforms for a user."""
+    """Fetch interests from all connected platforms for a user.
+
+    Each provider goes through the per-(user, provider) platform cache.
+    """
     # YouTube
-    youtube_interests = fetch_youtube_interests(user_id=user_id) or []
+    youtube_interests = cached_interests(
+        user_id, "youtube", lambda: fetch_youtube_interests(user_id=user_id) or []
+    )
     if youtube_interests:
-        print(f"DEBUG: Found {len(youtube_interests)} YouTube interests")
+        logger.debug("Found %d YouTube interests for %s", len(youtube_interests), user_id)
 
     # Steam
-    steam_interests: list[str] = []
-    steam_account = get_oauth_account(user_id, "steam")
-    if steam_account and steam_account.get("provider_user_id"):
-        steam_id = steam_account["provider_user_id"]
-        steam_interests = fetch_steam_interests_sync(steam_id) or []
-        if steam_interests:
-            print(f"DEBUG: Found {len(steam_interests)} Steam interests")
+    steam_interests = cached_interests(
+        user_id, "steam", lambda: _fetch_steam_for_user(user_id)
+    )
+    if steam_interests:
+        logger.debug("Found %d Steam interests for %s", len(steam_interests), user_id)
 
     # Discord
-    discord_interests = fetch_discord_interests(user_id) or []
+    discord_interests = cached_interests(
+        user_id, "discord", lambda: fetch_discord_interests(user_id) or []
+    )
     if discord_interests:
-        print(f"DEBUG: Found {len(discord_interests)} Discord interests")
+        logger.debug("Found %d Discord interests for %s", len(discord_interests), user_id)
 
-    return PlatformInterests(youtube=youtube_interests, steam=steam_interests, discord=discord_interests)
+    # GitHub
+    github_interests = cached_interests(
+        user_id, "github", lambda: fetch_github_interests(user_id) or []
+    )
+    if github_interests:
+        logger.debug("Found %d GitHub interests for %s", len(github_interests), user_id)
+
+    return PlatformInterests(
+        youtube=youtube_interests,
+        steam=steam_interests,
+        discord=discord_interests,
+        github=github_interests,
+    )
 
 
 def merge_interests(
@@ -74,7 +104,13 @@ def merge_interests(
     Returns:
         Combined list of all interests
     """
-    all_interests = user_interests + platform.youtube + platform.steam + platform.discord
+    all_interests = (
+        user_interests
+        + platform.youtube
+        + platform.steam
+        + platform.discord
+        + platform.github
+    )
     if dedupe:
         return list(dict.fromkeys(all_interests))
     return all_interests
@@ -90,6 +126,59 @@ class ProfilePipelineResult:
     youtube_interests: list[str]
     steam_interests: list[str]
     discord_interests: list[str]
+    github_interests: list[str] = field(default_factory=list)
+    # Stored under metadata["pipeline"] so the next run can skip unchanged stages
+    pipeline_metadata: dict[str, Any] = field(default_factory=dict)
+    skipped_stages: list[str] = field(default_factory=list)
+    # Model ``embedding`` was made with, sent along when the profile is saved
+    embed_model: str | None = None
+
+
+PIPELINE_METADATA_KEY = "pipeline"
+
+
+def fingerprint(value: Any) -> str:
+    """Stable short hash of a JSON-serializable value."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _previous_pipeline_state(previous: dict[str, Any] | None) -> dict[str, Any]:
+    if not previous:
+        return {}
+    return (previous.get("metadata") or {}).get(PIPELINE_METADATA_KEY) or {}
+
+
+def _cached_platform_interests(
+    state: dict[str, Any], max_age_seconds: int
+) -> PlatformInterests | None:
+    """Return the platform interests stored by the last run if still fresh."""
+    if max_age_seconds <= 0:
+        return None
+    fetched_at = state.get("platform_fetched_at")
+    cached = state.get("platform")
+    if not fetched_at or not isinstance(cached, dict):
+        return None
+    try:
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(fetched_at)
+    except ValueError:
+        return None
+    if age.total_seconds() > max_age_seconds:
+        return None
+    return PlatformInterests(
+        youtube=list(cached.get("youtube") or []),
+        steam=list(cached.get("steam") or []),
+        discord=list(cached.get("discord") or []),
+        github=list(cached.get("github") or []),
+    )
+
+
+def _fallback_summary(username: str, bio: str | None, all_interests: list[str]) -> str:
+    bio_fragment = f" They mention: {bio}." if bio else ""
+    return (
+        f"{username} is interested in {', '.join(all_interests[:12])}."
+        f"{bio_fragment} Their activity hints at broader, related interests."
+    )
 
 
 def run_profile_pipeline(
@@ -98,54 +187,134 @@ def run_profile_pipeline(
     bio: str | None,
     user_interests: list[str],
     user_id: str,
+    previous: dict[str, Any] | None = None,
+    platform_max_age_seconds: int | None = None,
 ) -> ProfilePipelineResult:
     """Run the full profile pipeline: fetch platforms, merge, generate dna_string + embedding.
-    
+
+    When ``previous`` (the stored profile row) is given, stages whose inputs
+    are unchanged since the last run are skipped: platform fetches while the
+    stored platform data is younger than ``platform_max_age_seconds``, the LLM
+    summary when the summary inputs fingerprint matches, and the embedding
+    when the dna_string (and embedding model) are identical.
+
     Args:
         username: User's display name
         bio: User's bio text (optional)
         user_interests: Interests directly provided by user
         user_id: Supabase user ID for fetching OAuth connections
-    
+        previous: Existing profile row, enables incremental runs
+        platform_max_age_seconds: Reuse stored platform data younger than this
+            (defaults to settings.platform_data_max_age_seconds; 0 disables)
+
     Returns:
         ProfilePipelineResult with dna_string, embedding, and metadata
     """
-    # Step 1: Fetch platform interests
-    platform = fetch_platform_interests(user_id)
-    
+    state = _previous_pipeline_state(previous)
+    fingerprints = state.get("fingerprints") or {}
+    skipped: list[str] = []
+    if platform_max_age_seconds is None:
+        platform_max_age_seconds = settings.platform_data_max_age_seconds
+
+    # Step 1: Fetch platform interests (or reuse fresh ones from the last run)
+    platform = _cached_platform_interests(state, platform_max_age_seconds)
+    if platform is not None:
+        skipped.append("platform_fetch")
+        platform_fetched_at = state["platform_fetched_at"]
+    else:
+        platform = fetch_platform_interests(user_id)
+        platform_fetched_at = datetime.now(timezone.utc).isoformat()
+
     # Step 2: Merge all interests (user first, deduplicated)
     all_interests = merge_interests(user_interests, platform, dedupe=True)
-    
-    # Step 3: Generate dna_string via LLM
-    try:
-        summary = generate_profile_summary(
-            username=username,
-            bio=bio,
-            interests=all_interests,
-            youtube_interests=platform.youtube,
-            steam_interests=platform.steam,
-            discord_interests=platform.discord,
-        )
-    except Exception as exc:
-        print(f"DEBUG: summary generation failed: {exc}")
-        summary = ""
-    
-    if not summary:
-        bio_fragment = f" They mention: {bio}." if bio else ""
-        summary = (
-            f"{username} is interested in {', '.join(all_interests[:12])}."
-            f"{bio_fragment} Their activity hints at broader, related interests."
-        )
-    
-    dna_string = summary
-    
-    # Step 4: Generate embedding
-    embedding = get_embedding(dna_string)
-    
-    # Step 5: Choose cluster and color
-    cluster = choose_cluster(all_interests)
+
+    summary_fp = fingerprint(
+        {
+            "username": username,
+            "bio": bio,
+            "interests": all_interests,
+            "youtube": platform.youtube,
+            "steam": platform.steam,
+            "discord": platform.discord,
+            "github": platform.github,
+        }
+    )
+
+    # Step 3: Generate dna_string via LLM (unless the inputs are unchanged)
+    summary_fallback = False
+    previous_dna = (previous or {}).get("dna_string")
+    if (
+        previous_dna
+        and fingerprints.get("summary_input") == summary_fp
+        and not state.get("summary_fallback")
+    ):
+        skipped.append("summary")
+        dna_string = previous_dna
+    else:
+        try:
+            summary = generate_profile_summary(
+                username=username,
+                bio=bio,
+                interests=all_interests,
+                youtube_interests=platform.youtube,
+                steam_interests=platform.steam,
+                discord_interests=platform.discord,
+                github_interests=platform.github,
+            )
+        except Exception:
+            logger.exception("Summary generation failed for %s, using fallback", user_id)
+            summary = ""
+
+        if not summary:
+            summary_fallback = True
+            summary = _fallback_summary(username, bio, all_interests)
+
+        dna_string = summary
+
+    # Step 4: Generate embedding (unless the dna_string is unchanged)
+    model = embed_model()
+    dna_fp = fingerprint({"dna_string": dna_string, "model": model})
+    # PostgREST returns the stored vector as text
+    previous_embedding = as_vector((previous or {}).get("embedding"))
+    if previous_embedding and fingerprints.get("dna_string") == dna_fp:
+        skipped.append("embedding")
+        embedding = previous_embedding
+    else:
+        embedding = get_embedding(dna_string, model=model)
+
+    # Step 5: Choose cluster and color: nearest learned centroid, else keywords
+    # (keeping the current cluster when no keyword matches)
+    cluster = nearest_cluster(embedding)
+    if cluster is None:
+        previous_cluster = cluster_for_color((previous or {}).get("marker_color"))
+        cluster = choose_cluster(all_interests, default=previous_cluster or DEFAULT_CLUSTER)
     marker_color = CLUSTER_COLORS[cluster]
-    
+
+    if skipped:
+        logger.info("Pipeline for %s skipped unchanged stages: %s", user_id, ", ".join(skipped))
+
+    pipeline_metadata = {
+        "fingerprints": {
+            "summary_input": summary_fp,
+            "dna_string": dna_fp,
+            "sources": {
+                "user": fingerprint(user_interests),
+                "youtube": fingerprint(platform.youtube),
+                "steam": fingerprint(platform.steam),
+                "discord": fingerprint(platform.discord),
+                "github": fingerprint(platform.github),
+            },
+        },
+        "summary_fallback": summary_fallback,
+        "platform_fetched_at": platform_fetched_at,
+        "platform": {
+            "youtube": platform.youtube,
+            "steam": platform.steam,
+            "discord": platform.discord,
+            "github": platform.github,
+        },
+    }
+
     return ProfilePipelineResult(
         dna_string=dna_string,
         embedding=embedding,
@@ -154,4 +323,179 @@ def run_profile_pipeline(
         youtube_interests=platform.youtube,
         steam_interests=platform.steam,
         discord_interests=platform.discord,
+        github_interests=platform.github,
+        pipeline_metadata=pipeline_metadata,
+        skipped_stages=skipped,
+        embed_model=model,
+    )
+
+
+def avatar_url_from_user(current_user: dict[str, Any]) -> str | None:
+    """Get avatar URL from Supabase auth user metadata."""
+    user_metadata = current_user.get("user_metadata") or {}
+    return user_metadata.get("avatar_url") or user_metadata.get("picture")
+
+
+def index_interests(user_id: str, result: ProfilePipelineResult) -> None:
+    """Mirror the merged interests into the shared-interest index.
+
+    The index is derived data, so a failure is logged rather than failing the
+    profile save; the next pipeline run replaces the user's rows anyway.
+    """
+    try:
+        sync_user_interests(
+            user_id,
+            result.all_interests,
+            {
+                "youtube": result.youtube_interests,
+                "steam": result.steam_interests,
+                "discord": result.discord_interests,
+                "github": result.github_interests,
+            },
+        )
+    except Exception:
+        logger.exception("Interest index sync failed for %s", user_id)
+
+
+def save_profile_with_pipeline_result(
+    *,
+    user_id: str,
+    profile: dict[str, Any],
+    result: ProfilePipelineResult,
+    avatar_url: str | None,
+) -> dict[str, Any]:
+    """Save an existing profile with a fresh pipeline result."""
+    metadata = profile.get("metadata") or {}
+    new_metadata = {
+        **metadata,
+        "all_interests": result.all_interests,
+        "avatar_url": avatar_url or metadata.get("avatar_url"),
+        PIPELINE_METADATA_KEY: result.pipeline_metadata,
+    }
+
+    # Get location from existing profile
+    parsed_loc = parse_location(profile.get("location"))
+    lat = parsed_loc[0] if parsed_loc else 0.0
+    lon = parsed_loc[1] if parsed_loc else 0.0
+
+    saved = upsert_profile(
+        user_id=user_id,
+        username=profile.get("username", "User"),
+        location_wkt=to_wkt(lat, lon),
+        embedding=result.embedding,
+        bio=profile.get("bio"),
+        ideology_score=profile.get("ideology_score"),
+        instagram_handle=profile.get("instagram_handle"),
+        marker_color=result.marker_color,
+        metadata=new_metadata,
+        dna_string=result.dna_string,
+        embed_model=result.embed_model,
+    )
+    index_interests(user_id, result)
+    record_profile(saved)
+    return saved
+
+
+def regenerate_profile(
+    *,
+    user_id: str,
+    profile: dict[str, Any],
+    user_interests: list[str],
+    avatar_url: str | None,
+) -> ProfilePipelineResult:
+    """Run the pipeline for an existing profile and save the result.
+
+    Shared by PUT /profile/interests, POST /profile/refresh and their
+    background jobs. Concurrent identical runs for the user (a double-clicked
+    refresh) share one execution.
+    """
+
+    def run() -> ProfilePipelineResult:
+        result = run_profile_pipeline(
+            username=profile.get("username", "User"),
+            bio=profile.get("bio"),
+            user_interests=user_interests,
+            user_id=user_id,
+            previous=profile,
+        )
+        save_profile_with_pipeline_result(
+            user_id=user_id,
+            profile=profile,
+            result=result,
+            avatar_url=avatar_url,
+        )
+        return result
+
+    return singleflight.do(
+        singleflight.make_key("profile_pipeline", user_id, fingerprint(user_interests)),
+        run,
+        encode=asdict,
+        decode=lambda data: ProfilePipelineResult(**data),
+    )
+
+
+def ingest_profile(
+    *,
+    user_id: str,
+    request: IngestRequest,
+    interests: list[str],
+    avatar_url: str | None,
+) -> tuple[dict[str, Any], ProfilePipelineResult]:
+    """Run the pipeline for POST /ingest and create/replace the profile.
+
+    Concurrent identical submissions for the user share one execution.
+    """
+    key = singleflight.make_key(
+        "profile_ingest",
+        user_id,
+        fingerprint([request.model_dump(mode="json"), interests, avatar_url]),
+    )
+    return singleflight.do(
+        key,
+        lambda: _ingest_profile(
+            user_id=user_id, request=request, interests=interests, avatar_url=avatar_url
+        ),
+        encode=lambda value: [value[0], asdict(value[1])],
+        decode=lambda data: (data[0], ProfilePipelineResult(**data[1])),
+    )
+
+
+def _ingest_profile(
+    *,
+    user_id: str,
+    request: IngestRequest,
+    interests: list[str],
+    avatar_url: str | None,
+) -> tuple[dict[str, Any], ProfilePipelineResult]:
+    result = run_profile_pipeline(
+        username=request.username,
+        bio=request.bio,
+        user_interests=interests,
+        user_id=user_id,
+    )
+
+    metadata = {
+        "all_interests": result.all_interests,
+        "youtube_username": request.youtube_username,
+        "steam_id": request.steam_id,
+        "github_username": request.github_username,
+        "avatar_url": avatar_url,
+        PIPELINE_METADATA_KEY: result.pipeline_metadata,
+    }
+
+    profile = upsert_profile(
+        user_id=user_id,
+        username=request.username,
+        location_wkt=to_wkt(request.latitude, request.longitude),
+        embedding=result.embedding,
+        bio=request.bio,
+        ideology_score=request.ideology_score,
+        instagram_handle=request.instagram_handle,
+        marker_color=result.marker_color,
+        metadata=metadata,
+        dna_string=result.dna_string,
+        embed_model=result.embed_model,
     )
+    index_interests(user_id, result)
+    record_profile(profile)
+    return profile, result
@@ -6,18 +6,36 @@ from __future__ import annotations
 
 import asyncio
 import json
+import threading
 from typing import Any, AsyncGenerator
 
+import redis
 import redis.asyncio as aioredis
 
 from app.config import settings
 
 
+_sync_client: redis.Redis | None = None
+_sync_client_lock = threading.Lock()
+
+
 async def get_redis() -> aioredis.Redis:
     """Get async Redis connection."""
     return await aioredis.from_url(settings.redis_url, decode_responses=True)
 
 
+def get_redis_sync() -> redis.Redis:
+    """Get the shared sync Redis client (pooled, safe to use across threads)."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = redis.Redis.from_url(
+                    settings.redis_url, decode_responses=True
+                )
+    return _sync_client
+
+
 async def publish_message(user_id: str, message_data: dict[str, Any]) -> int:
     """
     Publish a message to a user's chat channel.
@@ -38,6 +56,11 @@ async def publish_message(user_id: str, message_data: dict[str, Any]) -> int:
         await redis.aclose()
 
 
+def publish_message_sync(user_id: str, message_data: dict[str, Any]) -> int:
+    """Publish to a user's chat channel from sync code (routes, job workers)."""
+    return get_redis_sync().publish(f"chat:{user_id}", json.dumps(message_data))
+
+
 async def subscribe_user(user_id: str) -> AsyncGenerator[dict[str, Any], None]:
     """
     Subscribe to a user's chat channel and yield incoming messages.
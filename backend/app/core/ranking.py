@@ -0,0 +1,192 @@
+"""
+Composite re-ranking of search candidates.
+
+POST /search over-fetches ``limit * settings.search_overfetch_factor``
+candidates from the vector index and orders them here by a weighted sum of
+three features, each in [0, 1]:
+
+* interest: cosine similarity (harmony) or 1 - similarity (contrast)
+* ideology: Gaussian in the absolute ideology difference, peaking at
+  ``IDEOLOGY_PEAK`` with width ``IDEOLOGY_SIGMA`` (0.5 when either score
+  is unknown), so some disagreement is preferred to none or too much
+* geographic: exp(-km / settings.search_geo_scale_km) in harmony, one minus
+  that in contrast (0.5 when the distance is unknown)
+
+Weights are per mode (``DEFAULT_WEIGHTS``, derived from MATCHING_WEIGHTS,
+overridable with SEARCH_HARMONY_WEIGHTS / SEARCH_CONTRAST_WEIGHTS) and
+normalized to sum to 1, so ``composite_score`` stays in [0, 1]. Everything is
+vectorized over the candidate set.
+
+A maximal marginal relevance (MMR) pass then spreads the page: the best
+``limit x settings.search_mmr_pool_factor`` candidates by composite score
+are compared pairwise (embedding cosine blended with geographic closeness,
+one (n x n) NumPy pass) and picked greedily, each pick trading its score
+against its similarity to those already picked. ``diversity`` 0 keeps the
+composite order.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.models.schemas import MATCHING_WEIGHTS, Mode
+
+IDEOLOGY_PEAK = 4.0
+IDEOLOGY_SIGMA = 2.0
+# find_contrast_matches adds min(distance, 10,000 km) / 20,000 km to the
+# cosine distance; subtracting it recovers the similarity.
+CONTRAST_GEO_CAP_M = 10_000_000.0
+CONTRAST_GEO_SCALE_M = 20_000_000.0
+
+EARTH_RADIUS_KM = 6371.0
+
+FEATURES = ("interest_similarity", "ideological_diversity", "geographic")
+DEFAULT_WEIGHTS: dict[Mode, dict[str, float]] = {
+    Mode.HARMONY: {**MATCHING_WEIGHTS, "geographic": 0.1},
+    Mode.CONTRAST: {"interest_similarity": 0.5, "ideological_diversity": 0.3, "geographic": 0.2},
+}
+
+
+@dataclass
+class Candidates:
+    """Column arrays of the over-fetched matches, in RPC order."""
+
+    user_ids: list[str]
+    similarity: np.ndarray  # cosine similarity
+    distance_km: np.ndarray  # NaN when unknown
+    ideology: np.ndarray  # NaN when unknown
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def candidates_from_matches(matches: list[dict[str, Any]]) -> Candidates:
+    """Columns from harmony (``similarity``) or contrast (``diversity``) RPC rows.
+
+    Every row also carries the candidate's ``ideology_score`` (may be null).
+    """
+    n = len(matches)
+    distance_m = np.fromiter(
+        (np.nan if m.get("distance_meters") is None else m["distance_meters"] for m in matches),
+        dtype=np.float64,
+        count=n,
+    )
+    if n and "similarity" in matches[0]:
+        similarity = np.fromiter((m["similarity"] or 0.0 for m in matches), np.float64, count=n)
+    else:
+        diversity = np.fromiter((m.get("diversity") or 0.0 for m in matches), np.float64, count=n)
+        geo = np.minimum(np.nan_to_num(distance_m), CONTRAST_GEO_CAP_M) / CONTRAST_GEO_SCALE_M
+        similarity = 1 - (diversity - geo)
+    ideology = np.fromiter(
+        (np.nan if m.get("ideology_score") is None else m["ideology_score"] for m in matches),
+        dtype=np.float64,
+        count=n,
+    )
+    return Candidates(
+        user_ids=[m["user_id"] for m in matches],
+        similarity=np.clip(similarity, 0.0, 1.0),
+        distance_km=distance_m / 1000,
+        ideology=ideology,
+    )
+
+
+def mode_weights(mode: Mode) -> np.ndarray:
+    """Normalized (interest, ideology, geographic) weights for ``mode``."""
+    overrides = (
+        settings.search_harmony_weights
+        if mode == Mode.HARMONY
+        else settings.search_contrast_weights
+    )
+    weights = {**DEFAULT_WEIGHTS[mode], **overrides}
+    vector = np.asarray([max(float(weights.get(f, 0.0)), 0.0) for f in FEATURES])
+    total = vector.sum()
+    return vector / total if total > 0 else np.asarray([1.0, 0.0, 0.0])
+
+
+def feature_matrix(candidates: Candidates, mode: Mode, own_ideology: int | None) -> np.ndarray:
+    """(n, 3) features in [0, 1], columns in ``FEATURES`` order."""
+    delta = np.abs(candidates.ideology - (np.nan if own_ideology is None else own_ideology))
+    ideology = np.exp(-((delta - IDEOLOGY_PEAK) ** 2) / (2 * IDEOLOGY_SIGMA**2))
+    ideology = np.where(np.isnan(ideology), 0.5, ideology)
+
+    proximity = np.exp(-candidates.distance_km / settings.search_geo_scale_km)
+    proximity = np.where(np.isnan(proximity), 0.5, proximity)
+
+    if mode == Mode.HARMONY:
+        return np.column_stack([candidates.similarity, ideology, proximity])
+    return np.column_stack([1 - candidates.similarity, ideology, 1 - proximity])
+
+
+def composite_scores(candidates: Candidates, mode: Mode, own_ideology: int | None) -> np.ndarray:
+    if not len(candidates):
+        return np.zeros(0)
+    return feature_matrix(candidates, mode, own_ideology) @ mode_weights(mode)
+
+
+def rerank(
+    candidates: Candidates, mode: Mode, own_ideology: int | None, limit: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """(indices of the best ``limit`` candidates, composite score of every candidate)."""
+    scores = composite_scores(candidates, mode, own_ideology)
+    # Stable, so equal scores keep the index order.
+    order = np.argsort(-scores, kind="stable")[:limit]
+    return order, scores
+
+
+# ---------------------------------------------------------------------------
+# Diversity (MMR)
+# ---------------------------------------------------------------------------
+
+
+def pairwise_similarity(embeddings: np.ndarray, coordinates: np.ndarray) -> np.ndarray:
+    """(n, n) similarity of candidates in [-1, 1].
+
+    ``embeddings`` is (n, dims), all-zero where unknown; ``coordinates`` is
+    (n, 2) latitude/longitude in degrees, NaN where unknown. Embedding cosine
+    is blended with exp(-km / settings.search_mmr_geo_scale_km) by
+    settings.search_mmr_geo_weight, so neighbors from the same archetype or
+    the same city both count as near-duplicates.
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms == 0, 1, norms)
+    cosine = unit @ unit.T
+
+    lat, lon = np.radians(coordinates[:, 0]), np.radians(coordinates[:, 1])
+    cos_lat = np.cos(lat)
+    h = (
+        np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+        + np.outer(cos_lat, cos_lat) * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2
+    )
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+    closeness = np.nan_to_num(np.exp(-km / settings.search_mmr_geo_scale_km), nan=0.0)
+
+    geo_weight = settings.search_mmr_geo_weight
+    return (1 - geo_weight) * cosine + geo_weight * closeness
+
+
+def mmr_select(
+    relevance: np.ndarray, similarity: np.ndarray, k: int, diversity: float
+) -> np.ndarray:
+    """Greedy MMR: indices of ``k`` candidates, in pick order.
+
+    Each step takes argmax (1 - diversity) * relevance - diversity * (max
+    similarity to the picks so far); the first pick is the most relevant.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if diversity <= 0 or k == n:
+        return np.argsort(-relevance, kind="stable")[:k]
+    selected = np.empty(k, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    redundancy = np.full(n, -np.inf)
+    for step in range(k):
+        gain = (1 - diversity) * relevance - diversity * np.maximum(redundancy, 0)
+        pick = int(np.argmax(np.where(available, gain, -np.inf)))
+        selected[step] = pick
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+    return selected
@@ -0,0 +1,283 @@
+"""
+Offline re-embedding of every profile, e.g. for a new embedding model.
+
+Profiles are streamed out in keyset pages (id order) of rows whose shadow
+vector is missing or was computed from another dna_string (its md5 is
+stored with the vector, supabase/migrations/018_reembed_dna_fingerprint.sql),
+so edits that leave the dna_string alone do not re-embed. They are embedded
+in batches on a bounded thread pool with retry, and written to
+``profiles.embedding_next`` one batched RPC per embedding batch. Matching keeps using ``embedding`` the
+whole time. A first call probes the model's dimension and types
+``embedding_next`` for it.
+
+The job is resumable by construction: an interrupted run leaves finished
+rows with a fresh shadow vector, and the next run only pages through what
+is still pending.
+
+The rollout (supabase/migrations/014_embedding_rollout.sql):
+
+  python -m app.core.reembed --model BAAI/bge-m3 --batch-size 64 --concurrency 4
+  psql "$DATABASE_URL" -v target=next -v dims=1024 \
+       -f supabase/scripts/build_embedding_indexes.sql
+  python -m app.core.reembed --model BAAI/bge-m3 --swap
+
+``--swap`` runs catch-up passes for profiles that changed meanwhile, then
+promotes the shadow column and its prebuilt indexes with
+``swap_profile_embeddings``, which also makes the model the active one: the
+API embeds with it from then on, no EMBED_MODEL change or redeploy needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.openrouter_logic import embed_model, get_embeddings
+from app.db.supabase_client import (
+    count_profiles_pending_reembed,
+    get_profiles_pending_reembed,
+    prepare_profile_embeddings_next,
+    set_profile_embeddings_next,
+    swap_profile_embeddings,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_CATCH_UP_PASSES = 5
+
+
+@dataclass
+class ReembedProgress:
+    """Counters reported while the job runs."""
+
+    total: int
+    started: float = field(default_factory=time.perf_counter)
+    embedded: int = 0
+    written: int = 0
+    failed_ids: list[str] = field(default_factory=list)
+    requests: int = 0
+    retries: int = 0
+    dims: int | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counts: int) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        rate = self.rate()
+        remaining = max(self.total - self.written - len(self.failed_ids), 0)
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "?"
+        return (
+            f"{self.written}/{self.total} written, {len(self.failed_ids)} failed, "
+            f"{rate:.1f} profiles/s, {self.requests} embedding calls "
+            f"({self.retries} retries), eta {eta}"
+        )
+
+
+def _embed_with_retry(
+    texts: list[str], *, model: str, max_retries: int, progress: ReembedProgress
+) -> list[list[float]]:
+    for attempt in range(max_retries + 1):
+        try:
+            progress.add(requests=1)
+            vectors = get_embeddings(texts, model=model)
+            if len(vectors) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+            return vectors
+        except Exception as exc:
+            if attempt == max_retries:
+                raise
+            progress.add(retries=1)
+            delay = min(30.0, 0.5 * 2**attempt) * (0.5 + random.random())
+            logger.warning("Embedding batch failed (%s), retrying in %.1fs", exc, delay)
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def dna_fingerprint(dna_string: str) -> str:
+    """md5 of ``dna_string``, equal to Postgres ``md5(dna_string)``."""
+    return hashlib.md5(dna_string.encode("utf-8")).hexdigest()
+
+
+def _embed_batch(
+    rows: list[dict[str, Any]], *, model: str, max_retries: int, progress: ReembedProgress
+) -> list[dict[str, Any]]:
+    """Embed one batch, splitting it in half when it keeps failing."""
+    try:
+        vectors = _embed_with_retry(
+            [row["dna_string"] for row in rows],
+            model=model,
+            max_retries=max_retries,
+            progress=progress,
+        )
+    except Exception as exc:
+        if len(rows) == 1:
+            logger.warning("Giving up on profile %s: %s", rows[0]["id"], exc)
+            with progress.lock:
+                progress.failed_ids.append(rows[0]["id"])
+            return []
+        mid = len(rows) // 2
+        return _embed_batch(
+            rows[:mid], model=model, max_retries=max_retries, progress=progress
+        ) + _embed_batch(rows[mid:], model=model, max_retries=max_retries, progress=progress)
+
+    dims = len(vectors[0])
+    with progress.lock:
+        if progress.dims is None:
+            progress.dims = dims
+    if dims != progress.dims:
+        raise ValueError(f"model returned {dims} dims, expected {progress.dims}")
+    return [
+        {"id": row["id"], "embedding": vec, "dna_md5": dna_fingerprint(row["dna_string"])}
+        for row, vec in zip(rows, vectors)
+    ]
+
+
+def _process_batch(
+    rows: list[dict[str, Any]], *, model: str, max_retries: int, progress: ReembedProgress
+) -> int:
+    embedded = _embed_batch(rows, model=model, max_retries=max_retries, progress=progress)
+    progress.add(embedded=len(embedded))
+    if not embedded:
+        return 0
+    written = set_profile_embeddings_next(embedded)
+    progress.add(written=written)
+    return written
+
+
+def reembed_pending(
+    *,
+    model: str,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    max_retries: int = 4,
+    progress_every: float = 5.0,
+) -> ReembedProgress:
+    """One pass over every pending profile. Returns the pass's counters."""
+    progress = ReembedProgress(total=count_profiles_pending_reembed())
+    logger.info("Re-embedding %d profiles with %s", progress.total, model)
+    # Enough rows per page to keep every worker busy for a couple of batches.
+    page_size = batch_size * concurrency * 2
+    after_id: str | None = None
+    last_report = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reembed") as pool:
+        while True:
+            page = get_profiles_pending_reembed(after_id, page_size)
+            if not page:
+                break
+            after_id = page[-1]["id"]
+            batches = [page[i : i + batch_size] for i in range(0, len(page), batch_size)]
+            futures = [
+                pool.submit(
+                    _process_batch,
+                    batch,
+                    model=model,
+                    max_retries=max_retries,
+                    progress=progress,
+                )
+                for batch in batches
+            ]
+            for future in as_completed(futures):
+                future.result()
+                if time.perf_counter() - last_report >= progress_every:
+                    logger.info("Re-embed progress: %s", progress.line())
+                    last_report = time.perf_counter()
+            if len(page) < page_size:
+                break
+
+    logger.info("Re-embed pass done: %s", progress.line())
+    return progress
+
+
+def prepare_shadow_column(model: str, max_retries: int = 4) -> int:
+    """Probe ``model``'s dimension and type embedding_next for it; returns dims."""
+    progress = ReembedProgress(total=0)
+    dims = len(
+        _embed_with_retry(
+            ["dimension probe"], model=model, max_retries=max_retries, progress=progress
+        )[0]
+    )
+    if prepare_profile_embeddings_next(dims):
+        logger.info("Created embedding_next as VECTOR(%d)", dims)
+    return dims
+
+
+def run_reembed(
+    *,
+    model: str,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    max_retries: int = 4,
+    swap: bool = False,
+) -> dict[str, Any]:
+    """Re-embed all pending profiles; with ``swap``, catch up and switch over."""
+    dims = prepare_shadow_column(model, max_retries)
+    progress = reembed_pending(
+        model=model, batch_size=batch_size, concurrency=concurrency, max_retries=max_retries
+    )
+    result: dict[str, Any] = {
+        "model": model,
+        "written": progress.written,
+        "failed": progress.failed_ids,
+        "profiles_per_second": round(progress.rate(), 2),
+        "dims": dims,
+        "swapped": None,
+    }
+    if not swap:
+        return result
+
+    # Profiles whose dna_string changed during the pass are pending again.
+    for _ in range(MAX_CATCH_UP_PASSES):
+        if count_profiles_pending_reembed() == 0:
+            break
+        catch_up = reembed_pending(
+            model=model, batch_size=batch_size, concurrency=concurrency, max_retries=max_retries
+        )
+        result["written"] += catch_up.written
+        result["failed"] += catch_up.failed_ids
+
+    pending = count_profiles_pending_reembed()
+    if pending:
+        raise SystemExit(f"{pending} profiles still pending; not swapping")
+    # Fails (and changes nothing) while the embedding_next indexes are missing.
+    result["swapped"] = swap_profile_embeddings(model)
+    logger.info("Swapped embedding column for %s profiles", result["swapped"])
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed all profiles into a shadow column.")
+    parser.add_argument("--model", default=None, help="Defaults to the active model")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument(
+        "--swap",
+        action="store_true",
+        help="Switch over when done (build the embedding_next indexes first)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    print(
+        run_reembed(
+            model=args.model or embed_model(),
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            swap=args.swap,
+        )
+    )
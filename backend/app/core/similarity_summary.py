@@ -0,0 +1,195 @@
+"""
+Deterministic "what do you have in common" summaries for match cards.
+
+Platform interests are tagged strings (``Recently played: Terraria``,
+``Server: CMU Esports``, ``Subscribed: FitnessFAQs``). They are parsed into
+(kind, name) pairs and normalized, then shared items are found by exact
+match and, for the rest, trigram similarity within the same kind. Matches
+are ranked like the LLM prompt asks for: games, Discord servers, YouTube
+channels, then hobbies and everything else. The result is a templated
+sentence, so the LLM is only needed for optional polish or when nothing is
+shared.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Prefix -> kind. Unknown prefixes are kept as part of a hobby name.
+PREFIX_KINDS = {
+    "recently played": "game",
+    "top owned": "game",
+    "server": "server",
+    "subscribed": "channel",
+    "youtube channel": "channel",
+    "liked": "video",
+    "starred": "repo",
+    "language": "language",
+}
+# Account names and the user's own repos are never shared interests.
+IGNORED_PREFIXES = {"discord user", "github user", "youtube creator", "connected", "repo"}
+
+# Lower ranks first; mirrors the priority order in generate_similarity_summary.
+KIND_RANK = {"game": 0, "server": 1, "channel": 2, "hobby": 3, "video": 4, "language": 5, "repo": 6}
+
+FUZZY_THRESHOLD = 0.6
+MAX_ITEMS = 4
+
+_PREFIX_RE = re.compile(r"^\s*([A-Za-z][A-Za-z ]{1,20}):\s*(.+)$")
+_SUFFIX_RE = re.compile(r"\s*\([^)]*\)\s*$")  # "Python (42% of code)"
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+
+@dataclass(frozen=True)
+class Interest:
+    kind: str
+    label: str  # display name, prefix stripped
+    key: str  # normalized name
+
+
+@dataclass(frozen=True)
+class SharedInterest:
+    kind: str
+    label: str
+    score: float  # 1.0 for exact matches, trigram similarity otherwise
+
+
+def normalize(name: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of an interest name."""
+    folded = unicodedata.normalize("NFKD", name.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(_NON_WORD_RE.sub(" ", folded).split())
+
+
+def parse_interest(raw: str) -> Interest | None:
+    """(kind, label, key) of one interest string, or None if it is not comparable."""
+    text = (raw or "").strip()
+    kind, label = "hobby", text
+    match = _PREFIX_RE.match(text)
+    if match:
+        prefix = match.group(1).strip().lower()
+        if prefix in IGNORED_PREFIXES:
+            return None
+        if prefix in PREFIX_KINDS:
+            kind, label = PREFIX_KINDS[prefix], match.group(2).strip()
+    if kind == "language":
+        label = _SUFFIX_RE.sub("", label)
+    key = normalize(label)
+    return Interest(kind, label, key) if key else None
+
+
+def parse_interests(raw: list[str]) -> list[Interest]:
+    """Parsed interests in list order, first occurrence of each (kind, key) kept."""
+    seen: set[tuple[str, str]] = set()
+    parsed = []
+    for item in raw:
+        interest = parse_interest(item)
+        if interest and (interest.kind, interest.key) not in seen:
+            seen.add((interest.kind, interest.key))
+            parsed.append(interest)
+    return parsed
+
+
+@lru_cache(maxsize=8192)
+def trigrams(key: str) -> frozenset[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces front, one back."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def find_shared_interests(
+    interests_1: list[str],
+    interests_2: list[str],
+    fuzzy_threshold: float = FUZZY_THRESHOLD,
+) -> list[SharedInterest]:
+    """Interests both lists share, best first.
+
+    Exact matches compare normalized names within a kind, so "Top owned:
+    Terraria" matches "Recently played: terraria". Remaining items of the
+    same kind match when their trigram similarity is at least
+    ``fuzzy_threshold``, each item of ``interests_2`` at most once. Labels
+    come from ``interests_1``.
+    """
+    first = parse_interests(interests_1)
+    second = parse_interests(interests_2)
+    second_keys = {(i.kind, i.key) for i in second}
+
+    shared: list[tuple[int, Interest, float]] = []
+    matched: set[tuple[str, str]] = set()
+    unmatched: list[tuple[int, Interest]] = []
+    for position, interest in enumerate(first):
+        if (interest.kind, interest.key) in second_keys:
+            matched.add((interest.kind, interest.key))
+            shared.append((position, interest, 1.0))
+        else:
+            unmatched.append((position, interest))
+
+    if fuzzy_threshold < 1.0 and unmatched:
+        candidates: dict[str, list[Interest]] = {}
+        for interest in second:
+            if (interest.kind, interest.key) not in matched:
+                candidates.setdefault(interest.kind, []).append(interest)
+        for position, interest in unmatched:
+            best, best_score = None, fuzzy_threshold
+            for other in candidates.get(interest.kind, ()):
+                if (other.kind, other.key) in matched:
+                    continue
+                score = trigram_similarity(interest.key, other.key)
+                if score >= best_score:
+                    best, best_score = other, score
+            if best is not None:
+                matched.add((best.kind, best.key))
+                shared.append((position, interest, best_score))
+
+    shared.sort(key=lambda item: (KIND_RANK[item[1].kind], -item[2], item[0]))
+    return [SharedInterest(interest.kind, interest.label, score) for _, interest, score in shared]
+
+
+_CLAUSES = {
+    "game": "play {}",
+    "server": "are in the {} Discord",
+    "channel": "watch {}",
+    "hobby": "are into {}",
+    "video": "liked {}",
+    "language": "code in {}",
+    "repo": "starred {}",
+}
+_ENDINGS = {
+    "game": "so you already have something to team up on.",
+    "server": "so you might already know each other.",
+    "channel": "which makes for an easy conversation starter.",
+}
+_DEFAULT_ENDING = "which could spark a great conversation."
+
+
+def _join(items: list[str]) -> str:
+    if len(items) <= 1:
+        return "".join(items)
+    if len(items) == 2:
+        return f"{items[0]} and {items[1]}"
+    return f"{', '.join(items[:-1])}, and {items[-1]}"
+
+
+def describe_shared_interests(shared: list[SharedInterest], max_items: int = MAX_ITEMS) -> str:
+    """One "You both ..." sentence naming up to ``max_items`` shared items."""
+    if not shared:
+        return ""
+    by_kind: dict[str, list[str]] = {}
+    for item in shared[:max_items]:
+        by_kind.setdefault(item.kind, []).append(item.label)
+    clauses = [_CLAUSES[kind].format(_join(labels)) for kind, labels in by_kind.items()]
+    ending = _ENDINGS.get(shared[0].kind, _DEFAULT_ENDING)
+    return f"You both {_join(clauses)}, {ending}"
@@ -0,0 +1,190 @@
+"""
+Single-flight deduplication of expensive calls.
+
+Concurrent calls with the same key (operation plus user, pair or inputs)
+share one execution: the first caller runs the function and the others wait
+for its result instead of repeating the work. A double-clicked refresh runs
+one pipeline; two tabs opening the same match card make one LLM call.
+
+Two scopes:
+
+* In-process (always): threads of this worker wait on the leader's result.
+* Redis (``settings.singleflight_redis_enabled`` or ``distributed=True``):
+  the leader holds ``singleflight:lock:{key}`` and publishes its result under
+  ``singleflight:result:{key}`` for a few seconds, so callers on other
+  workers poll for it. Results must be JSON-serializable (see ``encode`` /
+  ``decode``). Redis errors degrade to in-process only.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, TypeVar
+
+import redis
+
+from app.config import settings
+from app.core.pubsub import get_redis_sync
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LOCK_KEY = "singleflight:lock:{key}"
+RESULT_KEY = "singleflight:result:{key}"
+POLL_INTERVAL_SECONDS = 0.05
+
+_stats: Counter[tuple[str, str]] = Counter()
+_stats_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+_calls: dict[str, _Call] = {}
+_calls_lock = threading.Lock()
+
+
+def make_key(operation: str, *parts: Any) -> str:
+    """Build a flight key such as ``similarity_summary:<user>:<other>``."""
+    return ":".join([operation, *(str(p) for p in parts)])
+
+
+def _count(key: str, outcome: str) -> None:
+    operation = key.split(":", 1)[0]
+    with _stats_lock:
+        _stats[(operation, outcome)] += 1
+
+
+def render_prometheus() -> str:
+    """Flight counters in the Prometheus text exposition format."""
+    lines = ["# TYPE mosaic_singleflight_calls_total counter"]
+    with _stats_lock:
+        items = sorted(_stats.items())
+    for (operation, outcome), count in items:
+        lines.append(
+            f'mosaic_singleflight_calls_total{{operation="{operation}",'
+            f'outcome="{outcome}"}} {count}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+def do(
+    key: str,
+    fn: Callable[[], T],
+    *,
+    distributed: bool | None = None,
+    encode: Callable[[T], Any] = lambda value: value,
+    decode: Callable[[Any], T] = lambda value: value,
+    timeout: float | None = None,
+) -> T:
+    """
+    Run ``fn`` once for all concurrent callers of ``key``.
+
+    Waiters get the leader's result, or its exception re-raised. If the
+    leader takes longer than ``timeout`` seconds (default
+    settings.singleflight_wait_timeout_seconds) a waiter runs ``fn`` itself.
+    """
+    timeout = timeout if timeout is not None else settings.singleflight_wait_timeout_seconds
+    if distributed is None:
+        distributed = settings.singleflight_redis_enabled
+
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _calls[key] = call
+
+    if not leader:
+        _count(key, "shared")
+        if not call.done.wait(timeout):
+            logger.warning("Single-flight %s timed out waiting, running locally", key)
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        if distributed:
+            call.result = _run_distributed(key, fn, encode, decode, timeout)
+        else:
+            _count(key, "leader")
+            call.result = fn()
+        return call.result
+    except BaseException as exc:
+        call.error = exc
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
+
+
+def _run_distributed(
+    key: str,
+    fn: Callable[[], T],
+    encode: Callable[[T], Any],
+    decode: Callable[[Any], T],
+    timeout: float,
+) -> T:
+    lock_key = LOCK_KEY.format(key=key)
+    result_key = RESULT_KEY.format(key=key)
+    try:
+        client = get_redis_sync()
+        lock = client.lock(lock_key, timeout=timeout, blocking=False)
+        acquired = lock.acquire()
+        if acquired:
+            # Drop a result left by an earlier flight so waiters see ours.
+            client.delete(result_key)
+    except redis.RedisError as exc:
+        logger.warning("Single-flight lock unavailable for %s: %s", key, exc)
+        _count(key, "leader")
+        return fn()
+
+    if acquired:
+        _count(key, "leader")
+        try:
+            result = fn()
+            try:
+                client.set(
+                    result_key,
+                    json.dumps(encode(result), default=str),
+                    ex=settings.singleflight_result_ttl_seconds,
+                )
+            except (redis.RedisError, TypeError, ValueError) as exc:
+                logger.warning("Single-flight result not shared for %s: %s", key, exc)
+            return result
+        finally:
+            try:
+                lock.release()
+            except redis.RedisError as exc:
+                logger.warning("Single-flight lock release failed for %s: %s", key, exc)
+
+    # Another worker is running it: wait for its result or for the lock to go.
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline:
+            raw = client.get(result_key)
+            if raw is not None:
+                _count(key, "shared_remote")
+                return decode(json.loads(raw))
+            if not client.exists(lock_key):
+                raw = client.get(result_key)
+                if raw is not None:
+                    _count(key, "shared_remote")
+                    return decode(json.loads(raw))
+                break  # leader failed without a result
+            time.sleep(POLL_INTERVAL_SECONDS)
+    except redis.RedisError as exc:
+        logger.warning("Single-flight wait failed for %s: %s", key, exc)
+    _count(key, "leader")
+    return fn()
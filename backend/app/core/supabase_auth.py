@@ -8,6 +8,7 @@ import requests
 from fastapi import Header, HTTPException
 
 from app.config import settings
+from app.core.tracing import span
 
 
 def get_current_user(authorization: str | None = Header(default=None)) -> dict[str, Any]:
@@ -23,7 +24,8 @@ def get_current_user(authorization: str | None = Header(default=None)) -> dict[s
         "Authorization": f"Bearer {token}",
         "apikey": settings.supabase_service_role_key,
     }
-    resp = requests.get(url, headers=headers, timeout=10)
+    with span("supabase_auth", "get_user"):
+        resp = requests.get(url, headers=headers, timeout=10)
     if resp.status_code == 401:
         raise HTTPException(status_code=401, detail="Invalid or expired token.")
     resp.raise_for_status()
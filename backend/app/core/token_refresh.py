@@ -2,80 +2,259 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Iterator
 
+import redis
 from authlib.integrations.requests_client import OAuth2Session
 
-from app.core.oauth_providers import get_provider_config
+from app.config import settings
+from app.core import singleflight
+from app.core.oauth_providers import ProviderConfig, get_provider_config
+from app.core.pubsub import get_redis_sync
+from app.core.tracing import span
 from app.db.supabase_client import get_oauth_account, upsert_oauth_account
 
 logger = logging.getLogger(__name__)
 
+REFRESH_LOCK_KEY = "lock:token_refresh:{provider}:{user_id}"
 
-def refresh_google_token(user_id: str) -> str | None:
+
+class _LocalLock:
+    """In-process refresh lock plus the number of callers holding or waiting on it."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+# Entries live only while someone holds or waits on them.
+_local_locks: dict[tuple[str, str], _LocalLock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def _parse_expires_at(value: Any) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+@contextmanager
+def refresh_lock(user_id: str, provider: str) -> Iterator[bool]:
     """
-    Refresh the Google/YouTube OAuth token for a user.
-    
-    Returns the new access_token on success, or None if refresh fails.
-    The refreshed token is also saved to the database.
+    Hold the per-(user, provider) refresh lock; yields whether it was acquired.
+
+    An in-process lock serializes threads of this worker and a Redis lock
+    serializes workers, so a refresh token is only ever redeemed once at a
+    time (providers such as Discord rotate it on every refresh). Redis errors
+    fall back to the in-process lock alone.
+    """
+    timeout = settings.token_refresh_lock_timeout_seconds
+    key = (user_id, provider)
+    with _local_locks_guard:
+        local = _local_locks.get(key)
+        if local is None:
+            local = _local_locks[key] = _LocalLock()
+        local.users += 1
+    try:
+        if not local.lock.acquire(timeout=timeout):
+            yield False
+            return
+        try:
+            try:
+                lock = get_redis_sync().lock(
+                    REFRESH_LOCK_KEY.format(provider=provider, user_id=user_id),
+                    timeout=settings.token_refresh_lock_ttl_seconds,
+                    blocking_timeout=timeout,
+                )
+                acquired = lock.acquire()
+            except redis.RedisError as exc:
+                logger.warning("Token refresh lock unavailable, using local lock: %s", exc)
+                lock, acquired = None, True
+            try:
+                yield acquired
+            finally:
+                if lock is not None and acquired:
+                    try:
+                        lock.release()
+                    except redis.RedisError as exc:
+                        logger.warning("Token refresh lock release failed: %s", exc)
+        finally:
+            local.lock.release()
+    finally:
+        with _local_locks_guard:
+            local.users -= 1
+            if not local.users:
+                del _local_locks[key]
+
+
+def refresh_account_token(
+    user_id: str, provider: str, account: dict[str, Any]
+) -> str | None:
     """
-    # Google and YouTube use the same OAuth config
-    cfg = get_provider_config("google")
+    Refresh the OAuth token stored in ``account`` (a row of oauth_accounts).
+
+    ``provider`` is the name the account is stored under; the OAuth config is
+    looked up from it. Returns the new access_token on success, or None if
+    refresh fails. The refreshed token is also saved to the database.
+
+    Runs under the per-(user, provider) refresh lock. If another request or
+    the background refresher renewed the token while we waited, its token is
+    returned instead of refreshing again. Concurrent callers in this process
+    share one in-flight refresh (tokens are never shared through Redis).
+    """
+    cfg = get_provider_config(provider)
     if not cfg:
-        logger.error("Google provider config not found")
+        logger.error("%s provider config not found", provider)
         return None
-    
-    # Try google first, then youtube (they may be stored under either name)
-    account = get_oauth_account(user_id, "google")
-    provider_name = "google"
-    if not account:
-        account = get_oauth_account(user_id, "youtube")
-        provider_name = "youtube"
-    
-    if not account:
-        logger.warning("No Google/YouTube account found for user %s", user_id)
+    if not cfg.supports_refresh:
+        logger.warning("%s tokens cannot be refreshed", provider)
         return None
-    
+
+    return singleflight.do(
+        singleflight.make_key("token_refresh", provider, user_id),
+        lambda: _refresh_locked(user_id, provider, cfg, account),
+        distributed=False,
+    )
+
+
+def _refresh_locked(
+    user_id: str, provider: str, cfg: ProviderConfig, account: dict[str, Any]
+) -> str | None:
+    with refresh_lock(user_id, provider) as acquired:
+        current = get_oauth_account(user_id, provider) or account
+        stale_expiry = _parse_expires_at(account.get("expires_at"))
+        current_expiry = _parse_expires_at(current.get("expires_at"))
+        renewed = (
+            current.get("access_token")
+            and current_expiry is not None
+            and current_expiry > datetime.now(timezone.utc)
+            and (stale_expiry is None or current_expiry > stale_expiry)
+            and current.get("access_token") != account.get("access_token")
+        )
+        if renewed:
+            logger.info("%s token for user %s was already refreshed", provider, user_id)
+            return current["access_token"]
+        if not acquired:
+            logger.warning("Timed out waiting for %s refresh lock for user %s", provider, user_id)
+            return None
+        return _redeem_refresh_token(user_id, provider, cfg, current)
+
+
+def _redeem_refresh_token(
+    user_id: str, provider: str, cfg: ProviderConfig, account: dict[str, Any]
+) -> str | None:
     refresh_token = account.get("refresh_token")
     if not refresh_token:
-        logger.warning("No refresh token stored for user %s", user_id)
+        logger.warning("No %s refresh token stored for user %s", provider, user_id)
         return None
-    
+
     try:
         session = OAuth2Session(
             client_id=cfg.client_id,
             client_secret=cfg.client_secret,
             scope=cfg.scopes,
         )
-        token = session.refresh_token(
-            cfg.token_url,
-            refresh_token=refresh_token,
-        )
-        
+        with span(f"{cfg.name}_oauth", "refresh_token"):
+            token = session.refresh_token(
+                cfg.token_url,
+                refresh_token=refresh_token,
+            )
+
         access_token = token.get("access_token")
-        # Google may return a new refresh token, or we keep the old one
+        # Providers may return a new refresh token, or we keep the old one
         new_refresh_token = token.get("refresh_token", refresh_token)
         expires_in = token.get("expires_in")
         expires_at = None
         if expires_in:
             expires_at = datetime.now(timezone.utc) + timedelta(seconds=int(expires_in))
-        
+
         # Save the refreshed token to DB
         upsert_oauth_account(
             user_id=user_id,
-            provider=provider_name,
+            provider=provider,
             provider_user_id=account.get("provider_user_id", ""),
             access_token=access_token,
             refresh_token=new_refresh_token,
             expires_at=expires_at,
             raw_token=token,
         )
-        
-        logger.info("Refreshed Google token for user %s", user_id)
+
+        logger.info("Refreshed %s token for user %s", provider, user_id)
         return access_token
-        
+
     except Exception as exc:
-        logger.warning("Failed to refresh Google token for user %s: %s", user_id, exc)
+        logger.warning("Failed to refresh %s token for user %s: %s", provider, user_id, exc)
+        return None
+
+
+def refresh_oauth_token(user_id: str, provider: str) -> str | None:
+    """
+    Refresh the stored OAuth token for (user, provider).
+
+    Returns the new access_token on success, or None if refresh fails.
+    """
+    account = get_oauth_account(user_id, provider)
+    if not account:
+        logger.warning("No %s account found for user %s", provider, user_id)
         return None
+    return refresh_account_token(user_id, provider, account)
+
+
+def refresh_google_token(user_id: str) -> str | None:
+    """
+    Refresh the Google/YouTube OAuth token for a user.
+
+    Returns the new access_token on success, or None if refresh fails.
+    The refreshed token is also saved to the database.
+    """
+    # Try google first, then youtube (they may be stored under either name)
+    account = get_oauth_account(user_id, "google")
+    provider_name = "google"
+    if not account:
+        account = get_oauth_account(user_id, "youtube")
+        provider_name = "youtube"
+
+    if not account:
+        logger.warning("No Google/YouTube account found for user %s", user_id)
+        return None
+
+    return refresh_account_token(user_id, provider_name, account)
+
+
+class SharedAccessToken:
+    """
+    An access token shared by the concurrent requests of one platform fetch.
+
+    When several in-flight calls get a 401 with the same token, only the first
+    one refreshes it; the others wait on the lock and reuse the new token.
+    """
+
+    def __init__(self, user_id: str, provider: str, account: dict[str, Any]) -> None:
+        self.user_id = user_id
+        self.provider = provider
+        self.account = account
+        self.access_token: str = account["access_token"]
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, stale_token: str) -> str | None:
+        """Return a token newer than ``stale_token``, refreshing at most once."""
+        async with self._lock:
+            if self.access_token != stale_token:
+                return self.access_token
+            new_token = await asyncio.to_thread(
+                refresh_account_token, self.user_id, self.provider, self.account
+            )
+            if new_token:
+                self.access_token = new_token
+            return new_token
@@ -0,0 +1,146 @@
+"""
+Proactive OAuth token refresh.
+
+Instead of discovering an expired token through a 401 inside a user's
+request, a scheduler periodically scans ``oauth_accounts`` for tokens that
+expire within ``settings.token_refresh_window_seconds`` and refreshes them
+ahead of time. Accounts are paged by (expires_at, user_id, provider) and
+refreshed on a bounded thread pool, with a per-provider cap so one slow
+token endpoint can't take all the slots. Each refresh holds the
+per-(user, provider) lock from app.core.token_refresh, so it never races a
+reactive refresh on the same refresh token.
+
+The job worker runs the scheduler in a background thread; it can also be
+run on its own:
+  python -m app.core.token_refresher            # loop forever
+  python -m app.core.token_refresher --once     # one scan, then exit
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from app.config import settings
+from app.core.oauth_providers import get_provider_config
+from app.core.token_refresh import refresh_account_token
+from app.db.supabase_client import get_expiring_oauth_accounts
+
+logger = logging.getLogger(__name__)
+
+# Names accounts are stored under in oauth_accounts.
+REFRESHABLE_PROVIDERS = ("google", "youtube", "discord", "spotify")
+
+
+def refreshable_providers() -> list[str]:
+    """Providers whose tokens can be refreshed with the configured clients."""
+    providers = []
+    for provider in REFRESHABLE_PROVIDERS:
+        cfg = get_provider_config(provider)
+        if cfg and cfg.supports_refresh and cfg.client_id:
+            providers.append(provider)
+    return providers
+
+
+def refresh_expiring_tokens(
+    *,
+    window_seconds: int | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    provider_concurrency: int | None = None,
+) -> dict[str, Any]:
+    """
+    Refresh every token expiring within ``window_seconds``. Returns counters
+    (scanned, refreshed, failed) per provider plus the elapsed time.
+    """
+    window_seconds = window_seconds or settings.token_refresh_window_seconds
+    batch_size = batch_size or settings.token_refresh_batch_size
+    concurrency = concurrency or settings.token_refresh_concurrency
+    provider_concurrency = provider_concurrency or settings.token_refresh_provider_concurrency
+
+    providers = refreshable_providers()
+    started = time.perf_counter()
+    stats: Counter[str] = Counter()
+    stats_lock = threading.Lock()
+    provider_slots = {p: threading.BoundedSemaphore(provider_concurrency) for p in providers}
+    expires_before = datetime.now(timezone.utc) + timedelta(seconds=window_seconds)
+
+    def _refresh(account: dict[str, Any]) -> None:
+        provider = account["provider"]
+        with provider_slots[provider]:
+            token = refresh_account_token(account["user_id"], provider, account)
+        with stats_lock:
+            stats[f"{provider}.{'refreshed' if token else 'failed'}"] += 1
+
+    after: tuple[str, str, str] | None = None
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="token-refresh") as pool:
+        while providers:
+            try:
+                batch = get_expiring_oauth_accounts(
+                    expires_before=expires_before,
+                    providers=providers,
+                    after=after,
+                    limit=batch_size,
+                )
+            except Exception as exc:
+                logger.warning("Token refresh scan failed: %s", exc)
+                break
+            if not batch:
+                break
+            for account in batch:
+                stats[f"{account['provider']}.scanned"] += 1
+            # One batch in flight at a time keeps memory and DB load bounded.
+            list(pool.map(_refresh, batch))
+            last = batch[-1]
+            after = (last["expires_at"], last["user_id"], last["provider"])
+            if len(batch) < batch_size:
+                break
+
+    result: dict[str, Any] = {"elapsed_seconds": round(time.perf_counter() - started, 3)}
+    for key, count in sorted(stats.items()):
+        provider, _, outcome = key.partition(".")
+        result.setdefault(provider, {})[outcome] = count
+    return result
+
+
+def run_scheduler(
+    interval_seconds: int | None = None, stop: threading.Event | None = None
+) -> None:
+    """Scan for expiring tokens every ``interval_seconds`` until ``stop`` is set."""
+    interval_seconds = interval_seconds or settings.token_refresh_interval_seconds
+    stop = stop or threading.Event()
+    logger.info("Token refresher started (every %ss)", interval_seconds)
+    while not stop.is_set():
+        try:
+            result = refresh_expiring_tokens()
+            if len(result) > 1:
+                logger.info("Token refresh pass: %s", result)
+        except Exception:
+            logger.exception("Token refresh pass failed")
+        stop.wait(interval_seconds)
+
+
+def start_scheduler_thread(stop: threading.Event) -> threading.Thread:
+    thread = threading.Thread(
+        target=run_scheduler, kwargs={"stop": stop}, name="token-refresher", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh OAuth tokens before they expire.")
+    parser.add_argument("--once", action="store_true", help="Run a single scan and exit")
+    parser.add_argument("--interval", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        print(refresh_expiring_tokens())
+    else:
+        run_scheduler(args.interval)
@@ -0,0 +1,251 @@
+"""
+Per-request timing of outbound calls.
+
+Every call to Supabase, OpenRouter or a platform API is wrapped in a span
+labelled ``<service>.<operation>`` (e.g. ``supabase.get_profile_by_id``,
+``openrouter.embeddings``). Spans are collected per request through a
+contextvar, exported as a Server-Timing header plus one structured log line,
+and folded into process-wide latency histograms served by GET /metrics.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds in seconds, Prometheus-style (le="...").
+HISTOGRAM_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+@dataclass
+class Span:
+    """A single timed outbound call."""
+
+    name: str
+    duration: float
+    error: bool = False
+
+
+@dataclass
+class RequestTrace:
+    """Spans recorded while serving one request."""
+
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+
+_current_trace: ContextVar[RequestTrace | None] = ContextVar(
+    "current_trace", default=None
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (thread-safe)."""
+
+    def __init__(self, buckets: tuple[float, ...] = HISTOGRAM_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *, error: bool = False) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += value
+            self.count += 1
+            self.errors += int(error)
+
+    def snapshot(self) -> tuple[list[int], float, int, int]:
+        with self._lock:
+            return list(self.counts), self.total, self.count, self.errors
+
+
+_histograms: dict[tuple[str, str], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(kind: str, name: str) -> Histogram:
+    key = (kind, name)
+    hist = _histograms.get(key)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(key, Histogram())
+    return hist
+
+
+def record(kind: str, name: str, duration: float, *, error: bool = False) -> None:
+    """Add an observation to the process-wide histograms."""
+    _histogram(kind, name).observe(duration, error=error)
+
+
+@contextmanager
+def span(service: str, operation: str) -> Iterator[None]:
+    """Time an outbound call and attach it to the current request trace."""
+    name = f"{service}.{operation}"
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        record("outbound", name, duration, error=error)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(Span(name=name, duration=duration, error=error))
+
+
+def traced(service: str, operation: str | None = None) -> Callable[[F], F]:
+    """Decorator form of :func:`span`; ``operation`` defaults to the function name."""
+
+    def decorator(func: F) -> F:
+        op = operation or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(service, op):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(service, op):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def server_timing(trace: RequestTrace, total: float) -> str:
+    """Build a Server-Timing header value, aggregating repeated span names."""
+    totals: dict[str, list[float]] = {}
+    with trace.lock:
+        for s in trace.spans:
+            totals.setdefault(s.name, []).append(s.duration)
+    entries = []
+    for name, durations in totals.items():
+        entry = f"{name};dur={sum(durations) * 1000:.1f}"
+        if len(durations) > 1:
+            entry += f';desc="x{len(durations)}"'
+        entries.append(entry)
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """ASGI middleware: opens a trace per HTTP request and reports it."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - trace.started
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", server_timing(trace, total).encode("latin-1"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            total = time.perf_counter() - trace.started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("path", "")
+            name = f"{scope.get('method', '')} {path}"
+            record("http", name, total, error=status >= 500)
+            _log_request(name, status, total, trace)
+
+
+def _log_request(name: str, status: int, total: float, trace: RequestTrace) -> None:
+    with trace.lock:
+        spans = [
+            {"name": s.name, "ms": round(s.duration * 1000, 1), "error": s.error}
+            for s in trace.spans
+        ]
+    logger.info(
+        json.dumps(
+            {
+                "event": "request",
+                "route": name,
+                "status": status,
+                "duration_ms": round(total * 1000, 1),
+                "outbound_ms": round(sum(s["ms"] for s in spans), 1),
+                "spans": spans,
+            }
+        )
+    )
+
+
+def render_prometheus() -> str:
+    """Render all histograms in the Prometheus text exposition format."""
+    lines: list[str] = []
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    metric_names = {
+        "http": "mosaic_http_request_duration_seconds",
+        "outbound": "mosaic_outbound_call_duration_seconds",
+    }
+    label_names = {"http": "route", "outbound": "call"}
+    for kind, metric in metric_names.items():
+        error_metric = metric.replace("_duration_seconds", "_errors_total")
+        error_lines = [f"# TYPE {error_metric} counter"]
+        lines.append(f"# TYPE {metric} histogram")
+        for (hist_kind, name), hist in items:
+            if hist_kind != kind:
+                continue
+            counts, total, count, errors = hist.snapshot()
+            label = f'{label_names[kind]}="{name}"'
+            cumulative = 0
+            for bound, bucket_count in zip(hist.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{metric}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{metric}_count{{{label}}} {count}")
+            error_lines.append(f"{error_metric}{{{label}}} {errors}")
+        lines.extend(error_lines)
+    return "\n".join(lines) + "\n"
@@ -7,6 +7,8 @@ from urllib.parse import urlencode
 import requests
 
 from app.config import settings
+from app.core.embedding_codec import encode_embedding
+from app.core.tracing import traced
 
 OAUTH_TABLE = "oauth_accounts"
 PROFILES_TABLE = "profiles"
@@ -24,6 +26,7 @@ def _headers() -> dict[str, str]:
     }
 
 
+@traced("supabase")
 def upsert_oauth_account(
     *,
     user_id: str,
@@ -55,6 +58,7 @@ def upsert_oauth_account(
     return data[0] if isinstance(data, list) and data else payload
 
 
+@traced("supabase")
 def get_oauth_account(user_id: str, provider: str) -> Optional[dict[str, Any]]:
     url = f"{_rest_base()}/{OAUTH_TABLE}"
     query = {
@@ -68,6 +72,46 @@ def get_oauth_account(user_id: str, provider: str) -> Optional[dict[str, Any]]:
     return data[0] if isinstance(data, list) and data else None
 
 
+@traced("supabase")
+def get_expiring_oauth_accounts(
+    *,
+    expires_before: datetime,
+    providers: list[str],
+    after: tuple[str, str, str] | None = None,
+    limit: int = 100,
+) -> list[dict[str, Any]]:
+    """
+    OAuth accounts with a refresh token whose access token expires before
+    ``expires_before``, ordered by (expires_at, user_id, provider).
+
+    ``after`` is the (expires_at, user_id, provider) of the last row of the
+    previous page (keyset pagination).
+    """
+    if not providers:
+        return []
+    url = f"{_rest_base()}/{OAUTH_TABLE}"
+    query: dict[str, Any] = {
+        "select": "user_id,provider,provider_user_id,refresh_token,expires_at",
+        "provider": f"in.({','.join(providers)})",
+        "refresh_token": "not.is.null",
+        "expires_at": f"lt.{expires_before.isoformat()}",
+        "order": "expires_at.asc,user_id.asc,provider.asc",
+        "limit": limit,
+    }
+    if after:
+        ts, uid, prov = after
+        query["or"] = (
+            f'(expires_at.gt."{ts}",'
+            f'and(expires_at.eq."{ts}",user_id.gt.{uid}),'
+            f'and(expires_at.eq."{ts}",user_id.eq.{uid},provider.gt.{prov}))'
+        )
+    resp = requests.get(url + "?" + urlencode(query), headers=_headers(), timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    return data if isinstance(data, list) else []
+
+
+@traced("supabase")
 def get_connected_providers(user_id: str) -> list[str]:
     """Get list of OAuth providers connected by a user."""
     url = f"{_rest_base()}/{OAUTH_TABLE}"
@@ -81,6 +125,7 @@ def get_connected_providers(user_id: str) -> list[str]:
     return [row["provider"] for row in data] if isinstance(data, list) else []
 
 
+@traced("supabase")
 def upsert_profile(
     *,
     user_id: Optional[str] = None,
@@ -93,7 +138,14 @@ def upsert_profile(
     marker_color: Optional[str] = None,
     metadata: Optional[dict[str, Any]] = None,
     dna_string: Optional[str] = None,
+    embed_model: Optional[str] = None,
 ) -> dict[str, Any]:
+    """Insert or update a profile.
+
+    ``embed_model`` names the model ``embedding`` was made with; the database
+    keeps the stored vector instead when it is not the active model (see
+    supabase/migrations/014_embedding_rollout.sql).
+    """
     payload: dict[str, Any] = {
         "username": username,
         "bio": bio,
@@ -113,12 +165,15 @@ def upsert_profile(
     headers = _headers() | {
         "Prefer": "resolution=merge-duplicates,return=representation"
     }
+    if embed_model:
+        headers["X-Embed-Model"] = embed_model
     resp = requests.post(url, params=params, json=payload, headers=headers, timeout=20)
     resp.raise_for_status()
     data = resp.json()
     return data[0] if isinstance(data, list) and data else payload
 
 
+@traced("supabase")
 def get_profile_by_id(user_id: str) -> Optional[dict[str, Any]]:
     url = f"{_rest_base()}/{PROFILES_TABLE}"
     query = {"id": f"eq.{user_id}", "limit": 1}
@@ -128,6 +183,7 @@ def get_profile_by_id(user_id: str) -> Optional[dict[str, Any]]:
     return data[0] if isinstance(data, list) and data else None
 
 
+@traced("supabase")
 def update_profile(
     user_id: str,
     *,
@@ -158,56 +214,374 @@ def update_profile(
     return data[0] if isinstance(data, list) and data else None
 
 
-def get_profiles_by_ids(user_ids: list[str]) -> list[dict[str, Any]]:
+@traced("supabase")
+def get_profiles_by_ids(user_ids: list[str], select: str = "*") -> list[dict[str, Any]]:
+    """Profiles with the given ids; ``select`` narrows the columns (e.g. "id,ideology_score")."""
     if not user_ids:
         return []
     url = f"{_rest_base()}/{PROFILES_TABLE}"
     id_list = ",".join(user_ids)
-    query = {"id": f"in.({id_list})"}
+    query = {"select": select, "id": f"in.({id_list})"}
     resp = requests.get(url + "?" + urlencode(query), headers=_headers(), timeout=10)
     resp.raise_for_status()
     data = resp.json()
     return data if isinstance(data, list) else []
 
 
+def hnsw_ef_search(candidates: int) -> int:
+    """ef_search for a query that needs ``candidates`` rows from the HNSW index.
+
+    HNSW returns at most ef_search rows, so it must cover the candidates;
+    beyond that the factor buys recall for latency.
+    """
+    ef_search = max(int(candidates * settings.hnsw_ef_search_factor), candidates)
+    return max(settings.hnsw_ef_search_min, min(ef_search, settings.hnsw_ef_search_max))
+
+
+@traced("supabase")
 def find_harmony_matches(
     *,
     query_embedding: list[float],
     user_location_wkt: str,
     limit: int = 10,
+    exclude_user_id: Optional[str] = None,
+    max_distance_meters: Optional[float] = None,
 ) -> list[dict[str, Any]]:
-    url = f"{_rest_base()}/rpc/find_harmony_matches"
-    payload = {
-        "query_embedding": query_embedding,
-        "user_location": user_location_wkt,
-        "match_limit": limit,
+    """Nearest profiles by embedding, with the filters applied in SQL.
+
+    The HNSW scan is iterative: it keeps pulling candidates until ``limit``
+    rows pass the filters or settings.hnsw_max_scan_tuples is reached.
+    """
+    encoding = settings.embedding_wire_encoding
+    index_mode = settings.embedding_index_mode
+    filters = {
+        "exclude_user_id": exclude_user_id,
+        "max_distance_meters": max_distance_meters,
+        "max_scan_tuples": settings.hnsw_max_scan_tuples,
     }
+    if encoding == "json" and index_mode == "vector":
+        url = f"{_rest_base()}/rpc/find_harmony_matches"
+        payload: dict[str, Any] = {
+            "query_embedding": query_embedding,
+            "user_location": user_location_wkt,
+            "match_limit": limit,
+            "ef_search": hnsw_ef_search(limit),
+            **filters,
+        }
+    else:
+        # Compact RPC: base64 query and/or a quantized index with re-ranking
+        encoding = "f32" if encoding == "json" else encoding
+        url = f"{_rest_base()}/rpc/find_harmony_matches_compact"
+        payload = {
+            "query_embedding": encode_embedding(query_embedding, encoding),
+            "embedding_encoding": encoding,
+            "user_location": user_location_wkt,
+            "match_limit": limit,
+            "index_mode": index_mode,
+            "rerank_factor": settings.embedding_rerank_factor,
+            "ef_search": hnsw_ef_search(
+                limit if index_mode == "vector" else limit * settings.embedding_rerank_factor
+            ),
+            **filters,
+        }
     resp = requests.post(url, json=payload, headers=_headers(), timeout=20)
     resp.raise_for_status()
     data = resp.json()
     return data if isinstance(data, list) else []
 
 
+@traced("supabase")
 def find_contrast_matches(
     *,
     query_embedding: list[float],
     user_location_wkt: str,
     min_distance_meters: float = 5_000_000,
     limit: int = 10,
+    exclude_user_id: Optional[str] = None,
+    max_distance_meters: Optional[float] = None,
 ) -> list[dict[str, Any]]:
+    encoding = settings.embedding_wire_encoding
     url = f"{_rest_base()}/rpc/find_contrast_matches"
-    payload = {
+    payload: dict[str, Any] = {
         "query_embedding": query_embedding,
         "user_location": user_location_wkt,
         "min_distance_meters": min_distance_meters,
         "match_limit": limit,
+        "exclude_user_id": exclude_user_id,
+        "max_distance_meters": max_distance_meters,
     }
+    if encoding != "json":
+        url = f"{_rest_base()}/rpc/find_contrast_matches_compact"
+        payload["query_embedding"] = encode_embedding(query_embedding, encoding)
+        payload["embedding_encoding"] = encoding
     resp = requests.post(url, json=payload, headers=_headers(), timeout=20)
     resp.raise_for_status()
     data = resp.json()
     return data if isinstance(data, list) else []
 
 
+# ============================================================================
+# Re-embedding (shadow column, see supabase/migrations/005_reembedding.sql)
+# ============================================================================
+
+
+def _rpc(name: str, payload: dict[str, Any], timeout: float = 30) -> Any:
+    url = f"{_rest_base()}/rpc/{name}"
+    resp = requests.post(url, json=payload, headers=_headers(), timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _select(relation: str, query: dict[str, Any], timeout: float = 10) -> list[dict[str, Any]]:
+    url = f"{_rest_base()}/{relation}"
+    resp = requests.get(url + "?" + urlencode(query), headers=_headers(), timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    return data if isinstance(data, list) else []
+
+
+@traced("supabase")
+def get_profiles_pending_reembed(
+    after_id: Optional[str] = None, limit: int = 500
+) -> list[dict[str, Any]]:
+    """Keyset page of (id, dna_string) whose shadow embedding is missing or was
+    computed from another dna_string."""
+    data = _rpc("profiles_pending_reembed", {"after_id": after_id, "page_size": limit})
+    return data if isinstance(data, list) else []
+
+
+@traced("supabase")
+def count_profiles_pending_reembed() -> int:
+    return int(_rpc("count_profiles_pending_reembed", {}) or 0)
+
+
+@traced("supabase")
+def set_profile_embeddings_next(rows: list[dict[str, Any]]) -> int:
+    """Write shadow embeddings in one statement; rows are {"id", "embedding",
+    "dna_md5"}, the last being md5 of the dna_string that was embedded."""
+    if not rows:
+        return 0
+    return int(_rpc("set_profile_embeddings_next", {"rows": rows}, timeout=60) or 0)
+
+
+@traced("supabase")
+def prepare_profile_embeddings_next(dims: int) -> bool:
+    """Type embedding_next as VECTOR(dims); True if the column was (re)created empty."""
+    return bool(_rpc("prepare_profile_embeddings_next", {"dims": dims}))
+
+
+@traced("supabase")
+def swap_profile_embeddings(model: str) -> int:
+    """Promote embedding_next (and its prebuilt indexes) to embedding and make
+    ``model`` the active embedding model; returns the swapped row count."""
+    return int(_rpc("swap_profile_embeddings", {"model": model}, timeout=60) or 0)
+
+
+@traced("supabase")
+def get_active_embed_model() -> Optional[str]:
+    """Model recorded by the last swap (embedding_config), None before any swap."""
+    rows = _select("embedding_config", {"select": "active_model", "limit": 1})
+    return rows[0]["active_model"] if rows else None
+
+
+# ============================================================================
+# Cluster recolor (app/core/clusters.py, app/core/cluster_centroids.py;
+# supabase/migrations/012_marker_colors.sql, 013_cluster_centroids.sql)
+# ============================================================================
+
+
+@traced("supabase")
+def get_profile_clusters_page(
+    after_id: Optional[str] = None, limit: int = 5000, with_embedding: bool = True
+) -> list[dict[str, Any]]:
+    """Keyset page (id order) of (id, marker_color, all_interests[, embedding])."""
+    columns = "id,marker_color,all_interests:metadata->all_interests"
+    query: dict[str, Any] = {
+        "select": columns + (",embedding" if with_embedding else ""),
+        "order": "id.asc",
+        "limit": limit,
+    }
+    if after_id:
+        query["id"] = f"gt.{after_id}"
+    return _select(PROFILES_TABLE, query, timeout=60)
+
+
+@traced("supabase")
+def set_marker_colors(rows: list[dict[str, Any]]) -> int:
+    """Batch-update marker colors; ``rows`` are {"id", "marker_color"}. Returns rows changed."""
+    if not rows:
+        return 0
+    return int(_rpc("set_marker_colors", {"rows": rows}, timeout=60) or 0)
+
+
+@traced("supabase")
+def get_cluster_centroids(embed_model: str) -> list[dict[str, Any]]:
+    """Stored marker color centroids (idx order) learned for ``embed_model``."""
+    query = {
+        "select": "idx,cluster,marker_color,centroid",
+        "embed_model": f"eq.{embed_model}",
+        "order": "idx.asc",
+    }
+    return _select("cluster_centroids", query)
+
+
+@traced("supabase")
+def replace_cluster_centroids(rows: list[dict[str, Any]]) -> int:
+    """Swap in a new set of centroids atomically."""
+    return int(_rpc("replace_cluster_centroids", {"rows": rows}, timeout=60) or 0)
+
+
+# ============================================================================
+# Map tiles (see supabase/migrations/009_map_tiles.sql)
+# ============================================================================
+
+
+@traced("supabase")
+def get_profile_markers_page(
+    after_id: Optional[str] = None, limit: int = 5000
+) -> list[dict[str, Any]]:
+    """Keyset page (id order) of (id, location, marker_color) for every profile."""
+    url = f"{_rest_base()}/{PROFILES_TABLE}"
+    query: dict[str, Any] = {
+        "select": "id,location,marker_color",
+        "order": "id.asc",
+        "limit": limit,
+    }
+    if after_id:
+        query["id"] = f"gt.{after_id}"
+    resp = requests.get(url + "?" + urlencode(query), headers=_headers(), timeout=30)
+    resp.raise_for_status()
+    data = resp.json()
+    return data if isinstance(data, list) else []
+
+
+@traced("supabase")
+def get_map_markers(
+    bbox: tuple[float, float, float, float], limit: int = 5000
+) -> list[dict[str, Any]]:
+    """(id, lat, lon, marker_color) of profiles inside (min_lon, min_lat, max_lon, max_lat)."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    payload = {
+        "min_lon": min_lon,
+        "min_lat": min_lat,
+        "max_lon": max_lon,
+        "max_lat": max_lat,
+        "max_markers": limit,
+    }
+    data = _rpc("map_markers_in_bbox", payload, timeout=10)
+    return data if isinstance(data, list) else []
+
+
+@traced("supabase")
+def get_map_clusters(
+    bbox: tuple[float, float, float, float], world_cells: int
+) -> list[dict[str, Any]]:
+    """Profiles inside ``bbox`` grouped on a world_cells x world_cells Mercator grid."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    payload = {
+        "min_lon": min_lon,
+        "min_lat": min_lat,
+        "max_lon": max_lon,
+        "max_lat": max_lat,
+        "world_cells": world_cells,
+    }
+    data = _rpc("map_clusters_in_bbox", payload, timeout=10)
+    return data if isinstance(data, list) else []
+
+
+# ============================================================================
+# Analytics rollups (see supabase/migrations/010_analytics.sql,
+# 015_incremental_analytics.sql)
+# ============================================================================
+
+
+@traced("supabase")
+def get_analytics_clusters() -> list[dict[str, Any]]:
+    return _select("analytics_clusters", {"order": "users.desc"})
+
+
+@traced("supabase")
+def get_analytics_regions() -> list[dict[str, Any]]:
+    return _select("analytics_regions", {"order": "users.desc"})
+
+
+@traced("supabase")
+def get_analytics_top_interests(limit: int = 20) -> list[dict[str, Any]]:
+    return _select("analytics_top_interests", {"order": "users.desc", "limit": limit})
+
+
+@traced("supabase")
+def get_analytics_message_daily(since: str) -> list[dict[str, Any]]:
+    """Daily message/conversation rollups from ``since`` (YYYY-MM-DD) on, oldest first."""
+    return _select("analytics_message_daily", {"day": f"gte.{since}", "order": "day.asc"})
+
+
+@traced("supabase")
+def get_analytics_totals() -> dict[str, int]:
+    return {row["metric"]: row["value"] for row in _select("analytics_totals", {})}
+
+
+@traced("supabase")
+def get_analytics_refreshed_at() -> dict[str, Optional[str]]:
+    return {row["name"]: row.get("refreshed_at") for row in _select("analytics_state", {})}
+
+
+@traced("supabase")
+def refresh_analytics() -> dict[str, Any]:
+    """Bring the rollups up to date (skipped if another refresh is running)."""
+    return _rpc("refresh_analytics", {}, timeout=300) or {}
+
+
+# ============================================================================
+# Interest index (see supabase/migrations/011_interest_index.sql)
+# ============================================================================
+
+
+@traced("supabase")
+def sync_user_interests(
+    user_id: str, interests: list[str], platform: dict[str, list[str]] | None = None
+) -> int:
+    """Replace the user's rows in the interest index; returns how many they have.
+
+    ``platform`` maps youtube/steam/discord/github to the interests fetched
+    from each and only decides the recorded source.
+    """
+    payload = {"p_user_id": user_id, "interests": interests, "platform": platform or {}}
+    return int(_rpc("sync_user_interests", payload) or 0)
+
+
+@traced("supabase")
+def get_users_sharing_interest(
+    interest: str,
+    limit: int = 50,
+    exclude_user_id: Optional[str] = None,
+    after_user_id: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """Keyset page (id order) of the interest's holders, after ``after_user_id``."""
+    payload = {
+        "target_interest": interest,
+        "max_results": limit,
+        "exclude_user_id": exclude_user_id,
+        "after_user_id": after_user_id,
+    }
+    return _rpc("users_sharing_interest", payload) or []
+
+
+@traced("supabase")
+def get_co_occurring_interests(interest: str, limit: int = 20) -> list[dict[str, Any]]:
+    payload = {"target_interest": interest, "max_results": limit}
+    return _rpc("co_occurring_interests", payload) or []
+
+
+@traced("supabase")
+def get_interest_overlap(user_a: str, user_b: str) -> dict[str, Any]:
+    """Shared interest count and labels, plus each user's interest count."""
+    rows = _rpc("interest_overlap", {"user_a": user_a, "user_b": user_b}) or []
+    if not rows:
+        return {"shared": 0, "a_total": 0, "b_total": 0, "interests": []}
+    return rows[0]
+
+
 # ============================================================================
 # Messages
 # ============================================================================
@@ -215,6 +589,7 @@ def find_contrast_matches(
 MESSAGES_TABLE = "messages"
 
 
+@traced("supabase")
 def insert_message(
     *,
     sender_id: str,
@@ -235,6 +610,7 @@ def insert_message(
     return data[0] if isinstance(data, list) and data else payload
 
 
+@traced("supabase")
 def get_messages_between(
     user_a: str,
     user_b: str,
@@ -259,6 +635,7 @@ def get_messages_between(
     return data if isinstance(data, list) else []
 
 
+@traced("supabase")
 def get_conversations(user_id: str) -> list[dict[str, Any]]:
     """
     Get all conversations for a user with the latest message and unread count.
@@ -312,6 +689,7 @@ def get_conversations(user_id: str) -> list[dict[str, Any]]:
     return result
 
 
+@traced("supabase")
 def mark_messages_read(user_id: str, sender_id: str) -> int:
     """
     Mark all unread messages from sender_id to user_id as read.
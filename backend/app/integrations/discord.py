@@ -1,41 +1,280 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Any
 
-import requests
+import httpx
 
+from app.core.background_loop import run_async, run_sync
+from app.core.token_refresh import SharedAccessToken
+from app.core.tracing import span
 from app.db.supabase_client import get_oauth_account
 
 logger = logging.getLogger(__name__)
 
 DISCORD_API_BASE = "https://discord.com/api/v10"
 
+# Wait for a rate-limit window to reset only if it is this close; otherwise
+# give up on the call rather than stall the user's request.
+MAX_RATE_LIMIT_WAIT_SECONDS = 5.0
+# Buckets are per user; beyond this many the limiter forgets reset windows
+# first, then the least recently used buckets.
+MAX_RATE_LIMIT_BUCKETS = 10_000
+
+
+class DiscordRateLimited(Exception):
+    """Raised when a route stays rate limited for longer than we will wait."""
+
 
 def _get_discord_account(user_id: str) -> dict[str, Any] | None:
     return get_oauth_account(user_id, "discord")
 
 
-def _make_discord_request(
-    url: str,
-    headers: dict[str, str],
-    user_id: str,
-) -> requests.Response | None:
+@dataclass
+class _Bucket:
+    remaining: int | None = None
+    reset_at: float = 0.0  # time.monotonic()
+
+
+@dataclass
+class DiscordRateLimiter:
     """
-    Make a Discord API request.
-    Returns the response on success, or None if the request fails.
+    Per-route rate-limit buckets built from Discord's X-RateLimit-* headers.
+
+    Discord groups routes into buckets (X-RateLimit-Bucket) per token, so
+    buckets are keyed by (user_id, bucket). Before a request we wait out an
+    exhausted bucket instead of sending a request we know will 429.
+
+    Both maps are LRU-ordered and capped at ``max_buckets``; a bucket whose
+    window has reset carries no information and is the first to go.
     """
-    try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        
-        if resp.status_code == 401:
-            logger.warning("Discord token expired for user %s", user_id)
-            return None
-        
-        return resp
-    except requests.RequestException as exc:
-        logger.warning("Discord request failed for user %s: %s", user_id, exc)
+
+    max_wait: float = MAX_RATE_LIMIT_WAIT_SECONDS
+    max_buckets: int = MAX_RATE_LIMIT_BUCKETS
+    _route_buckets: OrderedDict[tuple[str, str], str] = field(default_factory=OrderedDict)
+    _buckets: OrderedDict[tuple[str, str], _Bucket] = field(default_factory=OrderedDict)
+    _global_reset_at: float = 0.0
+
+    def _bucket(self, user_id: str, route: str) -> _Bucket:
+        bucket_id = self._route_buckets.get((user_id, route), route)
+        key = (user_id, bucket_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+            self._prune()
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _prune(self) -> None:
+        """Shrink both maps to 90% of ``max_buckets`` once they exceed it."""
+        target = int(self.max_buckets * 0.9)
+        if len(self._buckets) > self.max_buckets:
+            now = time.monotonic()
+            for key in [k for k, b in self._buckets.items() if b.reset_at <= now]:
+                del self._buckets[key]
+            while len(self._buckets) > target:
+                self._buckets.popitem(last=False)
+        if len(self._route_buckets) > self.max_buckets:
+            while len(self._route_buckets) > target:
+                self._route_buckets.popitem(last=False)
+
+    async def acquire(self, user_id: str, route: str) -> None:
+        bucket = self._bucket(user_id, route)
+        now = time.monotonic()
+        reset_at = self._global_reset_at
+        if bucket.remaining == 0:
+            reset_at = max(reset_at, bucket.reset_at)
+        delay = reset_at - now
+        if delay > self.max_wait:
+            raise DiscordRateLimited(f"{route} rate limited for {delay:.1f}s")
+        if delay > 0:
+            logger.info("Discord %s: waiting %.2fs for rate limit reset", route, delay)
+            await asyncio.sleep(delay)
+            bucket.remaining = None
+        elif bucket.remaining is not None and bucket.remaining > 0:
+            # Reserve a slot so concurrent calls on one bucket don't overshoot.
+            bucket.remaining -= 1
+
+    def update(self, user_id: str, route: str, resp: httpx.Response) -> float:
+        """Record the response's rate-limit headers; returns retry delay on 429."""
+        headers = resp.headers
+        now = time.monotonic()
+        bucket_id = headers.get("X-RateLimit-Bucket")
+        if bucket_id:
+            self._route_buckets[(user_id, route)] = bucket_id
+            self._route_buckets.move_to_end((user_id, route))
+        bucket = self._bucket(user_id, route)
+        if headers.get("X-RateLimit-Remaining") is not None:
+            bucket.remaining = int(headers["X-RateLimit-Remaining"])
+        if headers.get("X-RateLimit-Reset-After") is not None:
+            bucket.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+
+        if resp.status_code != 429:
+            return 0.0
+        retry_after = float(headers.get("Retry-After") or 0)
+        try:
+            retry_after = float(resp.json().get("retry_after", retry_after))
+        except ValueError:
+            pass
+        if headers.get("X-RateLimit-Global") == "true":
+            self._global_reset_at = now + retry_after
+        else:
+            bucket.remaining = 0
+            bucket.reset_at = max(bucket.reset_at, now + retry_after)
+        return retry_after
+
+
+class DiscordClient:
+    """Discord REST client over one pooled httpx.AsyncClient (background loop)."""
+
+    def __init__(self, *, timeout: float = 10) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=DISCORD_API_BASE,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        self.rate_limiter = DiscordRateLimiter()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def get(self, route: str, token: SharedAccessToken) -> httpx.Response | None:
+        """
+        GET a Discord route with rate-limit waiting, one 429 retry and one
+        token refresh on 401. Returns None if the request fails.
+        """
+        user_id = token.user_id
+        refreshed = retried = False
+        while True:
+            access_token = token.access_token
+            try:
+                await self.rate_limiter.acquire(user_id, route)
+                with span("discord", route.strip("/")):
+                    resp = await self._client.get(
+                        route, headers={"Authorization": f"Bearer {access_token}"}
+                    )
+            except DiscordRateLimited as exc:
+                logger.warning("Discord rate limited for user %s: %s", user_id, exc)
+                return None
+            except httpx.HTTPError as exc:
+                logger.warning("Discord request failed for user %s: %s", user_id, exc)
+                return None
+
+            retry_after = self.rate_limiter.update(user_id, route, resp)
+            if resp.status_code == 429:
+                if retried or retry_after > self.rate_limiter.max_wait:
+                    logger.warning(
+                        "Discord %s rate limited for user %s (retry after %.1fs)",
+                        route,
+                        user_id,
+                        retry_after,
+                    )
+                    return None
+                retried = True
+                continue
+
+            if resp.status_code == 401:
+                if refreshed:
+                    logger.warning(
+                        "Discord request still unauthorized after refresh for user %s",
+                        user_id,
+                    )
+                    return None
+                logger.info("Discord token expired for user %s, attempting refresh...", user_id)
+                refreshed = True
+                if not await token.refresh(access_token):
+                    logger.warning("Failed to refresh Discord token for user %s", user_id)
+                    return None
+                continue
+
+            return resp
+
+    async def guilds(self, token: SharedAccessToken, max_guilds: int = 20) -> list[str]:
+        resp = await self.get("/users/@me/guilds", token)
+        if not resp or not resp.is_success:
+            return []
+        try:
+            guild_names = [g.get("name") for g in resp.json() if g.get("name")]
+            return guild_names[:max_guilds]
+        except Exception as exc:
+            logger.warning("Failed to parse Discord guilds for user %s: %s", token.user_id, exc)
+            return []
+
+    async def connections(self, token: SharedAccessToken) -> list[str]:
+        resp = await self.get("/users/@me/connections", token)
+        if not resp or not resp.is_success:
+            return []
+        try:
+            connection_strs = []
+            for conn in resp.json():
+                platform = conn.get("type", "Unknown")
+                name = conn.get("name", "")
+                if name:
+                    connection_strs.append(f"{platform}: {name}")
+            return connection_strs
+        except Exception as exc:
+            logger.warning(
+                "Failed to parse Discord connections for user %s: %s", token.user_id, exc
+            )
+            return []
+
+    async def user(self, token: SharedAccessToken) -> dict[str, Any]:
+        resp = await self.get("/users/@me", token)
+        if not resp or not resp.is_success:
+            return {}
+        try:
+            return resp.json()
+        except Exception as exc:
+            logger.warning("Failed to parse Discord user for user %s: %s", token.user_id, exc)
+            return {}
+
+    async def interests(self, token: SharedAccessToken, max_guilds: int = 15) -> list[str]:
+        """User, guilds and connections fetched concurrently."""
+        user_data, guilds, connections = await asyncio.gather(
+            self.user(token),
+            self.guilds(token, max_guilds),
+            self.connections(token),
+        )
+        interests: list[str] = []
+        username = user_data.get("username") or user_data.get("global_name")
+        if username:
+            interests.append(f"Discord user: {username}")
+        for guild in guilds:
+            interests.append(f"Server: {guild}")
+        for conn in connections:
+            interests.append(f"Connected: {conn}")
+        return interests
+
+
+_client: DiscordClient | None = None
+
+
+def _get_client() -> DiscordClient:
+    # Only ever called on the background loop, so no lock is needed.
+    global _client
+    if _client is None:
+        _client = DiscordClient()
+    return _client
+
+
+def _user_token(user_id: str) -> SharedAccessToken | None:
+    account = _get_discord_account(user_id)
+    if not account or not account.get("access_token"):
+        logger.warning("No Discord OAuth account or access token for user %s", user_id)
         return None
+    return SharedAccessToken(user_id, "discord", account)
+
+
+def _run(method: str, token: SharedAccessToken, *args: Any) -> Any:
+    async def call() -> Any:
+        return await getattr(_get_client(), method)(token, *args)
+
+    return run_sync(call())
 
 
 def fetch_discord_guilds(user_id: str, max_guilds: int = 20) -> list[str]:
@@ -43,30 +282,8 @@ def fetch_discord_guilds(user_id: str, max_guilds: int = 20) -> list[str]:
     Fetch the user's Discord servers (guilds).
     Returns a list of guild names.
     """
-    account = _get_discord_account(user_id)
-    if not account or not account.get("access_token"):
-        logger.warning("No Discord OAuth account or access token for user %s", user_id)
-        return []
-
-    access_token = account["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
-    resp = _make_discord_request(
-        f"{DISCORD_API_BASE}/users/@me/guilds",
-        headers,
-        user_id,
-    )
-    
-    if not resp or not resp.ok:
-        return []
-    
-    try:
-        guilds = resp.json()
-        guild_names = [g.get("name") for g in guilds if g.get("name")]
-        return guild_names[:max_guilds]
-    except Exception as exc:
-        logger.warning("Failed to parse Discord guilds for user %s: %s", user_id, exc)
-        return []
+    token = _user_token(user_id)
+    return _run("guilds", token, max_guilds) if token else []
 
 
 def fetch_discord_connections(user_id: str) -> list[str]:
@@ -74,35 +291,8 @@ def fetch_discord_connections(user_id: str) -> list[str]:
     Fetch the user's connected accounts (Spotify, Steam, GitHub, etc.).
     Returns a list of connection descriptions.
     """
-    account = _get_discord_account(user_id)
-    if not account or not account.get("access_token"):
-        logger.warning("No Discord OAuth account or access token for user %s", user_id)
-        return []
-
-    access_token = account["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
-    resp = _make_discord_request(
-        f"{DISCORD_API_BASE}/users/@me/connections",
-        headers,
-        user_id,
-    )
-    
-    if not resp or not resp.ok:
-        return []
-    
-    try:
-        connections = resp.json()
-        connection_strs = []
-        for conn in connections:
-            platform = conn.get("type", "Unknown")
-            name = conn.get("name", "")
-            if name:
-                connection_strs.append(f"{platform}: {name}")
-        return connection_strs
-    except Exception as exc:
-        logger.warning("Failed to parse Discord connections for user %s: %s", user_id, exc)
-        return []
+    token = _user_token(user_id)
+    return _run("connections", token) if token else []
 
 
 def fetch_discord_user(user_id: str) -> dict[str, Any]:
@@ -110,52 +300,28 @@ def fetch_discord_user(user_id: str) -> dict[str, Any]:
     Fetch the user's Discord profile info.
     Returns user data dict with username, avatar, etc.
     """
-    account = _get_discord_account(user_id)
-    if not account or not account.get("access_token"):
-        logger.warning("No Discord OAuth account or access token for user %s", user_id)
-        return {}
-
-    access_token = account["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
-    resp = _make_discord_request(
-        f"{DISCORD_API_BASE}/users/@me",
-        headers,
-        user_id,
-    )
-    
-    if not resp or not resp.ok:
-        return {}
-    
-    try:
-        return resp.json()
-    except Exception as exc:
-        logger.warning("Failed to parse Discord user for user %s: %s", user_id, exc)
-        return {}
+    token = _user_token(user_id)
+    return _run("user", token) if token else {}
 
 
 def fetch_discord_interests(user_id: str, max_guilds: int = 15) -> list[str]:
     """
     Convenience function that aggregates Discord interests.
-    Fetches guilds (servers) and connected accounts.
+    Fetches the user, guilds (servers) and connected accounts concurrently
+    with a single account lookup.
     Returns a list of interest strings.
     """
-    interests: list[str] = []
-    
-    # Get user info
-    user_data = fetch_discord_user(user_id)
-    username = user_data.get("username") or user_data.get("global_name")
-    if username:
-        interests.append(f"Discord user: {username}")
-    
-    # Get guilds (servers)
-    guilds = fetch_discord_guilds(user_id, max_guilds)
-    for guild in guilds:
-        interests.append(f"Server: {guild}")
-    
-    # Get connected accounts
-    connections = fetch_discord_connections(user_id)
-    for conn in connections:
-        interests.append(f"Connected: {conn}")
-    
-    return interests
+    token = _user_token(user_id)
+    return _run("interests", token, max_guilds) if token else []
+
+
+async def fetch_discord_interests_async(user_id: str, max_guilds: int = 15) -> list[str]:
+    """Async variant of fetch_discord_interests for use from event-loop code."""
+    token = await asyncio.to_thread(_user_token, user_id)
+    if not token:
+        return []
+
+    async def call() -> list[str]:
+        return await _get_client().interests(token, max_guilds)
+
+    return await run_async(call())
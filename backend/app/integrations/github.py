@@ -1,88 +1,185 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections import Counter
 from typing import Any
 
-import requests
+import httpx
 
+from app.core.background_loop import run_async, run_sync
+from app.core.tracing import span
 from app.db.supabase_client import get_oauth_account
 
 logger = logging.getLogger(__name__)
 
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Login, recently pushed repos (with language byte counts) and recent stars in
+# a single round trip, replacing GET /user, /user/repos and /user/starred.
+INTERESTS_QUERY = """
+query($repos: Int!, $stars: Int!) {
+  viewer {
+    login
+    repositories(
+      first: $repos
+      ownerAffiliations: OWNER
+      isFork: false
+      orderBy: {field: PUSHED_AT, direction: DESC}
+    ) {
+      nodes {
+        name
+        primaryLanguage { name }
+        languages(first: 10, orderBy: {field: SIZE, direction: DESC}) {
+          edges { size node { name } }
+        }
+      }
+    }
+    starredRepositories(first: $stars, orderBy: {field: STARRED_AT, direction: DESC}) {
+      edges { node { nameWithOwner primaryLanguage { name } } }
+    }
+  }
+}
+"""
+
+# Languages below this share of the user's code are noise (config, scripts).
+MIN_LANGUAGE_SHARE = 0.02
+MAX_LANGUAGES = 8
+
 
 def _get_github_account(user_id: str) -> dict[str, Any] | None:
     return get_oauth_account(user_id, "github")
 
 
-def fetch_github_interests(user_id: str, max_repos: int = 10) -> list[str]:
+def language_weights(repos: list[dict[str, Any]]) -> list[tuple[str, float]]:
+    """
+    Aggregate language byte counts across repos into (language, share) pairs,
+    largest first. Repos without byte counts fall back to their primary
+    language with an equal share.
+    """
+    totals: Counter[str] = Counter()
+    for repo in repos:
+        edges = (repo.get("languages") or {}).get("edges") or []
+        if edges:
+            for edge in edges:
+                name = (edge.get("node") or {}).get("name")
+                if name:
+                    totals[name] += int(edge.get("size") or 0)
+        elif (repo.get("primaryLanguage") or {}).get("name"):
+            totals[repo["primaryLanguage"]["name"]] += 1
+
+    grand_total = sum(totals.values())
+    if not grand_total:
+        return []
+    weights = [(name, size / grand_total) for name, size in totals.most_common()]
+    return [(name, share) for name, share in weights if share >= MIN_LANGUAGE_SHARE][
+        :MAX_LANGUAGES
+    ]
+
+
+def interests_from_viewer(viewer: dict[str, Any]) -> list[str]:
+    """Turn the GraphQL ``viewer`` object into interest strings."""
+    interests: list[str] = []
+    login = viewer.get("login")
+    if login:
+        interests.append(f"GitHub user: {login}")
+
+    repos = (viewer.get("repositories") or {}).get("nodes") or []
+    for name, share in language_weights(repos):
+        interests.append(f"Language: {name} ({round(share * 100)}% of code)")
+    for repo in repos:
+        name = repo.get("name")
+        if not name:
+            continue
+        lang = (repo.get("primaryLanguage") or {}).get("name")
+        interests.append(f"Repo: {name} ({lang})" if lang else f"Repo: {name}")
+
+    stars = (viewer.get("starredRepositories") or {}).get("edges") or []
+    for edge in stars:
+        name = (edge.get("node") or {}).get("nameWithOwner")
+        if name:
+            interests.append(f"Starred: {name}")
+    return interests
+
+
+class GitHubClient:
+    """GitHub GraphQL client over one pooled httpx.AsyncClient (background loop)."""
+
+    def __init__(self, *, timeout: float = 10) -> None:
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={"User-Agent": "tartanhacks-backend"},
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def viewer(
+        self, access_token: str, *, max_repos: int, max_stars: int
+    ) -> dict[str, Any] | None:
+        """Run INTERESTS_QUERY; returns the ``viewer`` object or None on failure."""
+        with span("github", "graphql.viewer_interests"):
+            resp = await self._client.post(
+                GITHUB_GRAPHQL_URL,
+                json={
+                    "query": INTERESTS_QUERY,
+                    "variables": {"repos": max_repos, "stars": max_stars},
+                },
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+        if resp.status_code == 401:
+            # GitHub OAuth app tokens don't expire; a 401 means it was revoked.
+            return None
+        resp.raise_for_status()
+        body = resp.json()
+        if body.get("errors"):
+            logger.warning("GitHub GraphQL errors: %s", body["errors"])
+        return (body.get("data") or {}).get("viewer")
+
+
+_client: GitHubClient | None = None
+
+
+def _get_client() -> GitHubClient:
+    # Only ever called on the background loop, so no lock is needed.
+    global _client
+    if _client is None:
+        _client = GitHubClient()
+    return _client
+
+
+async def fetch_github_interests_async(
+    user_id: str, max_repos: int = 10, max_stars: int | None = None
+) -> list[str]:
     """
-    Fetch GitHub interests using the stored OAuth token.
+    Fetch GitHub interests using the stored OAuth token in one GraphQL request.
     Returns a list of interest strings. On any error, returns [].
     """
-    account = _get_github_account(user_id)
+    account = await asyncio.to_thread(_get_github_account, user_id)
     if not account or not account.get("access_token"):
         logger.warning("No GitHub OAuth account or access token for user %s", user_id)
         return []
 
-    access_token = account["access_token"]
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/vnd.github+json",
-        "User-Agent": "tartanhacks-backend",
-    }
-    interests: list[str] = []
+    async def call() -> dict[str, Any] | None:
+        return await _get_client().viewer(
+            account["access_token"], max_repos=max_repos, max_stars=max_stars or max_repos
+        )
 
     try:
-        # Get the authenticated user
-        user_resp = requests.get("https://api.github.com/user", headers=headers, timeout=10)
-        if user_resp.status_code == 401:
-            logger.warning("GitHub token expired for user %s", user_id)
-            return []
-        user_resp.raise_for_status()
-        user_data = user_resp.json()
-        login = user_data.get("login")
-        if login:
-            interests.append(f"GitHub user: {login}")
-
-        # Fetch repos (most recently updated)
-        repos_resp = requests.get(
-            "https://api.github.com/user/repos",
-            params={"per_page": max_repos, "sort": "updated"},
-            headers=headers,
-            timeout=10,
-        )
-        if repos_resp.status_code == 401:
-            logger.warning("GitHub token expired for user %s", user_id)
-            return interests
-        repos_resp.raise_for_status()
-        repos = repos_resp.json()
-        for repo in repos:
-            name = repo.get("name")
-            lang = repo.get("language")
-            if name:
-                interests.append(f"Repo: {name}")
-            if lang:
-                interests.append(lang)
-
-        # Fetch starred repos
-        starred_resp = requests.get(
-            "https://api.github.com/user/starred",
-            params={"per_page": max_repos},
-            headers=headers,
-            timeout=10,
-        )
-        if starred_resp.status_code == 401:
-            logger.warning("GitHub token expired for user %s", user_id)
-            return interests
-        starred_resp.raise_for_status()
-        starred = starred_resp.json()
-        for repo in starred:
-            name = repo.get("name")
-            if name:
-                interests.append(f"Starred: {name}")
-
-    except requests.RequestException as exc:
+        viewer = await run_async(call())
+    except (httpx.HTTPError, ValueError) as exc:
         logger.warning("GitHub fetch failed for user %s: %s", user_id, exc)
         return []
+    if not viewer:
+        logger.warning("GitHub token invalid or no data for user %s", user_id)
+        return []
 
-    return interests
+    return interests_from_viewer(viewer)
+
+
+def fetch_github_interests(
+    user_id: str, max_repos: int = 10, max_stars: int | None = None
+) -> list[str]:
+    """Synchronous wrapper for sync routes and the profile pipeline."""
+    return run_sync(fetch_github_interests_async(user_id, max_repos, max_stars))
@@ -1,16 +1,146 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Any
 
 import httpx
 
 from app.config import settings
+from app.core.background_loop import run_async, run_sync
+from app.core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 STEAM_API_BASE = "https://api.steampowered.com"
 
+# GetPlayerSummaries accepts up to 100 comma-separated steam ids per call.
+PLAYER_SUMMARIES_BATCH_SIZE = 100
+
+
+class SteamClient:
+    """
+    Steam Web API client over one pooled httpx.AsyncClient.
+
+    The underlying client is bound to the event loop it is first used on, so
+    the module-level helpers below always run it on the shared background
+    loop (see app.core.background_loop).
+    """
+
+    def __init__(self, api_key: str, *, timeout: float = 10) -> None:
+        self.api_key = api_key
+        self._client = httpx.AsyncClient(
+            base_url=STEAM_API_BASE,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _get(self, path: str, params: dict[str, Any]) -> dict[str, Any]:
+        resp = await self._client.get(
+            path, params={"key": self.api_key, "format": "json", **params}
+        )
+        resp.raise_for_status()
+        return resp.json().get("response", {})
+
+    @traced("steam", "get_recently_played_games")
+    async def recently_played_games(self, steam_id: str, limit: int = 10) -> list[str]:
+        """
+        Returns a list of recently played game names.
+        """
+        try:
+            data = await self._get(
+                "/IPlayerService/GetRecentlyPlayedGames/v0001/", {"steamid": steam_id}
+            )
+            names = [g.get("name") for g in data.get("games", []) if g.get("name")]
+            return names[:limit]
+        except Exception as exc:
+            logger.warning("Steam recently played fetch failed: %s", exc)
+            return []
+
+    @traced("steam", "get_owned_games")
+    async def owned_games(self, steam_id: str, limit: int = 10) -> list[str]:
+        """
+        Returns a list of owned games ordered by playtime (desc).
+        """
+        try:
+            data = await self._get(
+                "/IPlayerService/GetOwnedGames/v0001/",
+                {"steamid": steam_id, "include_appinfo": "1"},
+            )
+            games = data.get("games", [])
+            games.sort(key=lambda g: g.get("playtime_forever", 0), reverse=True)
+            names = [g.get("name") for g in games if g.get("name")]
+            return names[:limit]
+        except Exception as exc:
+            logger.warning("Steam owned games fetch failed: %s", exc)
+            return []
+
+    @traced("steam", "get_player_summaries")
+    async def _player_summaries_batch(self, steam_ids: list[str]) -> list[dict[str, Any]]:
+        try:
+            data = await self._get(
+                "/ISteamUser/GetPlayerSummaries/v0002/",
+                {"steamids": ",".join(steam_ids)},
+            )
+            return data.get("players", [])
+        except Exception as exc:
+            logger.warning("Steam user summary fetch failed: %s", exc)
+            return []
+
+    async def player_summaries(self, steam_ids: list[str]) -> dict[str, dict[str, Any]]:
+        """
+        Returns user summaries keyed by steam id, batching 100 ids per call.
+        """
+        ids = list(dict.fromkeys(i for i in steam_ids if i))
+        batches = [
+            ids[i : i + PLAYER_SUMMARIES_BATCH_SIZE]
+            for i in range(0, len(ids), PLAYER_SUMMARIES_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(self._player_summaries_batch(batch) for batch in batches)
+        )
+        return {
+            player["steamid"]: player
+            for players in results
+            for player in players
+            if player.get("steamid")
+        }
+
+    async def interests(self, steam_id: str) -> list[str]:
+        """
+        Aggregates Steam interests; both game lists are fetched concurrently.
+        """
+        recent, top_owned = await asyncio.gather(
+            self.recently_played_games(steam_id),
+            self.owned_games(steam_id),
+        )
+        interests = []
+        interests.extend([f"Recently played: {g}" for g in recent])
+        interests.extend([f"Top owned: {g}" for g in top_owned])
+        return interests
+
+
+_client: SteamClient | None = None
+
+
+async def _get_client() -> SteamClient:
+    # Only ever called on the background loop, so no lock is needed.
+    global _client
+    if _client is None:
+        _client = SteamClient(settings.steam_api_key)
+    return _client
+
+
+async def _on_background_loop(method: str, *args: Any) -> Any:
+    async def call() -> Any:
+        client = await _get_client()
+        return await getattr(client, method)(*args)
+
+    return await run_async(call())
+
 
 async def fetch_recently_played_games(steam_id: str, limit: int = 10) -> list[str]:
     """
@@ -18,18 +148,7 @@ async def fetch_recently_played_games(steam_id: str, limit: int = 10) -> list[st
     """
     if not steam_id or not settings.steam_api_key:
         return []
-    url = f"{STEAM_API_BASE}/IPlayerService/GetRecentlyPlayedGames/v0001/"
-    params = {"key": settings.steam_api_key, "steamid": steam_id, "format": "json"}
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            games = resp.json().get("response", {}).get("games", [])
-            names = [g.get("name") for g in games if g.get("name")]
-            return names[:limit]
-    except Exception as exc:
-        logger.warning("Steam recently played fetch failed: %s", exc)
-        return []
+    return await _on_background_loop("recently_played_games", steam_id, limit)
 
 
 async def fetch_owned_games(steam_id: str, limit: int = 10) -> list[str]:
@@ -38,24 +157,7 @@ async def fetch_owned_games(steam_id: str, limit: int = 10) -> list[str]:
     """
     if not steam_id or not settings.steam_api_key:
         return []
-    url = f"{STEAM_API_BASE}/IPlayerService/GetOwnedGames/v0001/"
-    params = {
-        "key": settings.steam_api_key,
-        "steamid": steam_id,
-        "include_appinfo": "1",
-        "format": "json",
-    }
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            games = resp.json().get("response", {}).get("games", [])
-            games.sort(key=lambda g: g.get("playtime_forever", 0), reverse=True)
-            names = [g.get("name") for g in games if g.get("name")]
-            return names[:limit]
-    except Exception as exc:
-        logger.warning("Steam owned games fetch failed: %s", exc)
-        return []
+    return await _on_background_loop("owned_games", steam_id, limit)
 
 
 async def fetch_user_summary(steam_id: str) -> dict[str, Any]:
@@ -64,33 +166,34 @@ async def fetch_user_summary(steam_id: str) -> dict[str, Any]:
     """
     if not steam_id or not settings.steam_api_key:
         return {}
-    url = f"{STEAM_API_BASE}/ISteamUser/GetPlayerSummaries/v0002/"
-    params = {"key": settings.steam_api_key, "steamids": steam_id}
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            players = resp.json().get("response", {}).get("players", [])
-            return players[0] if players else {}
-    except Exception as exc:
-        logger.warning("Steam user summary fetch failed: %s", exc)
+    summaries = await fetch_user_summaries([steam_id])
+    return summaries.get(steam_id, {})
+
+
+async def fetch_user_summaries(steam_ids: list[str]) -> dict[str, dict[str, Any]]:
+    """
+    Returns user summaries keyed by steam id (up to 100 ids per API call).
+    """
+    if not steam_ids or not settings.steam_api_key:
         return {}
+    return await _on_background_loop("player_summaries", steam_ids)
 
 
 async def fetch_steam_interests(steam_id: str) -> list[str]:
     """
     Convenience function that aggregates Steam interests.
     """
-    recent = await fetch_recently_played_games(steam_id)
-    top_owned = await fetch_owned_games(steam_id)
-    interests = []
-    interests.extend([f"Recently played: {g}" for g in recent])
-    interests.extend([f"Top owned: {g}" for g in top_owned])
-    return interests
+    if not steam_id or not settings.steam_api_key:
+        return []
+    return await _on_background_loop("interests", steam_id)
 
 
-def fetch_steam_interests_sync(steam_id: str) -> list[str]:
-    """Synchronous wrapper for use in sync endpoints like /ingest."""
-    import asyncio
+def fetch_steam_interests_sync(steam_id: str, timeout: float = 30) -> list[str]:
+    """Synchronous wrapper for use in sync endpoints like /ingest.
 
-    return asyncio.run(fetch_steam_interests(steam_id))
+    Runs on the shared background loop instead of creating an event loop
+    per call, so pooled connections are reused.
+    """
+    if not steam_id or not settings.steam_api_key:
+        return []
+    return run_sync(fetch_steam_interests(steam_id), timeout=timeout)
@@ -1,61 +1,296 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+from collections import Counter
+from datetime import datetime
 from typing import Any
+from zoneinfo import ZoneInfo
 
-import requests
+import httpx
+import redis
 
-from app.core.token_refresh import refresh_google_token
+from app.config import settings
+from app.core.background_loop import run_async, run_sync
+from app.core.platform_cache import conditional_get_async
+from app.core.pubsub import get_redis_sync
+from app.core.token_refresh import SharedAccessToken
+from app.core.tracing import span
 from app.db.supabase_client import get_oauth_account
 
 logger = logging.getLogger(__name__)
 
+YOUTUBE_API_BASE = "https://www.googleapis.com/youtube/v3"
 
-def _get_google_account(user_id: str) -> dict[str, Any] | None:
+# list() calls on channels, subscriptions and playlistItems cost 1 unit each.
+LIST_QUOTA_COST = 1
+# The API caps maxResults at 50 per page.
+MAX_PAGE_SIZE = 50
+
+# YouTube's daily quota resets at midnight Pacific time.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+QUOTA_KEY = "youtube_quota:{day}"
+USER_QUOTA_KEY = "youtube_quota:{day}:{user_id}"
+QUOTA_KEY_TTL_SECONDS = 2 * 24 * 3600
+
+_quota_units: Counter[str] = Counter()
+_quota_lock = threading.Lock()
+
+
+def _get_google_account(user_id: str) -> tuple[str, dict[str, Any]] | None:
     account = get_oauth_account(user_id, "google")
     if account:
-        return account
-    return get_oauth_account(user_id, "youtube")
+        return "google", account
+    account = get_oauth_account(user_id, "youtube")
+    if account:
+        return "youtube", account
+    return None
+
+
+# ============================================================================
+# Quota accounting
+# ============================================================================
 
 
-def _make_youtube_request(
-    url: str,
-    params: dict[str, Any],
-    headers: dict[str, str],
-    user_id: str,
-) -> requests.Response | None:
+def _quota_day() -> str:
+    return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+
+def reserve_quota(user_id: str, units: int = LIST_QUOTA_COST) -> bool:
     """
-    Make a YouTube API request with automatic token refresh on 401.
-    Returns the response on success, or None if both attempts fail.
+    Record ``units`` spent by ``user_id`` today (per user and in total).
+
+    Returns False, without counting, when the user has already used
+    settings.youtube_user_daily_quota units today (0 = no limit). Redis errors
+    never block a request; the units are then only counted in-process.
     """
-    resp = requests.get(url, params=params, headers=headers, timeout=10)
-    
-    if resp.status_code == 401:
-        # Token expired - try to refresh
-        logger.info("YouTube token expired for user %s, attempting refresh...", user_id)
-        new_token = refresh_google_token(user_id)
-        if not new_token:
-            logger.warning("Failed to refresh YouTube token for user %s", user_id)
+    with _quota_lock:
+        _quota_units["total"] += units
+    day = _quota_day()
+    user_key = USER_QUOTA_KEY.format(day=day, user_id=user_id)
+    try:
+        client = get_redis_sync()
+        spent = client.incrby(user_key, units)
+        limit = settings.youtube_user_daily_quota
+        if limit and spent > limit:
+            client.decrby(user_key, units)
+            with _quota_lock:
+                _quota_units["total"] -= units
+                _quota_units["rejected"] += units
+            return False
+        pipe = client.pipeline()
+        pipe.expire(user_key, QUOTA_KEY_TTL_SECONDS)
+        pipe.incrby(QUOTA_KEY.format(day=day), units)
+        pipe.expire(QUOTA_KEY.format(day=day), QUOTA_KEY_TTL_SECONDS)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.warning("YouTube quota accounting failed: %s", exc)
+    return True
+
+
+def quota_usage(user_id: str | None = None, day: str | None = None) -> int:
+    """Units spent on ``day`` (default today), by one user or in total."""
+    day = day or _quota_day()
+    key = (
+        USER_QUOTA_KEY.format(day=day, user_id=user_id)
+        if user_id
+        else QUOTA_KEY.format(day=day)
+    )
+    try:
+        return int(get_redis_sync().get(key) or 0)
+    except redis.RedisError as exc:
+        logger.warning("YouTube quota lookup failed: %s", exc)
+        return 0
+
+
+def render_prometheus() -> str:
+    """Quota counters in the Prometheus text exposition format."""
+    with _quota_lock:
+        spent, rejected = _quota_units["total"], _quota_units["rejected"]
+    return (
+        "# TYPE mosaic_youtube_quota_units_total counter\n"
+        f'mosaic_youtube_quota_units_total{{outcome="spent"}} {spent}\n'
+        f'mosaic_youtube_quota_units_total{{outcome="rejected"}} {rejected}\n'
+    )
+
+
+# ============================================================================
+# Client
+# ============================================================================
+
+
+class YouTubeClient:
+    """
+    YouTube Data API client over one pooled httpx.AsyncClient.
+
+    Like the Steam and Discord clients it lives on the shared background loop.
+    Requests send If-None-Match when a cached ETag exists, and a 401 refreshes
+    the Google token once for all concurrent calls of the same fetch.
+    """
+
+    def __init__(self, *, timeout: float = 10) -> None:
+        self._client = httpx.AsyncClient(
+            base_url=YOUTUBE_API_BASE,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _send(
+        self, resource: str, params: dict[str, Any], access_token: str, user_id: str
+    ) -> httpx.Response | None:
+        if not await asyncio.to_thread(reserve_quota, user_id):
+            logger.warning("YouTube daily quota budget exhausted for user %s", user_id)
             return None
-        
-        # Retry with new token
-        headers = {"Authorization": f"Bearer {new_token}"}
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
-        if resp.status_code == 401:
-            logger.warning("YouTube request still failed after token refresh for user %s", user_id)
+        with span("youtube", resource):
+            return await conditional_get_async(
+                "youtube",
+                user_id,
+                f"{YOUTUBE_API_BASE}/{resource}",
+                params=params,
+                headers={"Authorization": f"Bearer {access_token}"},
+                send=self._client.get,
+            )
+
+    async def get(
+        self, resource: str, params: dict[str, Any], token: SharedAccessToken
+    ) -> dict[str, Any] | None:
+        """
+        GET a list resource, refreshing the token once on 401.
+        Returns the decoded body, or None if the request fails.
+        """
+        user_id = token.user_id
+        try:
+            access_token = token.access_token
+            resp = await self._send(resource, params, access_token, user_id)
+            if resp is not None and resp.status_code == 401:
+                logger.info("YouTube token expired for user %s, attempting refresh...", user_id)
+                access_token = await token.refresh(access_token)
+                if not access_token:
+                    logger.warning("Failed to refresh YouTube token for user %s", user_id)
+                    return None
+                resp = await self._send(resource, params, access_token, user_id)
+                if resp is not None and resp.status_code == 401:
+                    logger.warning(
+                        "YouTube request still failed after token refresh for user %s",
+                        user_id,
+                    )
+                    return None
+            if resp is None:
+                return None
+            resp.raise_for_status()
+            return resp.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            logger.warning("YouTube %s fetch failed for user %s: %s", resource, user_id, exc)
             return None
-    
-    return resp
+
+    async def list_items(
+        self,
+        resource: str,
+        params: dict[str, Any],
+        token: SharedAccessToken,
+        max_results: int,
+    ) -> list[dict[str, Any]]:
+        """
+        Collect up to ``max_results`` items, following nextPageToken for at
+        most settings.youtube_max_pages pages.
+        """
+        items: list[dict[str, Any]] = []
+        page_token: str | None = None
+        for _ in range(max(1, settings.youtube_max_pages)):
+            page_params = {
+                **params,
+                "maxResults": min(MAX_PAGE_SIZE, max_results - len(items)),
+            }
+            if page_token:
+                page_params["pageToken"] = page_token
+            data = await self.get(resource, page_params, token)
+            if not data:
+                break
+            items.extend(data.get("items", []))
+            page_token = data.get("nextPageToken")
+            if not page_token or len(items) >= max_results:
+                break
+        return items[:max_results]
+
+    async def channel_title(self, token: SharedAccessToken) -> str | None:
+        data = await self.get("channels", {"part": "snippet", "mine": "true"}, token)
+        items = (data or {}).get("items", [])
+        if items:
+            return items[0].get("snippet", {}).get("title")
+        return None
+
+    async def subscriptions(self, token: SharedAccessToken, max_results: int) -> list[str]:
+        items = await self.list_items(
+            "subscriptions", {"part": "snippet", "mine": "true"}, token, max_results
+        )
+        return [
+            item["snippet"]["title"]
+            for item in items
+            if item.get("snippet", {}).get("title")
+        ]
+
+    async def liked_videos(self, token: SharedAccessToken, max_results: int) -> list[str]:
+        # Most recently liked videos live in the special playlist "LL".
+        items = await self.list_items(
+            "playlistItems", {"part": "snippet", "playlistId": "LL"}, token, max_results
+        )
+        titles = [item.get("snippet", {}).get("title") for item in items]
+        return [title for title in titles if title and title != "Private video"]
+
+    async def interests(self, token: SharedAccessToken, max_results: int) -> list[str]:
+        """Channel, subscriptions and likes fetched concurrently."""
+        title, subscriptions, likes = await asyncio.gather(
+            self.channel_title(token),
+            self.subscriptions(token, max_results),
+            self.liked_videos(token, max_results),
+        )
+        interests: list[str] = []
+        if title:
+            interests.append(f"YouTube channel: {title}")
+        interests.extend(f"Subscribed: {channel}" for channel in subscriptions)
+        interests.extend(f"Liked: {video}" for video in likes)
+        return interests
+
+
+_client: YouTubeClient | None = None
+
+
+def _get_client() -> YouTubeClient:
+    # Only ever called on the background loop, so no lock is needed.
+    global _client
+    if _client is None:
+        _client = YouTubeClient()
+    return _client
+
+
+def _user_token(user_id: str) -> SharedAccessToken | None:
+    found = _get_google_account(user_id)
+    if not found or not found[1].get("access_token"):
+        logger.warning("No Google OAuth account or access token for user %s", user_id)
+        return None
+    provider, account = found
+    return SharedAccessToken(user_id, provider, account)
+
+
+async def _interests(token: SharedAccessToken, max_results: int) -> list[str]:
+    return await _get_client().interests(token, max_results)
 
 
 def fetch_youtube_interests(
     user_id: str | None = None,
     *,
     username: str | None = None,
-    max_results: int = 10,
+    max_results: int | None = None,
 ) -> list[str]:
     """
     Fetch basic YouTube interests using the Google OAuth token.
+    Channel, subscriptions and liked videos are fetched concurrently; the
+    latter two paginate up to ``max_results`` items (default
+    settings.youtube_max_results) within settings.youtube_max_pages pages.
     Automatically refreshes expired tokens.
     Returns a list of interest strings. On any error, returns [].
     """
@@ -65,73 +300,17 @@ def fetch_youtube_interests(
     if not user_id:
         return []
 
-    account = _get_google_account(user_id)
-    if not account or not account.get("access_token"):
-        logger.warning("No Google OAuth account or access token for user %s", user_id)
+    token = _user_token(user_id)
+    if not token:
         return []
+    return run_sync(_interests(token, max_results or settings.youtube_max_results))
 
-    access_token = account["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}"}
-    interests: list[str] = []
 
-    try:
-        # Fetch the user's channel (basic identity)
-        channel_resp = _make_youtube_request(
-            "https://www.googleapis.com/youtube/v3/channels",
-            {"part": "snippet", "mine": "true"},
-            headers,
-            user_id,
-        )
-        if not channel_resp:
-            return []
-        channel_resp.raise_for_status()
-        channel_data = channel_resp.json()
-        items = channel_data.get("items", [])
-        if items:
-            title = items[0].get("snippet", {}).get("title")
-            if title:
-                interests.append(f"YouTube channel: {title}")
-        
-        # Update headers in case token was refreshed
-        if channel_resp.request.headers.get("Authorization"):
-            headers["Authorization"] = channel_resp.request.headers["Authorization"]
-
-        # Fetch subscriptions (public signals of interest)
-        subs_resp = _make_youtube_request(
-            "https://www.googleapis.com/youtube/v3/subscriptions",
-            {"part": "snippet", "mine": "true", "maxResults": max_results},
-            headers,
-            user_id,
-        )
-        if not subs_resp:
-            return interests
-        subs_resp.raise_for_status()
-        subs_data = subs_resp.json()
-        for item in subs_data.get("items", []):
-            snippet = item.get("snippet", {})
-            channel_title = snippet.get("title")
-            if channel_title:
-                interests.append(f"Subscribed: {channel_title}")
-
-        # Fetch most recently liked videos (playlist "LL")
-        likes_resp = _make_youtube_request(
-            "https://www.googleapis.com/youtube/v3/playlistItems",
-            {"part": "snippet", "playlistId": "LL", "maxResults": max_results},
-            headers,
-            user_id,
-        )
-        if not likes_resp:
-            return interests
-        likes_resp.raise_for_status()
-        likes_data = likes_resp.json()
-        for item in likes_data.get("items", []):
-            snippet = item.get("snippet", {})
-            title = snippet.get("title")
-            if title and title != "Private video":
-                interests.append(f"Liked: {title}")
-
-    except requests.RequestException as exc:
-        logger.warning("YouTube fetch failed for user %s: %s", user_id, exc)
+async def fetch_youtube_interests_async(
+    user_id: str, max_results: int | None = None
+) -> list[str]:
+    """Async variant of fetch_youtube_interests for use from event-loop code."""
+    token = await asyncio.to_thread(_user_token, user_id)
+    if not token:
         return []
-
-    return interests
+    return await run_async(_interests(token, max_results or settings.youtube_max_results))
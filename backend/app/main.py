@@ -1,17 +1,30 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import settings
+from app.core.tracing import TracingMiddleware
 from app.routes import (
+    analytics_router,
     auth_router,
     discord_router,
     ingest_router,
+    interests_router,
+    map_router,
     messaging_router,
+    metrics_router,
     profile_router,
     search_router,
     similarity_router,
     youtube_router,
 )
 
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
+
 app = FastAPI(title="Global Mosaic API", version="0.1.0")
 
 app.add_middleware(
@@ -21,11 +34,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TracingMiddleware)
 
+app.include_router(analytics_router)
 app.include_router(auth_router)
 app.include_router(discord_router)
 app.include_router(ingest_router)
+app.include_router(interests_router)
+app.include_router(map_router)
 app.include_router(messaging_router)
+app.include_router(metrics_router)
 app.include_router(profile_router)
 app.include_router(search_router)
 app.include_router(similarity_router)
@@ -11,6 +11,7 @@ from .schemas import (
     InterestSource,
     MatchResult,
     Mode,
+    ProfileJobResponse,
     SearchRequest,
     SearchResponse,
     User,
@@ -44,7 +44,10 @@ class InterestSource(str, Enum):
 
     SPOTIFY = "spotify"
     STEAM = "steam"
+    YOUTUBE = "youtube"
     DISCORD = "discord"
+    GITHUB = "github"
+    MANUAL = "manual"
     MANUAL_BELI = "manual_beli"
     MANUAL_HEVY = "manual_hevy"
 
@@ -134,6 +137,13 @@ class SearchRequest(BaseModel):
     radius_km: Optional[float] = Field(
         None, ge=0, description="Max distance in km, uses ST_DWithin"
     )
+    diversity: Optional[float] = Field(
+        None,
+        ge=0,
+        le=1,
+        description="MMR trade-off between score (0) and spread (1); "
+        "defaults to SEARCH_MMR_DIVERSITY",
+    )
 
 
 class MatchResult(BaseModel):
@@ -160,6 +170,21 @@ class SearchResponse(BaseModel):
     mode: Mode
 
 
+# --- Background profile jobs ---
+
+
+class ProfileJobResponse(BaseModel):
+    """Status of a background profile pipeline job (202 body and GET /profile/jobs/{id})."""
+
+    job_id: str
+    kind: str
+    status: str = Field(..., description="queued | running | succeeded | failed")
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
 # --- User CRUD ---
 
 
@@ -204,6 +229,47 @@ class InterestCreate(BaseModel):
     raw_text: str
 
 
+# --- Interest index ---
+
+
+class InterestHolder(BaseModel):
+    """A user who has an interest, and where it came from."""
+
+    id: UUID
+    username: str
+    marker_color: Optional[str] = None
+    source: Optional[str] = None
+
+
+class SharedInterestResponse(BaseModel):
+    """Response body for GET /interests/users."""
+
+    interest: str
+    users: list[InterestHolder]
+    total_users: int
+    next_after: Optional[UUID] = None  # pass as ?after= for the next page
+
+
+class RelatedInterest(BaseModel):
+    interest: str
+    shared_users: int
+
+
+class RelatedInterestsResponse(BaseModel):
+    """Response body for GET /interests/related."""
+
+    interest: str
+    related: list[RelatedInterest]
+
+
+class InterestOverlapResponse(BaseModel):
+    """Response body for GET /match/{other_user_id}/interests."""
+
+    shared: int
+    interests: list[str]
+    jaccard: float = Field(..., ge=0, le=1, description="shared / union of both users' interests")
+
+
 # --- OAuth ---
 
 
@@ -1,17 +1,25 @@
+from app.routes.analytics import router as analytics_router
 from app.routes.auth import router as auth_router
 from app.routes.discord import router as discord_router
 from app.routes.ingest import router as ingest_router
+from app.routes.interests import router as interests_router
+from app.routes.map import router as map_router
 from app.routes.messaging import router as messaging_router
+from app.routes.metrics import router as metrics_router
 from app.routes.profile import router as profile_router
 from app.routes.search import router as search_router
 from app.routes.similarity import router as similarity_router
 from app.routes.youtube import router as youtube_router
 
 __all__ = [
+    "analytics_router",
     "auth_router",
     "discord_router",
     "ingest_router",
+    "interests_router",
+    "map_router",
     "messaging_router",
+    "metrics_router",
     "profile_router",
     "search_router",
     "similarity_router",
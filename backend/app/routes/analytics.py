@@ -1,2 +1,101 @@
-# Analytics endpoints
-# TODO: Implement analytics endpoint
+"""GET /analytics/* - Aggregate stats for product dashboards.
+
+Every endpoint reads precomputed rollups (supabase/migrations/010_analytics.sql
+and 015_incremental_analytics.sql, refreshed on a schedule), never profiles or messages directly, and answers
+with an ETag and public Cache-Control so dashboards can poll through a CDN.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from fastapi import APIRouter, Header, Query, Response
+
+from app.config import settings
+from app.core.http_cache import cacheable_response
+from app.db.supabase_client import (
+    get_analytics_clusters,
+    get_analytics_message_daily,
+    get_analytics_refreshed_at,
+    get_analytics_regions,
+    get_analytics_top_interests,
+    get_analytics_totals,
+)
+from app.models.schemas import CLUSTER_COLORS
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+CLUSTER_BY_COLOR = {color: cluster.value for cluster, color in CLUSTER_COLORS.items()}
+
+
+def _respond(payload: dict[str, Any], if_none_match: str | None) -> Response:
+    body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return cacheable_response(
+        body,
+        media_type="application/json",
+        max_age=settings.analytics_max_age_seconds,
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/overview")
+def overview(if_none_match: str | None = Header(None)) -> Response:
+    """Headline totals and when each rollup was last refreshed."""
+    return _respond(
+        {"totals": get_analytics_totals(), "refreshed_at": get_analytics_refreshed_at()},
+        if_none_match,
+    )
+
+
+@router.get("/clusters")
+def clusters(if_none_match: str | None = Header(None)) -> Response:
+    """Users per interest cluster (marker color)."""
+    rows = get_analytics_clusters()
+    total = sum(row["users"] for row in rows) or 1
+    return _respond(
+        {
+            "clusters": [
+                {
+                    "cluster": CLUSTER_BY_COLOR.get(row["marker_color"]),
+                    "marker_color": row["marker_color"] or None,
+                    "users": row["users"],
+                    "share": round(row["users"] / total, 4),
+                }
+                for row in rows
+            ]
+        },
+        if_none_match,
+    )
+
+
+@router.get("/regions")
+def regions(if_none_match: str | None = Header(None)) -> Response:
+    """Users per coarse world region."""
+    return _respond({"regions": get_analytics_regions()}, if_none_match)
+
+
+@router.get("/interests")
+def top_interests(
+    limit: int = Query(20, ge=1, le=200), if_none_match: str | None = Header(None)
+) -> Response:
+    """Most common interests by number of users."""
+    return _respond({"interests": get_analytics_top_interests(limit)}, if_none_match)
+
+
+@router.get("/messages")
+def messages(
+    days: int = Query(30, ge=1, le=365), if_none_match: str | None = Header(None)
+) -> Response:
+    """Daily message volume and active conversations, plus rolling totals."""
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+    totals = get_analytics_totals()
+    return _respond(
+        {
+            "days": get_analytics_message_daily(since),
+            "active_conversations_7d": totals.get("active_conversations_7d", 0),
+            "active_conversations_30d": totals.get("active_conversations_30d", 0),
+        },
+        if_none_match,
+    )
@@ -16,6 +16,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 
 from app.config import settings
 from app.core.oauth_providers import get_provider_config
+from app.core.platform_cache import invalidate as invalidate_platform_cache
 from app.db.supabase_client import get_oauth_account, upsert_oauth_account
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -144,6 +145,7 @@ def oauth_callback(
         expires_at=expires_at,
         raw_token=token,
     )
+    invalidate_platform_cache(user_id, provider)
     return HTMLResponse(content="<script>window.close();</script>", status_code=200)
 
 
@@ -229,4 +231,5 @@ def steam_callback(request: Request, state: str):
         expires_at=None,
         raw_token={"steam_id": steam_id},
     )
+    invalidate_platform_cache(user_id, "steam")
     return HTMLResponse(content="<script>window.close();</script>", status_code=200)
@@ -2,23 +2,32 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 
-from app.core.profile_pipeline import run_profile_pipeline
+from app.config import settings
+from app.core.jobs import enqueue_job, to_job_response
+from app.core.profile_pipeline import avatar_url_from_user, ingest_profile
 from app.core.supabase_auth import get_current_user
-from app.db.supabase_client import upsert_profile
-from app.models.schemas import IngestRequest, IngestResponse
+from app.models.schemas import IngestRequest, IngestResponse, ProfileJobResponse
 
 router = APIRouter()
 
 
-@router.post("/ingest", response_model=IngestResponse)
+@router.post(
+    "/ingest",
+    response_model=IngestResponse,
+    responses={202: {"model": ProfileJobResponse}},
+)
 def ingest(
-    request: IngestRequest, current_user: dict = Depends(get_current_user)
-) -> IngestResponse:
+    request: IngestRequest,
+    current_user: dict = Depends(get_current_user),
+    background: bool | None = Query(
+        None, description="Queue the pipeline as a job and return 202"
+    ),
+) -> IngestResponse | JSONResponse:
     try:
         user_id = str(current_user.get("id"))
-        print(f"DEBUG: ingest user_id={user_id!r}")
 
         # Validate interests
         interests = [i.strip() for i in request.interests if i.strip()]
@@ -27,42 +36,32 @@ def ingest(
                 status_code=400, detail="Interests list cannot be empty."
             )
 
-        # Run the shared profile pipeline
-        result = run_profile_pipeline(
-            username=request.username,
-            bio=request.bio,
-            user_interests=interests,
-            user_id=user_id,
-        )
+        if request.user_id and str(request.user_id) != user_id:
+            raise HTTPException(status_code=403, detail="User ID mismatch.")
 
         # Get avatar URL from auth user metadata
-        user_metadata = current_user.get("user_metadata", {})
-        avatar_url = user_metadata.get("avatar_url") or user_metadata.get("picture")
-
-        metadata = {
-            "all_interests": result.all_interests,
-            "youtube_username": request.youtube_username,
-            "steam_id": request.steam_id,
-            "github_username": request.github_username,
-            "avatar_url": avatar_url,
-        }
+        avatar_url = avatar_url_from_user(current_user)
 
-        location_wkt = f"SRID=4326;POINT({request.longitude} {request.latitude})"
-
-        if request.user_id and str(request.user_id) != user_id:
-            raise HTTPException(status_code=403, detail="User ID mismatch.")
+        if background if background is not None else settings.profile_jobs_enabled:
+            job = enqueue_job(
+                "ingest",
+                user_id,
+                {
+                    "request": request.model_dump(mode="json"),
+                    "interests": interests,
+                    "avatar_url": avatar_url,
+                },
+            )
+            return JSONResponse(
+                status_code=202, content=to_job_response(job).model_dump()
+            )
 
-        profile = upsert_profile(
+        # Run the shared profile pipeline and save the profile
+        profile, result = ingest_profile(
             user_id=user_id,
-            username=request.username,
-            location_wkt=location_wkt,
-            embedding=result.embedding,
-            bio=request.bio,
-            ideology_score=request.ideology_score,
-            instagram_handle=request.instagram_handle,
-            marker_color=result.marker_color,
-            metadata=metadata,
-            dna_string=result.dna_string,
+            request=request,
+            interests=interests,
+            avatar_url=avatar_url,
         )
 
         return IngestResponse(user_id=profile["id"], marker_color=result.marker_color)
@@ -0,0 +1,85 @@
+"""Exact shared-interest lookups over the interest index.
+
+GET /interests/users?interest=...[&after=]    - users who have an interest
+GET /interests/related?interest=...           - interests that co-occur with it
+GET /match/{other_user_id}/interests          - exact overlap with another user
+
+Interests match after normalization (case and whitespace), see
+supabase/migrations/011_interest_index.sql.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.supabase_auth import get_current_user
+from app.db.supabase_client import (
+    get_co_occurring_interests,
+    get_interest_overlap,
+    get_profile_by_id,
+    get_users_sharing_interest,
+)
+from app.models.schemas import (
+    InterestHolder,
+    InterestOverlapResponse,
+    RelatedInterest,
+    RelatedInterestsResponse,
+    SharedInterestResponse,
+)
+
+router = APIRouter(tags=["interests"])
+
+
+@router.get("/interests/users", response_model=SharedInterestResponse)
+def users_sharing_interest(
+    interest: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[UUID] = Query(None, description="next_after of the previous page"),
+    current_user: dict = Depends(get_current_user),
+) -> SharedInterestResponse:
+    # One extra row tells whether there is a next page.
+    rows = get_users_sharing_interest(
+        interest,
+        limit=limit + 1,
+        exclude_user_id=str(current_user.get("id")),
+        after_user_id=str(after) if after else None,
+    )
+    page = rows[:limit]
+    return SharedInterestResponse(
+        interest=interest,
+        users=[InterestHolder(**row) for row in page],
+        total_users=rows[0]["total_users"] if rows else 0,
+        next_after=page[-1]["id"] if len(rows) > limit else None,
+    )
+
+
+@router.get("/interests/related", response_model=RelatedInterestsResponse)
+def related_interests(
+    interest: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+) -> RelatedInterestsResponse:
+    rows = get_co_occurring_interests(interest, limit=limit)
+    return RelatedInterestsResponse(
+        interest=interest, related=[RelatedInterest(**row) for row in rows]
+    )
+
+
+@router.get("/match/{other_user_id}/interests", response_model=InterestOverlapResponse)
+def interest_overlap(
+    other_user_id: str,
+    current_user: dict = Depends(get_current_user),
+) -> InterestOverlapResponse:
+    if not get_profile_by_id(other_user_id):
+        raise HTTPException(status_code=404, detail="Other user profile not found")
+
+    overlap = get_interest_overlap(str(current_user.get("id")), other_user_id)
+    union = overlap["a_total"] + overlap["b_total"] - overlap["shared"]
+    return InterestOverlapResponse(
+        shared=overlap["shared"],
+        interests=overlap["interests"],
+        jaccard=overlap["shared"] / union if union else 0.0,
+    )
@@ -0,0 +1,49 @@
+"""GET /map/tiles/{z}/{x}/{y} - Compact markers or clusters for one map tile."""
+
+from __future__ import annotations
+
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+
+from app.config import settings
+from app.core.http_cache import cacheable_response
+from app.core.map_tiles import encode_binary, encode_json, load_tile, valid_tile
+from app.core.supabase_auth import get_current_user
+
+router = APIRouter(prefix="/map", tags=["map"])
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    format: Literal["json", "bin"] = Query("json"),  # noqa: A002
+    if_none_match: str | None = Header(None),
+    current_user: dict = Depends(get_current_user),
+) -> Response:
+    """Markers (or clusters at low zoom) in one XYZ tile.
+
+    Tiles carry user ids and precise locations, so they need a signed-in
+    user like ``/profile/{user_id}``. Responses are privately cacheable with
+    an ETag, so the browser revalidates cheaply.
+    """
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+
+    tile = load_tile(z, x, y)
+    if format == "bin":
+        body = encode_binary(tile)
+        media_type = "application/octet-stream"
+    else:
+        body = json.dumps(encode_json(tile), separators=(",", ":")).encode()
+        media_type = "application/json"
+    return cacheable_response(
+        body,
+        media_type=media_type,
+        max_age=settings.map_tile_max_age_seconds,
+        if_none_match=if_none_match,
+        private=True,
+    )
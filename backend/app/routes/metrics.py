@@ -0,0 +1,23 @@
+"""GET /metrics - Latency histograms plus cache, quota and single-flight counters."""
+
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import platform_cache, singleflight, tracing
+from app.integrations import youtube
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of the in-process histograms and counters."""
+    body = (
+        tracing.render_prometheus()
+        + platform_cache.render_prometheus()
+        + youtube.render_prometheus()
+        + singleflight.render_prometheus()
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -1,5 +1,6 @@
 """GET /profile - Retrieve current user's profile.
 GET /profile/connections - Get connected OAuth providers.
+GET /profile/jobs/{job_id} - Status of a background pipeline job.
 POST /profile/refresh - Regenerate dna_string with latest platform data.
 PUT /profile/interests - Update interests and regenerate dna_string.
 PATCH /profile - Update current user's profile.
@@ -7,21 +8,24 @@ PATCH /profile - Update current user's profile.
 
 from __future__ import annotations
 
-import struct
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from app.core.profile_pipeline import run_profile_pipeline
+from app.config import settings
+from app.core.jobs import enqueue_job, get_job, to_job_response
+from app.core.location import parse_location
+from app.core.map_clusters import record_profile
+from app.core.profile_pipeline import avatar_url_from_user, regenerate_profile
 from app.core.supabase_auth import get_current_user
 from app.db.supabase_client import (
     get_connected_providers,
     get_profile_by_id,
     update_profile,
-    upsert_profile,
 )
-from app.models.schemas import ProfileUpdateRequest, User
+from app.models.schemas import ProfileJobResponse, ProfileUpdateRequest, User
 
 router = APIRouter()
 
@@ -33,48 +37,6 @@ class ConnectionsResponse(BaseModel):
     available: list[str]
 
 
-def _parse_location(location: str | dict | None) -> tuple[float, float] | None:
-    """Parse PostGIS EWKB hex string OR GeoJSON dict to (latitude, longitude) tuple."""
-    if not location:
-        return None
-
-    # Handle GeoJSON dict (typically returned by PostgREST 9+)
-    if isinstance(location, dict):
-        try:
-            coords = location.get("coordinates")
-            if coords and len(coords) >= 2:
-                # GeoJSON coordinates are [lon, lat]
-                return (float(coords[1]), float(coords[0]))
-        except (IndexError, ValueError, TypeError):
-            return None
-        return None
-
-    # Handle WKT string (e.g. "POINT(lon lat)")
-    if isinstance(location, str) and "POINT" in location:
-        try:
-            inner = location.split("(")[1].split(")")[0]
-            parts = inner.strip().split()
-            lon, lat = float(parts[0]), float(parts[1])
-            return (lat, lon)
-        except (IndexError, ValueError, AttributeError):
-            return None
-
-    # Handle WKB hex string
-    try:
-        # bytes.fromhex raises TypeError if input is not str
-        if isinstance(location, str):
-            wkb = bytes.fromhex(location)
-            if len(wkb) < 25:
-                return None
-            lon = struct.unpack_from("<d", wkb, 9)[0]
-            lat = struct.unpack_from("<d", wkb, 17)[0]
-            return (lat, lon)
-    except (ValueError, TypeError, struct.error):
-        pass
-
-    return None
-
-
 @router.get("/profile/connections", response_model=ConnectionsResponse)
 def get_connections(
     current_user: dict = Depends(get_current_user),
@@ -96,7 +58,7 @@ def get_public_profile(
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
 
-    parsed_loc = _parse_location(profile.get("location"))
+    parsed_loc = parse_location(profile.get("location"))
     lat = parsed_loc[0] if parsed_loc else None
     lon = parsed_loc[1] if parsed_loc else None
 
@@ -123,7 +85,7 @@ def get_profile(current_user: dict = Depends(get_current_user)) -> User | None:
     if not profile:
         return None
 
-    parsed_loc = _parse_location(profile.get("location"))
+    parsed_loc = parse_location(profile.get("location"))
     lat = parsed_loc[0] if parsed_loc else None
     lon = parsed_loc[1] if parsed_loc else None
 
@@ -165,8 +127,10 @@ def patch_profile(
 
     if not updated:
         raise HTTPException(status_code=500, detail="Failed to update profile")
+    if body.latitude is not None and body.longitude is not None:
+        record_profile(updated)
 
-    parsed_loc = _parse_location(updated.get("location"))
+    parsed_loc = parse_location(updated.get("location"))
     lat = parsed_loc[0] if parsed_loc else None
     lon = parsed_loc[1] if parsed_loc else None
 
@@ -194,49 +158,38 @@ class UpdateInterestsRequest(BaseModel):
     interests: list[str]
 
 
-def _save_profile_with_pipeline_result(
-    *,
-    user_id: str,
-    profile: dict[str, Any],
-    result: Any,  # ProfilePipelineResult
-    current_user: dict,
-) -> None:
-    """Save profile with pipeline result (shared by update_interests and refresh_profile)."""
-    metadata = profile.get("metadata") or {}
-    user_metadata = current_user.get("user_metadata", {})
-    avatar_url = user_metadata.get("avatar_url") or user_metadata.get("picture")
-
-    new_metadata = {
-        **metadata,
-        "all_interests": result.all_interests,
-        "avatar_url": avatar_url or metadata.get("avatar_url"),
-    }
-
-    # Get location from existing profile
-    location = profile.get("location")
-    parsed_loc = _parse_location(location)
-    lat = parsed_loc[0] if parsed_loc else 0.0
-    lon = parsed_loc[1] if parsed_loc else 0.0
-    location_wkt = f"SRID=4326;POINT({lon} {lat})"
-
-    upsert_profile(
-        user_id=user_id,
-        username=profile.get("username", "User"),
-        location_wkt=location_wkt,
-        embedding=result.embedding,
-        bio=profile.get("bio"),
-        ideology_score=profile.get("ideology_score"),
-        instagram_handle=profile.get("instagram_handle"),
-        marker_color=result.marker_color,
-        metadata=new_metadata,
-        dna_string=result.dna_string,
-    )
+def _use_background(background: bool | None) -> bool:
+    return background if background is not None else settings.profile_jobs_enabled
 
 
-@router.put("/profile/interests", response_model=RefreshResponse)
+def _accepted(job: dict[str, Any]) -> JSONResponse:
+    return JSONResponse(status_code=202, content=to_job_response(job).model_dump())
+
+
+@router.get("/profile/jobs/{job_id}", response_model=ProfileJobResponse)
+def get_profile_job(
+    job_id: str, current_user: dict = Depends(get_current_user)
+) -> ProfileJobResponse:
+    """Get the status of a background profile pipeline job."""
+    user_id = str(current_user.get("id"))
+    job = get_job(job_id)
+    if not job or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return to_job_response(job)
+
+
+@router.put(
+    "/profile/interests",
+    response_model=RefreshResponse,
+    responses={202: {"model": ProfileJobResponse}},
+)
 def update_interests(
-    body: UpdateInterestsRequest, current_user: dict = Depends(get_current_user)
-) -> RefreshResponse:
+    body: UpdateInterestsRequest,
+    current_user: dict = Depends(get_current_user),
+    background: bool | None = Query(
+        None, description="Queue the pipeline as a job and return 202"
+    ),
+) -> RefreshResponse | JSONResponse:
     """Update user interests and regenerate dna_string/embedding."""
     user_id = str(current_user.get("id"))
 
@@ -250,20 +203,21 @@ def update_interests(
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
 
-    # Run the shared profile pipeline
-    result = run_profile_pipeline(
-        username=profile.get("username", "User"),
-        bio=profile.get("bio"),
-        user_interests=interests,
-        user_id=user_id,
-    )
-
-    # Save profile
-    _save_profile_with_pipeline_result(
+    avatar_url = avatar_url_from_user(current_user)
+    if _use_background(background):
+        job = enqueue_job(
+            "update_interests",
+            user_id,
+            {"interests": interests, "avatar_url": avatar_url},
+        )
+        return _accepted(job)
+
+    # Run the shared profile pipeline and save the profile
+    result = regenerate_profile(
         user_id=user_id,
         profile=profile,
-        result=result,
-        current_user=current_user,
+        user_interests=interests,
+        avatar_url=avatar_url,
     )
 
     return RefreshResponse(
@@ -273,8 +227,17 @@ def update_interests(
     )
 
 
-@router.post("/profile/refresh", response_model=RefreshResponse)
-def refresh_profile(current_user: dict = Depends(get_current_user)) -> RefreshResponse:
+@router.post(
+    "/profile/refresh",
+    response_model=RefreshResponse,
+    responses={202: {"model": ProfileJobResponse}},
+)
+def refresh_profile(
+    current_user: dict = Depends(get_current_user),
+    background: bool | None = Query(
+        None, description="Queue the pipeline as a job and return 202"
+    ),
+) -> RefreshResponse | JSONResponse:
     """Regenerate dna_string and embedding with latest platform data."""
     user_id = str(current_user.get("id"))
 
@@ -290,20 +253,18 @@ def refresh_profile(current_user: dict = Depends(get_current_user)) -> RefreshRe
     if not existing_interests:
         raise HTTPException(status_code=400, detail="No interests found")
 
-    # Run the shared profile pipeline
-    result = run_profile_pipeline(
-        username=profile.get("username", "User"),
-        bio=profile.get("bio"),
-        user_interests=existing_interests,
-        user_id=user_id,
-    )
+    avatar_url = avatar_url_from_user(current_user)
+    if _use_background(background):
+        # The worker re-reads the profile so it picks up the latest interests.
+        job = enqueue_job("refresh", user_id, {"avatar_url": avatar_url})
+        return _accepted(job)
 
-    # Save profile
-    _save_profile_with_pipeline_result(
+    # Run the shared profile pipeline and save the profile
+    result = regenerate_profile(
         user_id=user_id,
         profile=profile,
-        result=result,
-        current_user=current_user,
+        user_interests=existing_interests,
+        avatar_url=avatar_url,
     )
 
     return RefreshResponse(
@@ -1,11 +1,29 @@
-"""POST /search - Retrieve neighbors based on Mode (harmony/contrast)."""
+"""POST /search - Retrieve neighbors based on Mode (harmony/contrast).
 
-from __future__ import annotations
+The match RPCs return ``limit x settings.search_overfetch_factor`` candidates
+(capped at settings.search_max_candidates) with their ideology scores, which
+are re-ranked by composite score (app.core.ranking) before any profile is
+loaded. Only the page is fetched; with diversity enabled (``diversity`` on
+the request, SEARCH_MMR_DIVERSITY by default, off unless set) the best
+``limit x settings.search_mmr_pool_factor`` are fetched instead and an MMR
+pass picks a spread-out page of ``limit`` from them.
+"""
 
-import struct
+from __future__ import annotations
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException
 
+from app.config import settings
+from app.core.embedding_codec import as_vector
+from app.core.location import parse_location
+from app.core.ranking import (
+    candidates_from_matches,
+    composite_scores,
+    mmr_select,
+    pairwise_similarity,
+    rerank,
+)
 from app.core.supabase_auth import get_current_user
 from app.db.supabase_client import (
     find_contrast_matches,
@@ -18,47 +36,6 @@ from app.models.schemas import MatchResult, Mode, SearchRequest, SearchResponse,
 router = APIRouter()
 
 
-def _parse_location(location: str | dict | None) -> tuple[float, float] | None:
-    """Parse PostGIS EWKB hex string OR GeoJSON dict to (latitude, longitude) tuple."""
-    if not location:
-        return None
-
-    # Handle GeoJSON dict
-    if isinstance(location, dict):
-        try:
-            coords = location.get("coordinates")
-            if coords and len(coords) >= 2:
-                # GeoJSON coordinates are [lon, lat]
-                return (float(coords[1]), float(coords[0]))
-        except (IndexError, ValueError, TypeError):
-            return None
-        return None
-
-    # Handle WKT string
-    if isinstance(location, str) and "POINT" in location:
-        try:
-            inner = location.split("(")[1].split(")")[0]
-            parts = inner.strip().split()
-            lon, lat = float(parts[0]), float(parts[1])
-            return (lat, lon)
-        except (IndexError, ValueError, AttributeError):
-            return None
-
-    # Handle WKB hex string
-    try:
-        if isinstance(location, str):
-            wkb = bytes.fromhex(location)
-            if len(wkb) < 25:
-                return None
-            lon = struct.unpack_from("<d", wkb, 9)[0]
-            lat = struct.unpack_from("<d", wkb, 17)[0]
-            return (lat, lon)
-    except (ValueError, TypeError, struct.error):
-        pass
-
-    return None
-
-
 @router.post("/search", response_model=SearchResponse)
 def search(
     request: SearchRequest, current_user: dict = Depends(get_current_user)
@@ -68,11 +45,11 @@ def search(
     if not profile:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    embedding = profile.get("embedding")
+    embedding = as_vector(profile.get("embedding"))
     location_data = profile.get("location")
 
     # robustly parse location
-    parsed_loc = _parse_location(location_data)
+    parsed_loc = parse_location(location_data)
 
     if not embedding or not parsed_loc:
         raise HTTPException(
@@ -82,12 +59,22 @@ def search(
     # Reconstruct WKT for RPC calls to ensure valid format
     lat, lon = parsed_loc
     location_wkt = f"SRID=4326;POINT({lon} {lat})"
+    max_distance_meters = request.radius_km * 1000 if request.radius_km is not None else None
+
+    candidate_limit = request.limit
+    if settings.search_rerank_enabled:
+        candidate_limit = max(
+            request.limit,
+            min(request.limit * settings.search_overfetch_factor, settings.search_max_candidates),
+        )
 
     if request.mode == Mode.HARMONY:
         matches = find_harmony_matches(
             query_embedding=embedding,
             user_location_wkt=location_wkt,
-            limit=request.limit,
+            limit=candidate_limit,
+            exclude_user_id=user_id,
+            max_distance_meters=max_distance_meters,
         )
     else:
         # Contrast mode: find people with different interests (low similarity)
@@ -96,24 +83,39 @@ def search(
             query_embedding=embedding,
             user_location_wkt=location_wkt,
             min_distance_meters=0,  # No minimum distance requirement
-            limit=request.limit,
+            limit=candidate_limit,
+            exclude_user_id=user_id,
+            max_distance_meters=max_distance_meters,
         )
 
-    user_ids = [m["user_id"] for m in matches]
-    profiles = get_profiles_by_ids(user_ids)
+    own_ideology = profile.get("ideology_score")
+    candidates = candidates_from_matches(matches)
+    diversity = (
+        request.diversity if request.diversity is not None else settings.search_mmr_diversity
+    )
+    if settings.search_rerank_enabled:
+        pool_size = request.limit
+        if diversity > 0:
+            pool_size = max(request.limit, request.limit * settings.search_mmr_pool_factor)
+        order, scores = rerank(candidates, request.mode, own_ideology, pool_size)
+    else:
+        order = np.arange(min(len(matches), request.limit))
+        scores = composite_scores(candidates, request.mode, own_ideology)
+    # The only profile fetch: the page, or the MMR pool the page is picked from.
+    profiles = get_profiles_by_ids([candidates.user_ids[i] for i in order])
+    if len(order) > request.limit:
+        picks = _diversify(profiles, candidates.user_ids, order, scores, request.limit, diversity)
+        order = order[picks]
     profile_map = {p["id"]: p for p in profiles}
 
     results: list[MatchResult] = []
-    for m in matches:
-        # Skip the current user
-        if m["user_id"] == user_id:
-            continue
-
+    for i in order:
+        m = matches[i]
         user = profile_map.get(m["user_id"])
         if not user:
             continue
 
-        similarity = m.get("similarity") or (1 - m.get("diversity", 0))
+        similarity = float(candidates.similarity[i])
         distance_km = None
         if m.get("distance_meters") is not None:
             distance_km = m["distance_meters"] / 1000
@@ -128,7 +130,7 @@ def search(
             )
 
         # Parse location once
-        parsed_loc = _parse_location(user.get("location"))
+        parsed_loc = parse_location(user.get("location"))
         lat = parsed_loc[0] if parsed_loc else None
         lon = parsed_loc[1] if parsed_loc else None
 
@@ -148,8 +150,33 @@ def search(
                 ),
                 similarity_score=similarity,
                 ideological_distance=ideological_distance,
+                composite_score=round(float(scores[i]), 4),
                 distance_km=distance_km,
             )
         )
 
     return SearchResponse(matches=results, total_found=len(results), mode=request.mode)
+
+
+def _diversify(
+    profiles: list[dict],
+    user_ids: list[str],
+    pool: np.ndarray,
+    scores: np.ndarray,
+    limit: int,
+    diversity: float,
+) -> np.ndarray:
+    """Positions in ``pool`` of an MMR-selected page of ``limit``."""
+    by_id = {p["id"]: p for p in profiles}
+    rows = [by_id.get(user_ids[i], {}) for i in pool]
+    vectors = [as_vector(row.get("embedding")) for row in rows]
+    dims = max((len(v) for v in vectors if v), default=0)
+    embeddings = np.zeros((len(rows), dims), dtype=np.float32)
+    coordinates = np.full((len(rows), 2), np.nan)
+    for j, (row, vector) in enumerate(zip(rows, vectors)):
+        if vector and len(vector) == dims:
+            embeddings[j] = vector
+        location = parse_location(row.get("location"))
+        if location:
+            coordinates[j] = location
+    return mmr_select(scores[pool], pairwise_similarity(embeddings, coordinates), limit, diversity)
@@ -2,13 +2,25 @@
 
 from __future__ import annotations
 
+import logging
+from functools import partial
+
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from app.core.openrouter_logic import generate_similarity_summary
+from app.config import settings
+from app.core import singleflight
+from app.core.openrouter_logic import generate_similarity_summary, polish_similarity_summary
+from app.core.similarity_summary import (
+    MAX_ITEMS,
+    describe_shared_interests,
+    find_shared_interests,
+)
 from app.core.supabase_auth import get_current_user
 from app.db.supabase_client import get_profile_by_id
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -23,8 +35,9 @@ def get_similarity_summary(
 ) -> SimilaritySummaryResponse:
     """Generate a 1-sentence summary of what two users have in common.
     
-    Compares the current authenticated user's DNA string with the specified
-    other user's DNA string and returns an LLM-generated similarity summary.
+    Shared interests are matched locally and described with a template; the
+    LLM is only called when nothing is shared (or to polish the sentence when
+    SIMILARITY_SUMMARY_LLM_POLISH is on).
     """
     user_id = str(current_user.get("id"))
     
@@ -45,16 +58,29 @@ def get_similarity_summary(
     current_interests = current_metadata.get("all_interests") or []
     other_interests = other_metadata.get("all_interests") or []
     
-    print(f"DEBUG similarity: current_interests count={len(current_interests)}, other_interests count={len(other_interests)}")
-    print(f"DEBUG similarity: current_interests sample={current_interests[:5] if current_interests else 'EMPTY'}")
-    print(f"DEBUG similarity: other_interests sample={other_interests[:5] if other_interests else 'EMPTY'}")
-    
-    # Generate similarity summary using LLM
+    # Fast path: name the shared items locally, no model call
+    shared = find_shared_interests(
+        current_interests,
+        other_interests,
+        fuzzy_threshold=settings.similarity_summary_fuzzy_threshold,
+    )
+    draft = describe_shared_interests(shared)
+    if draft and not settings.similarity_summary_llm_polish:
+        return SimilaritySummaryResponse(summary=draft)
+
+    # LLM: polish the draft, or find common ground when nothing matched exactly
+    # (one call per pair in flight)
+    if draft:
+        labels = [item.label for item in shared[:MAX_ITEMS]]
+        generate = partial(polish_similarity_summary, draft, labels)
+    else:
+        generate = partial(generate_similarity_summary, current_interests, other_interests)
     try:
-        summary = generate_similarity_summary(current_interests, other_interests)
-        print(f"DEBUG similarity: generated summary={summary}")
-    except Exception as exc:
-        print(f"DEBUG: similarity summary generation failed: {exc}")
-        summary = "You both share similar interests."
-    
-    return SimilaritySummaryResponse(summary=summary)
+        summary = singleflight.do(
+            singleflight.make_key("similarity_summary", user_id, other_user_id), generate
+        )
+    except Exception:
+        logger.exception("Similarity summary generation failed for %s", user_id)
+        summary = ""
+
+    return SimilaritySummaryResponse(summary=summary or draft or "You both share similar interests.")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+End-to-end API benchmark against in-process fakes.
+
+Boots app.main:app under uvicorn, pointed at scripts/fake_services.py instead
+of Supabase and OpenRouter, then drives /ingest, /search, /profile/refresh and
+/match/{id}/summary from a pool of client threads. Prints per-endpoint
+throughput and p50/p95/p99 latency.
+
+Usage:
+  python backend/scripts/bench_api.py --requests 200 --concurrency 8 \
+      --supabase-ms 15 --auth-ms 10 --openrouter-ms 120
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeServices, Latency  # noqa: E402
+
+SAMPLE_INTERESTS = [
+    "AI",
+    "machine learning",
+    "photography",
+    "music production",
+    "esports",
+    "hiking",
+    "calisthenics",
+    "Recently played: Terraria",
+    "Server: CMU Esports",
+    "Subscribed: FitnessFAQs",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_app(fakes: FakeServices, workers_threads: int) -> tuple[Any, str]:
+    # Settings are read at import time, so the env must be set first.
+    os.environ["SUPABASE_URL"] = fakes.base_url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "bench-service-role"
+    os.environ["OPENROUTER_API_KEY"] = "bench-openrouter"
+    os.environ["OPENROUTER_BASE_URL"] = fakes.openrouter_base_url
+    # The fakes have no Redis; only use the platform cache against a real one.
+    if "REDIS_URL" not in os.environ:
+        os.environ["PLATFORM_CACHE_ENABLED"] = "false"
+
+    import anyio.to_thread
+    import uvicorn
+
+    from app.main import app
+
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+
+    def run() -> None:
+        async def serve() -> None:
+            # Sync routes run on anyio's threadpool; size it like gunicorn threads.
+            anyio.to_thread.current_default_thread_limiter().total_tokens = (
+                workers_threads
+            )
+            await server.serve()
+
+        anyio.run(serve)
+
+    threading.Thread(target=run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise SystemExit("uvicorn did not start within 10s")
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _seed(fakes: FakeServices, n: int) -> list[str]:
+    rng = random.Random(42)
+    user_ids = []
+    for i in range(n):
+        user_ids.append(
+            fakes.seed_profile(
+                username=f"bench_user_{i}",
+                interests=rng.sample(SAMPLE_INTERESTS, k=5),
+                latitude=rng.uniform(-60, 60),
+                longitude=rng.uniform(-180, 180),
+                ideology_score=rng.randint(1, 10),
+            )
+        )
+    return user_ids
+
+
+def _scenarios(user_ids: list[str]) -> dict[str, Callable[[httpx.Client], httpx.Response]]:
+    def auth(user_id: str) -> dict[str, str]:
+        return {"Authorization": f"Bearer {user_id}"}
+
+    def ingest(client: httpx.Client) -> httpx.Response:
+        user_id = random.choice(user_ids)
+        return client.post(
+            "/ingest",
+            headers=auth(user_id),
+            json={
+                "username": f"ingest_{user_id[:8]}",
+                "interests": random.sample(SAMPLE_INTERESTS, k=4),
+                "latitude": random.uniform(-60, 60),
+                "longitude": random.uniform(-180, 180),
+            },
+        )
+
+    def search(client: httpx.Client) -> httpx.Response:
+        mode = random.choice(["harmony", "contrast"])
+        return client.post(
+            "/search",
+            headers=auth(random.choice(user_ids)),
+            json={"mode": mode, "limit": 10},
+        )
+
+    def refresh(client: httpx.Client) -> httpx.Response:
+        return client.post("/profile/refresh", headers=auth(random.choice(user_ids)))
+
+    def summary(client: httpx.Client) -> httpx.Response:
+        me, other = random.sample(user_ids, k=2)
+        return client.get(f"/match/{other}/summary", headers=auth(me))
+
+    return {
+        "POST /ingest": ingest,
+        "POST /search": search,
+        "POST /profile/refresh": refresh,
+        "GET /match/{id}/summary": summary,
+    }
+
+
+def _run_scenario(
+    base_url: str,
+    call: Callable[[httpx.Client], httpx.Response],
+    *,
+    requests: int,
+    concurrency: int,
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_: int) -> None:
+        nonlocal errors
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base_url, timeout=60)
+        start = time.perf_counter()
+        try:
+            failed = call(client).status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return latencies, errors, time.perf_counter() - wall_start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=40, help="server threadpool size")
+    parser.add_argument("--profiles", type=int, default=500, help="seeded profiles")
+    parser.add_argument("--supabase-ms", type=float, default=10.0)
+    parser.add_argument("--auth-ms", type=float, default=10.0)
+    parser.add_argument("--openrouter-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--verbose", action="store_true", help="keep the app's own stdout/stderr"
+    )
+    parser.add_argument(
+        "--only", action="append", default=None, help="substring filter on endpoint"
+    )
+    args = parser.parse_args()
+
+    fakes = FakeServices(
+        supabase_latency=Latency(args.supabase_ms, args.jitter_ms),
+        auth_latency=Latency(args.auth_ms, args.jitter_ms),
+        openrouter_latency=Latency(args.openrouter_ms, args.jitter_ms),
+    ).start()
+    user_ids = _seed(fakes, args.profiles)
+    server, base_url = _start_app(fakes, args.threads)
+
+    # The routes print DEBUG lines per request; keep the report readable.
+    out = sys.stdout
+    if not args.verbose:
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        logging.disable(logging.CRITICAL)
+
+    def report(line: str) -> None:
+        print(line, file=out, flush=True)
+
+    report(
+        f"fakes: supabase={args.supabase_ms}ms auth={args.auth_ms}ms "
+        f"openrouter={args.openrouter_ms}ms jitter=±{args.jitter_ms}ms; "
+        f"{args.profiles} profiles, concurrency={args.concurrency}"
+    )
+    header = f"{'endpoint':<26}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    report(header)
+    report("-" * len(header))
+
+    for name, call in _scenarios(user_ids).items():
+        if args.only and not any(f in name for f in args.only):
+            continue
+        latencies, errors, wall = _run_scenario(
+            base_url, call, requests=args.requests, concurrency=args.concurrency
+        )
+        p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+        report(
+            f"{name:<26}{len(latencies) / wall:>9.1f}"
+            f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{errors:>8}"
+        )
+
+    server.should_exit = True
+    fakes.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Recall/latency benchmark for compact embedding representations.
+
+Builds clustered synthetic embeddings (like real profile embeddings, which
+share a lot of structure) and compares top-k search over:
+
+  vector   exact float32 cosine (ground truth)
+  halfvec  float16 vectors, as in idx_profiles_embedding_half
+  binary   sign bits + hamming distance, as in idx_profiles_embedding_bit,
+           over-fetching rerank_factor * k candidates re-ranked on float32
+
+Search is brute force in NumPy, so this measures the effect of quantization
+on ranking (the HNSW graph itself is measured by bench_hnsw.py). It also
+reports index bytes per vector and the size of a query payload in each wire
+encoding (JSON floats vs base64 f32/f16) with encode time.
+
+Usage:
+  python backend/scripts/bench_embeddings.py --profiles 20000 --queries 200 -k 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.embedding_codec import decode_embedding, encode_embedding  # noqa: E402
+
+
+def clustered_embeddings(
+    n: int, dim: int, clusters: int, spread: float, rng: np.random.Generator
+) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores per row, best first."""
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1)
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _timed(fn) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--profiles", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=40)
+    parser.add_argument("--spread", type=float, default=0.9, help="noise around centers")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # Queries come from the same clusters as the profiles, like real users.
+    data = clustered_embeddings(
+        args.profiles + args.queries, args.dim, args.clusters, args.spread, rng
+    )
+    base, queries = data[: args.profiles], data[args.profiles :]
+    k = args.k
+    per_query_ms = 1000 / args.queries
+
+    truth, exact_s = _timed(lambda: _topk(queries @ base.T, k))
+    rows = [("vector (f32, exact)", 4 * args.dim, 1.0, exact_s * per_query_ms)]
+
+    base16, queries16 = base.astype(np.float16), queries.astype(np.float16)
+    half, half_s = _timed(
+        lambda: _topk(queries16.astype(np.float32) @ base16.astype(np.float32).T, k)
+    )
+    rows.append(("halfvec (f16)", 2 * args.dim, _recall(half, truth), half_s * per_query_ms))
+
+    base_bits = np.packbits(base > 0, axis=1)
+    query_bits = np.packbits(queries > 0, axis=1)
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(1)
+    for factor in args.rerank:
+        candidates = min(k * factor, args.profiles)
+
+        def binary_search() -> np.ndarray:
+            # Hamming similarity = -popcount(xor); then exact re-rank.
+            coarse = np.concatenate(
+                [
+                    _topk(-popcount[base_bits[None] ^ chunk[:, None]].sum(2, dtype=np.int32),
+                          candidates)
+                    for chunk in np.array_split(query_bits, max(1, len(query_bits) // 8))
+                ]
+            )
+            exact = np.einsum("qd,qcd->qc", queries, base[coarse])
+            return np.take_along_axis(coarse, _topk(exact, k), axis=1)
+
+        found, binary_s = _timed(binary_search)
+        rows.append(
+            (
+                f"binary + rerank x{factor}",
+                args.dim // 8,
+                _recall(found, truth),
+                binary_s * per_query_ms,
+            )
+        )
+
+    print(f"{args.profiles} profiles, {args.queries} queries, dim={args.dim}, recall@{k}")
+    print(f"{'index':<22} {'bytes/vec':>10} {'recall':>8} {'ms/query':>10}")
+    for name, size, recall, ms in rows:
+        print(f"{name:<22} {size:>10} {recall:>8.3f} {ms:>10.3f}")
+
+    query = queries[0].astype(np.float64).tolist()
+    print("\nquery payload")
+    print(f"{'encoding':<10} {'bytes':>8} {'encode µs':>10} {'max abs err':>12}")
+    start = time.perf_counter()
+    as_json = json.dumps(query)
+    json_us = (time.perf_counter() - start) * 1e6
+    print(f"{'json':<10} {len(as_json):>8} {json_us:>10.1f} {0.0:>12.2e}")
+    for encoding in ("f32", "f16"):
+        start = time.perf_counter()
+        payload = encode_embedding(query, encoding)
+        encode_us = (time.perf_counter() - start) * 1e6
+        error = np.max(np.abs(np.asarray(decode_embedding(payload, encoding)) - query))
+        print(f"{encoding:<10} {len(payload):>8} {encode_us:>10.1f} {error:>12.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
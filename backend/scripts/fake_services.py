@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""
+In-process fakes of the services the API talks to, for offline benchmarks.
+
+Serves, from a single threaded HTTP server:
+  - Supabase PostgREST: profiles, oauth_accounts, messages and the
+    find_harmony_matches / find_contrast_matches, map tile, interest index,
+    set_marker_colors and replace_cluster_centroids RPCs
+  - Supabase Auth: GET /auth/v1/user (the bearer token is the user id)
+  - OpenRouter (OpenAI-compatible): POST /openrouter/v1/embeddings and
+    POST /openrouter/v1/chat/completions
+
+Every request sleeps for the configured per-service latency before answering,
+so the benchmark measures our own overhead plus a realistic I/O profile.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from app.core.embedding_codec import as_vector, decode_embedding
+
+EMBEDDING_DIM = 1024
+# pgvector columns PostgREST returns as "[0.1,0.2,...]" text
+VECTOR_COLUMNS = {"embedding", "embedding_next", "centroid"}
+OPENROUTER_PREFIX = "/openrouter/v1"
+
+
+@dataclass
+class Latency:
+    """Injected latency for one fake service, in milliseconds."""
+
+    mean_ms: float = 0.0
+    jitter_ms: float = 0.0
+
+    def sleep(self) -> None:
+        delay = self.mean_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+@dataclass
+class FakeState:
+    """In-memory tables backing the fake PostgREST."""
+
+    profiles: dict[str, dict[str, Any]] = field(default_factory=dict)
+    oauth_accounts: list[dict[str, Any]] = field(default_factory=list)
+    messages: list[dict[str, Any]] = field(default_factory=list)
+    cluster_centroids: list[dict[str, Any]] = field(default_factory=list)
+    embedding_config: list[dict[str, Any]] = field(default_factory=list)
+    # normalized interest -> first label seen; user id -> normalized -> source
+    interest_labels: dict[str, str] = field(default_factory=dict)
+    user_interests: dict[str, dict[str, str]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Shared direction so cosine similarities land in the positive range real
+# sentence-embedding models produce (e5 pairs typically score 0.7-0.9).
+_COMMON_DIRECTION = np.random.default_rng(0).standard_normal(EMBEDDING_DIM)
+_COMMON_DIRECTION /= np.linalg.norm(_COMMON_DIRECTION)
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> list[float]:
+    """Deterministic unit vector derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    noise = np.random.default_rng(seed).standard_normal(dim)
+    vec = _COMMON_DIRECTION[:dim] + 0.6 * noise / np.linalg.norm(noise)
+    vec /= np.linalg.norm(vec) or 1.0
+    return vec.tolist()
+
+
+def _pgvector_text(vector: list[float]) -> str:
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+def _as_returned(row: dict[str, Any]) -> dict[str, Any]:
+    """``row`` as PostgREST serializes it: vector columns become text."""
+    if not VECTOR_COLUMNS.intersection(row):
+        return row
+    return {
+        key: _pgvector_text(value) if key in VECTOR_COLUMNS and isinstance(value, list) else value
+        for key, value in row.items()
+    }
+
+
+def _parse_point(location: Any) -> tuple[float, float] | None:
+    """Parse 'SRID=4326;POINT(lon lat)' / 'POINT(lon lat)' into (lon, lat)."""
+    if not isinstance(location, str):
+        return None
+    match = re.search(r"POINT\(\s*([-\d.eE]+)\s+([-\d.eE]+)\s*\)", location)
+    if not match:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+def _haversine_m(a: tuple[float, float], b: np.ndarray) -> np.ndarray:
+    lon1, lat1 = np.radians(a[0]), np.radians(a[1])
+    lon2, lat2 = np.radians(b[:, 0]), np.radians(b[:, 1])
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6_371_000 * np.arcsin(np.sqrt(h))
+
+
+def _matches(row: dict[str, Any], params: list[tuple[str, str]]) -> bool:
+    """Evaluate the subset of PostgREST filters the app uses."""
+    for key, value in params:
+        if key in {"limit", "offset", "order", "select", "on_conflict"}:
+            continue
+        if key == "or":
+            clauses = re.findall(r"and\(([^)]*)\)|([a-z_]+\.eq\.[^,)]+)", value)
+            ok = False
+            for group, single in clauses:
+                parts = group.split(",") if group else [single]
+                if all(_match_one(row, *p.split(".", 2)) for p in parts):
+                    ok = True
+                    break
+            if not ok:
+                return False
+            continue
+        op, _, operand = value.partition(".")
+        if not _match_one(row, key, op, operand):
+            return False
+    return True
+
+
+def _match_one(row: dict[str, Any], column: str, op: str, operand: str) -> bool:
+    current = row.get(column)
+    if op == "eq":
+        return str(current) == operand
+    if op == "in":
+        return str(current) in operand.strip("()").split(",")
+    if op == "is":
+        return current is None if operand == "null" else True
+    if op == "lt":
+        return current is not None and str(current) < operand
+    if op == "gt":
+        return current is not None and str(current) > operand
+    return True
+
+
+def _select_column(spec: str) -> tuple[str, str, str | None]:
+    """(alias, column, json key) of a select item like ``all_interests:metadata->all_interests``."""
+    alias, _, expr = spec.rpartition(":")
+    column, _, key = expr.partition("->")
+    return alias or key or column, column, key or None
+
+
+class FakeServices:
+    """Threaded fake of Supabase REST/Auth and OpenRouter."""
+
+    def __init__(
+        self,
+        *,
+        supabase_latency: Latency | None = None,
+        auth_latency: Latency | None = None,
+        openrouter_latency: Latency | None = None,
+    ) -> None:
+        self.state = FakeState()
+        self.latency = {
+            "supabase": supabase_latency or Latency(),
+            "auth": auth_latency or Latency(),
+            "openrouter": openrouter_latency or Latency(),
+        }
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openrouter_base_url(self) -> str:
+        return self.base_url + OPENROUTER_PREFIX
+
+    def start(self) -> "FakeServices":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ------------------------------------------------------------------
+    # Seeding helpers
+    # ------------------------------------------------------------------
+
+    def seed_profile(
+        self,
+        *,
+        username: str,
+        interests: list[str],
+        latitude: float,
+        longitude: float,
+        user_id: str | None = None,
+        ideology_score: int | None = None,
+        marker_color: str = "#00F2FF",
+    ) -> str:
+        user_id = user_id or str(uuid.uuid4())
+        dna_string = f"{username} is interested in {', '.join(interests)}."
+        self.state.profiles[user_id] = {
+            "id": user_id,
+            "username": username,
+            "bio": None,
+            "ideology_score": ideology_score,
+            "location": f"SRID=4326;POINT({longitude} {latitude})",
+            "instagram_handle": None,
+            "embedding": fake_embedding(dna_string),
+            "marker_color": marker_color,
+            "metadata": {"all_interests": interests},
+            "dna_string": dna_string,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return user_id
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                return
+
+            def _body(self) -> Any:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                return json.loads(raw) if raw else None
+
+            def _send(self, status: int, payload: Any) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _dispatch(self, method: str) -> None:
+                parts = urlsplit(self.path)
+                params = parse_qsl(parts.query, keep_blank_values=True)
+                body = self._body()
+                try:
+                    status, payload = services.handle(
+                        method, parts.path, params, body, dict(self.headers)
+                    )
+                except Exception as exc:  # pragma: no cover - debugging aid
+                    status, payload = 500, {"message": str(exc)}
+                self._send(status, payload)
+
+            def do_GET(self) -> None:
+                self._dispatch("GET")
+
+            def do_POST(self) -> None:
+                self._dispatch("POST")
+
+            def do_PATCH(self) -> None:
+                self._dispatch("PATCH")
+
+        return Handler
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        params: list[tuple[str, str]],
+        body: Any,
+        headers: dict[str, str],
+    ) -> tuple[int, Any]:
+        if path.startswith(OPENROUTER_PREFIX):
+            self.latency["openrouter"].sleep()
+            return self._handle_openrouter(path[len(OPENROUTER_PREFIX):], body)
+        if path == "/auth/v1/user":
+            self.latency["auth"].sleep()
+            return self._handle_auth(headers)
+        if path.startswith("/rest/v1/"):
+            self.latency["supabase"].sleep()
+            return self._handle_rest(method, path[len("/rest/v1/"):], params, body)
+        return 404, {"message": f"no fake for {path}"}
+
+    def _handle_auth(self, headers: dict[str, str]) -> tuple[int, Any]:
+        auth = headers.get("Authorization") or headers.get("authorization") or ""
+        token = auth.partition(" ")[2]
+        if not token:
+            return 401, {"message": "missing token"}
+        return 200, {"id": token, "user_metadata": {}}
+
+    def _handle_openrouter(self, path: str, body: Any) -> tuple[int, Any]:
+        if path == "/embeddings":
+            inputs = body["input"]
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            data = [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                for i, text in enumerate(inputs)
+            ]
+            return 200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        if path == "/chat/completions":
+            prompt = body["messages"][-1]["content"]
+            content = f"You both share interests. ({len(prompt)} chars of context)"
+            return 200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        return 404, {"message": f"no fake for openrouter {path}"}
+
+    def _handle_rest(
+        self,
+        method: str,
+        resource: str,
+        params: list[tuple[str, str]],
+        body: Any,
+    ) -> tuple[int, Any]:
+        if resource.startswith("rpc/"):
+            return self._handle_rpc(resource[len("rpc/"):], body)
+        table = self._table(resource)
+        if table is None:
+            return 404, {"message": f"unknown table {resource}"}
+
+        with self.state.lock:
+            if method == "GET":
+                rows = [r for r in table if _matches(r, params)]
+                query = dict(params)
+                if "order" in query:
+                    column, _, direction = query["order"].partition(".")
+                    rows.sort(
+                        key=lambda r: str(r.get(column) or ""),
+                        reverse=direction == "desc",
+                    )
+                offset = int(query.get("offset", 0))
+                limit = int(query["limit"]) if "limit" in query else None
+                rows = rows[offset:][:limit] if limit is not None else rows[offset:]
+                if query.get("select", "*") != "*":
+                    cols = [_select_column(c) for c in query["select"].split(",")]
+                    rows = [
+                        {
+                            alias: (r.get(col) or {}).get(key) if key else r.get(col)
+                            for alias, col, key in cols
+                        }
+                        for r in rows
+                    ]
+                return 200, [_as_returned(r) for r in rows]
+            if method == "POST":
+                payloads = body if isinstance(body, list) else [body]
+                conflict = dict(params).get("on_conflict")
+                return 201, [_as_returned(self._upsert(resource, p, conflict)) for p in payloads]
+            if method == "PATCH":
+                updated = []
+                for row in table:
+                    if _matches(row, params):
+                        row.update(body)
+                        updated.append(_as_returned(row))
+                return 200, updated
+        return 405, {"message": "method not allowed"}
+
+    def _table(self, resource: str) -> Any:
+        if resource == "profiles":
+            return list(self.state.profiles.values())
+        if resource == "oauth_accounts":
+            return self.state.oauth_accounts
+        if resource == "messages":
+            return self.state.messages
+        if resource == "cluster_centroids":
+            return self.state.cluster_centroids
+        if resource == "embedding_config":
+            return self.state.embedding_config
+        return None
+
+    def _upsert(
+        self, resource: str, payload: dict[str, Any], conflict: str | None
+    ) -> dict[str, Any]:
+        now = datetime.now(timezone.utc).isoformat()
+        if resource == "profiles":
+            user_id = payload.get("id") or str(uuid.uuid4())
+            row = self.state.profiles.setdefault(
+                user_id, {"id": user_id, "created_at": now}
+            )
+            row.update(payload)
+            return row
+        if resource == "oauth_accounts":
+            for row in self.state.oauth_accounts:
+                if (row["user_id"], row["provider"]) == (
+                    payload["user_id"],
+                    payload["provider"],
+                ):
+                    row.update(payload)
+                    return row
+            self.state.oauth_accounts.append(dict(payload))
+            return payload
+        row = {"id": str(uuid.uuid4()), "created_at": now, "read_at": None, **payload}
+        self.state.messages.append(row)
+        return row
+
+    def _map_rpc(self, name: str, body: dict[str, Any]) -> list[dict[str, Any]]:
+        with self.state.lock:
+            points = [
+                (p["id"], p.get("marker_color"), *_parse_point(p.get("location")))
+                for p in self.state.profiles.values()
+                if _parse_point(p.get("location"))
+            ]
+        points = [
+            (pid, color, lon, lat)
+            for pid, color, lon, lat in points
+            if body["min_lon"] <= lon <= body["max_lon"]
+            and body["min_lat"] <= lat <= body["max_lat"]
+        ]
+        if name == "map_markers_in_bbox":
+            return [
+                {"id": pid, "lat": lat, "lon": lon, "marker_color": color}
+                for pid, color, lon, lat in points[: int(body.get("max_markers", 5000))]
+            ]
+        cells: dict[tuple[int, int], list[tuple[Any, ...]]] = {}
+        n = int(body["world_cells"])
+        for point in points:
+            lat = np.radians(np.clip(point[3], -85.0511, 85.0511))
+            cx = int((point[2] + 180) / 360 * n)
+            cy = int((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * n)
+            cells.setdefault((cx, cy), []).append(point)
+        return [
+            {
+                "id": members[0][0] if len(members) == 1 else None,
+                "lat": float(np.mean([m[3] for m in members])),
+                "lon": float(np.mean([m[2] for m in members])),
+                "marker_color": Counter(m[1] for m in members).most_common(1)[0][0],
+                "point_count": len(members),
+            }
+            for members in cells.values()
+        ]
+
+    def _interest_rpc(self, name: str, body: dict[str, Any]) -> Any:
+        def norm(value: str) -> str:
+            return " ".join(value.split()).lower()
+
+        index, labels = self.state.user_interests, self.state.interest_labels
+        with self.state.lock:
+            if name == "sync_user_interests":
+                platform = body.get("platform") or {}
+                sources = {}
+                for source in ("github", "discord", "steam", "youtube"):
+                    sources.update((norm(i), source) for i in platform.get(source) or [])
+                entries: dict[str, str] = {}
+                for label in body.get("interests") or []:
+                    key = norm(label)
+                    if key and key not in entries:
+                        labels.setdefault(key, label.strip())
+                        entries[key] = sources.get(key, "manual")
+                index[body["p_user_id"]] = entries
+                return len(entries)
+            if name == "interest_overlap":
+                a = index.get(body["user_a"], {})
+                b = index.get(body["user_b"], {})
+                shared = a.keys() & b.keys()
+                return [
+                    {
+                        "shared": len(shared),
+                        "a_total": len(a),
+                        "b_total": len(b),
+                        "interests": sorted(labels[k] for k in shared),
+                    }
+                ]
+            target = norm(body["target_interest"])
+            holders = sorted(uid for uid, entries in index.items() if target in entries)
+            limit = int(body.get("max_results", 50))
+            if name == "co_occurring_interests":
+                counts = Counter(
+                    labels[k] for uid in holders for k in index[uid] if k != target
+                )
+                ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+                return [{"interest": k, "shared_users": n} for k, n in ranked[:limit]]
+            holders = [uid for uid in holders if uid != body.get("exclude_user_id")]
+            after = body.get("after_user_id")
+            page = [uid for uid in holders if not after or uid > after][:limit]
+            return [
+                {
+                    "id": uid,
+                    "username": self.state.profiles.get(uid, {}).get("username"),
+                    "marker_color": self.state.profiles.get(uid, {}).get("marker_color"),
+                    "source": index[uid][target],
+                    "total_users": len(holders),
+                }
+                for uid in page
+            ]
+
+    def _handle_rpc(self, name: str, body: dict[str, Any]) -> tuple[int, Any]:
+        if name.endswith("_compact"):
+            # Base64 query; quantized index modes are served exactly here.
+            name = name[: -len("_compact")]
+            body = {
+                **body,
+                "query_embedding": decode_embedding(
+                    body["query_embedding"], body.get("embedding_encoding", "f32")
+                ),
+            }
+        if name in {"map_markers_in_bbox", "map_clusters_in_bbox"}:
+            return 200, self._map_rpc(name, body)
+        if name == "set_marker_colors":
+            updated = 0
+            with self.state.lock:
+                for row in body["rows"]:
+                    profile = self.state.profiles.get(row["id"])
+                    if profile and profile.get("marker_color") != row["marker_color"]:
+                        profile["marker_color"] = row["marker_color"]
+                        updated += 1
+            return 200, updated
+        if name == "replace_cluster_centroids":
+            with self.state.lock:
+                self.state.cluster_centroids[:] = [dict(row) for row in body["rows"]]
+            return 200, len(body["rows"])
+        if name in {
+            "sync_user_interests",
+            "users_sharing_interest",
+            "co_occurring_interests",
+            "interest_overlap",
+        }:
+            return 200, self._interest_rpc(name, body)
+        if name not in {"find_harmony_matches", "find_contrast_matches"}:
+            return 404, {"message": f"unknown rpc {name}"}
+        with self.state.lock:
+            rows = [p for p in self.state.profiles.values() if p.get("embedding")]
+        if not rows:
+            return 200, []
+
+        ids = [r["id"] for r in rows]
+        matrix = np.asarray([as_vector(r["embedding"]) for r in rows], dtype=np.float32)
+        query = np.asarray(as_vector(body["query_embedding"]), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        cosine_distance = 1 - (matrix @ query) / np.where(norms == 0, 1, norms)
+
+        origin = _parse_point(body.get("user_location"))
+        points = np.asarray(
+            [_parse_point(r.get("location")) or (0.0, 0.0) for r in rows]
+        )
+        distances = (
+            _haversine_m(origin, points) if origin else np.zeros(len(rows))
+        )
+
+        limit = int(body.get("match_limit", 10))
+        keep = np.ones(len(rows), dtype=bool)
+        if body.get("exclude_user_id"):
+            keep &= np.asarray(ids) != body["exclude_user_id"]
+        if body.get("max_distance_meters") is not None:
+            keep &= distances <= float(body["max_distance_meters"])
+        if name == "find_harmony_matches":
+            eligible = np.flatnonzero(keep)
+            order = eligible[np.argsort(cosine_distance[eligible])][:limit]
+            return 200, [
+                {
+                    "user_id": ids[i],
+                    "similarity": float(1 - cosine_distance[i]),
+                    "distance_meters": float(distances[i]),
+                    "ideology_score": rows[i].get("ideology_score"),
+                }
+                for i in order
+            ]
+
+        min_distance = float(body.get("min_distance_meters", 0))
+        diversity = cosine_distance + np.minimum(distances, 10_000_000) / 20_000_000
+        eligible = np.flatnonzero(keep & (distances > min_distance))
+        order = eligible[np.argsort(-diversity[eligible])][:limit]
+        return 200, [
+            {
+                "user_id": ids[i],
+                "diversity": float(diversity[i]),
+                "distance_meters": float(distances[i]),
+                "ideology_score": rows[i].get("ideology_score"),
+            }
+            for i in order
+        ]
@@ -284,6 +284,15 @@ def _insert_interests(rows: list[dict[str, Any]]) -> None:
     resp.raise_for_status()
 
 
+def _sync_user_interests(
+    user_id: str, interests: list[str], platform: dict[str, list[str]]
+) -> None:
+    url = f"{_rest_base()}/rpc/sync_user_interests"
+    payload = {"p_user_id": user_id, "interests": interests, "platform": platform}
+    resp = requests.post(url, headers=_headers(), json=payload, timeout=15)
+    resp.raise_for_status()
+
+
 def main() -> None:
     _require_env()
     random.seed(RANDOM_SEED)
@@ -374,9 +383,14 @@ def main() -> None:
             )
         for text in youtube_items:
             interest_rows.append(
-                {"user_id": user_id, "source": "manual_hevy", "raw_text": text}
+                {"user_id": user_id, "source": "youtube", "raw_text": text}
             )
         _insert_interests(interest_rows)
+        _sync_user_interests(
+            user_id,
+            list(dict.fromkeys(interests + youtube_items + steam_items)),
+            {"youtube": youtube_items, "steam": steam_items},
+        )
 
         if (i + 1) % 50 == 0:
             print(f"Seeded {i + 1}/{NUM_USERS}")
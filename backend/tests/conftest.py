@@ -0,0 +1,8 @@
+"""Settings the app needs at import time; the unit tests never reach these services."""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+os.environ.setdefault("OPENROUTER_API_KEY", "test-openrouter-key")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1")
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.core import cluster_centroids
+from app.core.cluster_centroids import (
+    Centroids,
+    kmeans_plus_plus,
+    label_centroids,
+    minibatch_kmeans,
+    nearest_cluster,
+)
+from app.core.clusters import CLUSTER_ORDER
+from app.models.schemas import InterestCluster
+
+
+def blobs(centers: np.ndarray, per_center: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    points = np.repeat(centers, per_center, axis=0)
+    points = points + rng.normal(scale=0.05, size=points.shape)
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return rng.permutation(points).astype(np.float32)
+
+
+def test_kmeans_plus_plus_picks_distinct_points():
+    data = blobs(np.eye(3), 20)
+    centers = kmeans_plus_plus(data, 3, np.random.default_rng(0))
+    assert centers.shape == (3, 3)
+    assert sorted(np.argmax(centers, axis=1).tolist()) == [0, 1, 2]
+
+
+def test_minibatch_kmeans_finds_separated_clusters():
+    data = blobs(np.eye(4), 50)
+
+    def batches():
+        return (data[i : i + 32] for i in range(0, len(data), 32))
+
+    centers, counts = minibatch_kmeans(batches, 4, epochs=2, seed=1)
+    assert centers.shape == (4, 4)
+    np.testing.assert_allclose(np.linalg.norm(centers, axis=1), 1.0, rtol=1e-5)
+    assert sorted(np.argmax(centers, axis=1).tolist()) == [0, 1, 2, 3]
+    assert counts.sum() == 2 * len(data)
+
+
+def test_minibatch_kmeans_needs_k_rows():
+    with pytest.raises(ValueError):
+        minibatch_kmeans(lambda: [np.eye(3, dtype=np.float32)], 4)
+
+
+def test_label_centroids_one_to_one():
+    k = len(CLUSTER_ORDER)
+    mass = np.zeros((k, k))
+    # Centroid 0 leans to cluster 1 a bit more than centroid 1 does, but the
+    # assignment maximizing total mass still uses every cluster once.
+    mass[0, 1], mass[0, 0] = 6, 5
+    mass[1, 1] = 10
+    mass[2, 2] = 3
+    mass[3, 3] = 1
+    assert label_centroids(mass, [InterestCluster.TECH_DEV] * k) == list(CLUSTER_ORDER)
+
+
+def test_label_centroids_dominant_and_fallback():
+    mass = np.zeros((6, len(CLUSTER_ORDER)))
+    mass[0, 2] = 4
+    mass[1, 3], mass[1, 0] = 2, 1
+    fallback = [InterestCluster.FITNESS] * 6
+    labels = label_centroids(mass, fallback)
+    assert labels[0] == CLUSTER_ORDER[2]
+    assert labels[1] == CLUSTER_ORDER[3]
+    assert labels[2:] == fallback[2:]
+
+
+def test_centroids_assign_by_cosine():
+    centroids = Centroids(
+        vectors=np.eye(2, dtype=np.float32),
+        clusters=[InterestCluster.GAMING, InterestCluster.FITNESS],
+        model="test",
+    )
+    assert centroids.assign(np.asarray([[3.0, 1.0], [0.1, 0.2]])).tolist() == [0, 1]
+
+
+@pytest.fixture
+def stored_centroids(monkeypatch):
+    monkeypatch.setattr(settings, "cluster_centroids_enabled", True)
+    centroids = Centroids(
+        vectors=np.eye(2, dtype=np.float32),
+        clusters=[InterestCluster.GAMING, InterestCluster.FITNESS],
+        model="test",
+    )
+    monkeypatch.setattr(cluster_centroids._cache, "get", lambda: centroids)
+
+
+def test_nearest_cluster_accepts_lists_and_pgvector_text(stored_centroids):
+    assert nearest_cluster([0.9, 0.1]) == InterestCluster.GAMING
+    assert nearest_cluster("[0.1,0.9]") == InterestCluster.FITNESS
+
+
+def test_nearest_cluster_without_a_usable_embedding(stored_centroids):
+    assert nearest_cluster(None) is None
+    assert nearest_cluster("[]") is None
+    assert nearest_cluster([1.0, 0.0, 0.0]) is None
+
+
+def test_nearest_cluster_disabled(stored_centroids, monkeypatch):
+    monkeypatch.setattr(settings, "cluster_centroids_enabled", False)
+    assert nearest_cluster([1.0, 0.0]) is None
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.core.clusters import (
+    CLUSTER_ORDER,
+    DEFAULT_CLUSTER,
+    assign_clusters,
+    best_clusters,
+    choose_cluster,
+    score_batch,
+    score_interests,
+)
+from app.models.schemas import InterestCluster
+
+TECH, ARTS, GAMING, FITNESS = (CLUSTER_ORDER.index(c) for c in InterestCluster)
+
+
+def test_score_interests_keywords_and_kinds():
+    scores = score_interests(["Python programming", "Recently played: Hades", "Marathon running"])
+    assert scores[TECH] == 1
+    assert scores[GAMING] == 1
+    assert scores[FITNESS] >= 1
+
+
+def test_score_interests_matches_plurals_and_ignores_accounts():
+    assert score_interests(["Developers"])[TECH] == 1
+    assert not score_interests(["GitHub user: python"]).any()
+
+
+def test_score_batch_matches_per_profile_scores():
+    lists = [["Python", "Painting"], [], ["Painting", "Painting", "Yoga"], ["Python"]]
+    batch = score_batch(lists)
+    assert batch.shape == (4, len(CLUSTER_ORDER))
+    for row, interests in zip(batch, lists):
+        np.testing.assert_array_equal(row, score_interests(interests))
+    assert batch[2, ARTS] == 2
+
+
+def test_best_clusters_marks_rows_without_signal():
+    scores = np.asarray([[0, 2, 1, 0], [0, 0, 0, 0], [1, 1, 0, 0]], dtype=np.float32)
+    assert best_clusters(scores).tolist() == [1, -1, 0]
+
+
+def test_choose_cluster_default():
+    assert choose_cluster([]) == DEFAULT_CLUSTER
+    default = InterestCluster.GAMING
+    assert choose_cluster(["something obscure"], default=default) == default
+
+
+def test_assign_clusters_uses_batch_centroids_for_rows_without_keywords():
+    lists = [["Python"], ["Yoga"], ["something obscure"], ["another obscure thing"]]
+    embeddings = np.asarray([[1, 0], [0, 1], [0.9, 0.2], [0, 0]], dtype=np.float32)
+    defaults = [None, None, None, InterestCluster.CREATIVE_ARTS]
+    clusters = assign_clusters(lists, embeddings, defaults=defaults)
+    assert clusters == [
+        InterestCluster.TECH_DEV,
+        InterestCluster.FITNESS,
+        InterestCluster.TECH_DEV,
+        InterestCluster.CREATIVE_ARTS,
+    ]
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.integrations.discord import DiscordRateLimited, DiscordRateLimiter
+
+
+def response(status=200, json=None, **headers):
+    return httpx.Response(status, json=json or {}, headers=headers)
+
+
+def limits(remaining, reset_after, **headers):
+    return response(
+        **{"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset-After": str(reset_after)},
+        **headers,
+    )
+
+
+def test_reserves_remaining_slots():
+    limiter = DiscordRateLimiter()
+    limiter.update("u", "/users/@me", limits(2, 60))
+    asyncio.run(limiter.acquire("u", "/users/@me"))
+    assert limiter._bucket("u", "/users/@me").remaining == 1
+
+
+def test_exhausted_bucket_beyond_max_wait_raises():
+    limiter = DiscordRateLimiter(max_wait=1)
+    limiter.update("u", "/users/@me", limits(0, 30))
+    with pytest.raises(DiscordRateLimited):
+        asyncio.run(limiter.acquire("u", "/users/@me"))
+    # Buckets are per token.
+    asyncio.run(limiter.acquire("other", "/users/@me"))
+
+
+def test_exhausted_bucket_waits_for_reset():
+    limiter = DiscordRateLimiter(max_wait=1)
+    limiter.update("u", "/guilds", limits(0, 0.05))
+    started = time.monotonic()
+    asyncio.run(limiter.acquire("u", "/guilds"))
+    assert time.monotonic() - started >= 0.04
+    assert limiter._bucket("u", "/guilds").remaining is None
+
+
+def test_routes_share_a_discord_bucket():
+    limiter = DiscordRateLimiter(max_wait=1)
+    limiter.update("u", "/a", limits(0, 30, **{"X-RateLimit-Bucket": "b1"}))
+    limiter.update("u", "/b", response(**{"X-RateLimit-Bucket": "b1"}))
+    with pytest.raises(DiscordRateLimited):
+        asyncio.run(limiter.acquire("u", "/b"))
+
+
+def test_429_returns_retry_after():
+    limiter = DiscordRateLimiter(max_wait=1)
+    delay = limiter.update("u", "/guilds", response(429, json={"retry_after": 12.5}))
+    assert delay == 12.5
+    with pytest.raises(DiscordRateLimited):
+        asyncio.run(limiter.acquire("u", "/guilds"))
+
+
+def test_global_429_blocks_every_route():
+    limiter = DiscordRateLimiter(max_wait=1)
+    global_429 = response(429, json={"retry_after": 10}, **{"X-RateLimit-Global": "true"})
+    limiter.update("u", "/a", global_429)
+    with pytest.raises(DiscordRateLimited):
+        asyncio.run(limiter.acquire("other", "/b"))
+
+
+def test_bucket_maps_are_capped():
+    limiter = DiscordRateLimiter(max_buckets=100)
+    for i in range(1_000):
+        limiter.update(f"user{i}", "/users/@me", response(**{"X-RateLimit-Bucket": f"b{i}"}))
+    assert len(limiter._buckets) <= 100
+    assert len(limiter._route_buckets) <= 100
+
+
+def test_pruning_keeps_limited_buckets_over_reset_ones():
+    limiter = DiscordRateLimiter(max_buckets=10, max_wait=1)
+    limiter.update("limited", "/a", response(429, json={"retry_after": 60}))
+    for i in range(20):
+        limiter.update(f"user{i}", "/a", response())
+    with pytest.raises(DiscordRateLimited):
+        asyncio.run(limiter.acquire("limited", "/a"))
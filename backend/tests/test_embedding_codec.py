@@ -0,0 +1,46 @@
+import base64
+
+import numpy as np
+import pytest
+
+from app.core.embedding_codec import as_vector, decode_embedding, encode_embedding
+
+
+def test_as_vector_parses_pgvector_text():
+    assert as_vector("[0.5,-1,2.25]") == [0.5, -1.0, 2.25]
+
+
+def test_as_vector_accepts_sequences_and_arrays():
+    assert as_vector((1, 2)) == [1.0, 2.0]
+    assert as_vector(np.asarray([0.25, 0.5], dtype=np.float32)) == [0.25, 0.5]
+
+
+@pytest.mark.parametrize("value", [None, [], "[]"])
+def test_as_vector_empty_is_none(value):
+    assert as_vector(value) is None
+
+
+@pytest.mark.parametrize("encoding", ["f32", "f16"])
+def test_round_trip(encoding):
+    vector = [0.0, 1.0, -0.5, 0.125]
+    assert decode_embedding(encode_embedding(vector, encoding), encoding) == vector
+
+
+def test_encode_accepts_pgvector_text():
+    assert encode_embedding("[0.5,-1]") == encode_embedding([0.5, -1.0])
+
+
+def test_encoded_sizes():
+    vector = [0.1] * 1024
+    assert len(base64.b64decode(encode_embedding(vector, "f32"))) == 4096
+    assert len(base64.b64decode(encode_embedding(vector, "f16"))) == 2048
+
+
+def test_f32_is_little_endian():
+    payload = base64.b64decode(encode_embedding([1.0]))
+    assert payload == np.asarray([1.0], dtype="<f4").tobytes()
+
+
+def test_unknown_encoding():
+    with pytest.raises(KeyError):
+        encode_embedding([1.0], "f64")
@@ -0,0 +1,46 @@
+import pytest
+
+from app.integrations.github import MAX_LANGUAGES, interests_from_viewer, language_weights
+
+
+def repo(name=None, primary=None, **sizes):
+    return {
+        "name": name,
+        "primaryLanguage": {"name": primary} if primary else None,
+        "languages": {
+            "edges": [{"size": size, "node": {"name": lang}} for lang, size in sizes.items()]
+        },
+    }
+
+
+def test_language_weights_aggregate_bytes():
+    weights = language_weights([repo(Python=600, Rust=50), repo(Python=200, Shell=150)])
+    assert [name for name, _ in weights] == ["Python", "Shell", "Rust"]
+    assert dict(weights) == pytest.approx({"Python": 0.8, "Shell": 0.15, "Rust": 0.05})
+
+
+def test_language_weights_primary_language_fallback():
+    weights = language_weights([repo(primary="Go"), repo(primary="Go"), repo(primary="C")])
+    assert dict(weights) == pytest.approx({"Go": 2 / 3, "C": 1 / 3})
+
+
+def test_language_weights_drop_small_shares_and_cap():
+    assert language_weights([repo(Python=990, Makefile=10)]) == [("Python", 0.99)]
+    many = repo(**{f"Lang{i}": 100 for i in range(MAX_LANGUAGES + 4)})
+    assert len(language_weights([many])) == MAX_LANGUAGES
+
+
+def test_language_weights_empty():
+    assert language_weights([]) == []
+    assert language_weights([repo(), {"languages": None}]) == []
+
+
+def test_interests_from_viewer():
+    viewer = {
+        "login": "octocat",
+        "repositories": {"nodes": [repo("mosaic", "Python", Python=750, HTML=250)]},
+    }
+    interests = interests_from_viewer(viewer)
+    assert interests[0] == "GitHub user: octocat"
+    assert "Language: Python (75% of code)" in interests
+    assert "Language: HTML (25% of code)" in interests
@@ -0,0 +1,23 @@
+from app.core.http_cache import cacheable_response, etag
+
+
+def test_public_response():
+    resp = cacheable_response(b"{}", media_type="application/json", max_age=60)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == etag(b"{}")
+    assert resp.headers["Cache-Control"].startswith("public, max-age=60")
+
+
+def test_private_response_varies_on_authorization():
+    resp = cacheable_response(b"{}", media_type="application/json", max_age=60, private=True)
+    assert resp.headers["Cache-Control"].startswith("private, max-age=60")
+    assert "Authorization" in resp.headers["Vary"]
+
+
+def test_matching_etag_is_not_modified():
+    tag = etag(b"tile")
+    resp = cacheable_response(
+        b"tile", media_type="application/octet-stream", max_age=60, if_none_match=f'"x", {tag}'
+    )
+    assert resp.status_code == 304
+    assert resp.body == b""
@@ -0,0 +1,99 @@
+import struct
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.map_tiles import (
+    MAGIC,
+    MAX_ZOOM,
+    NO_COLOR,
+    MapTile,
+    _tile_from_rows,
+    encode_binary,
+    encode_json,
+    tile_bounds,
+    valid_tile,
+)
+
+USER_ID = "6f1c2d4e-8a9b-4c3d-9e0f-1a2b3c4d5e6f"
+
+
+def marker_tile() -> MapTile:
+    rows = [
+        {"id": USER_ID, "lat": 48.8566, "lon": 2.3522, "marker_color": "#00F2FF"},
+        {"id": None, "lat": -33.8688, "lon": 151.2093, "marker_color": None, "point_count": 7},
+    ]
+    return _tile_from_rows(3, 4, 2, rows, clustered=False)
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-180, -85.0511, 180, 85.0511), abs=1e-4)
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(1, 1, 0)
+    assert (min_lon, min_lat, max_lon) == pytest.approx((0, 0, 180))
+    assert max_lat == pytest.approx(85.0511, abs=1e-4)
+
+
+def test_valid_tile():
+    assert valid_tile(0, 0, 0)
+    assert valid_tile(2, 3, 3)
+    assert not valid_tile(2, 4, 0)
+    assert not valid_tile(-1, 0, 0)
+    assert not valid_tile(MAX_ZOOM + 1, 0, 0)
+
+
+def test_encode_json():
+    data = encode_json(marker_tile())
+    assert data == {
+        "z": 3,
+        "x": 4,
+        "y": 2,
+        "clustered": False,
+        "id": [USER_ID, None],
+        "lat": [48.8566, -33.8688],
+        "lon": [2.3522, 151.2093],
+        "color": ["#00F2FF", None],
+        "count": [1, 7],
+    }
+
+
+def test_encode_json_histograms():
+    tile = marker_tile()
+    tile.histograms = [{"#00F2FF": 1}, {"#ADFF2F": 7}]
+    assert encode_json(tile)["histogram"] == [{"#00F2FF": 1}, {"#ADFF2F": 7}]
+
+
+def test_encode_binary_layout():
+    tile = marker_tile()
+    payload = encode_binary(tile)
+    n = len(tile)
+    assert len(payload) == 24 + 32 * n
+    assert payload[:4] == MAGIC
+    assert struct.unpack_from("<5I", payload, 4) == (0, n, 3, 4, 2)
+
+    offset = 24
+    lat = np.frombuffer(payload, "<f4", n, offset)
+    lon = np.frombuffer(payload, "<f4", n, offset + 4 * n)
+    colors = np.frombuffer(payload, "<u4", n, offset + 8 * n)
+    counts = np.frombuffer(payload, "<u4", n, offset + 12 * n)
+    ids = payload[offset + 16 * n :]
+
+    np.testing.assert_allclose(lat, [48.8566, -33.8688], rtol=1e-6)
+    np.testing.assert_allclose(lon, [2.3522, 151.2093], rtol=1e-6)
+    assert colors.tolist() == [0x00F2FF, NO_COLOR]
+    assert counts.tolist() == [1, 7]
+    assert ids[:16] == uuid.UUID(USER_ID).bytes
+    assert ids[16:] == bytes(16)
+
+
+def test_encode_binary_flags_clusters_and_bad_colors():
+    tile = _tile_from_rows(0, 0, 0, [{"lat": 0, "lon": 0, "marker_color": "cyan"}], clustered=True)
+    payload = encode_binary(tile)
+    assert struct.unpack_from("<I", payload, 4) == (1,)
+    assert np.frombuffer(payload, "<u4", 1, 32).tolist() == [NO_COLOR]
+
+
+def test_empty_tile():
+    tile = _tile_from_rows(5, 1, 1, [], clustered=False)
+    assert encode_binary(tile) == MAGIC + struct.pack("<5I", 0, 0, 5, 1, 1)
+    assert encode_json(tile)["id"] == []
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.core.ranking import (
+    CONTRAST_GEO_CAP_M,
+    CONTRAST_GEO_SCALE_M,
+    FEATURES,
+    candidates_from_matches,
+    composite_scores,
+    feature_matrix,
+    mmr_select,
+    mode_weights,
+    pairwise_similarity,
+    rerank,
+)
+from app.models.schemas import Mode
+
+
+INTEREST_ONLY = {"ideological_diversity": 0, "geographic": 0}
+
+
+def harmony_row(user_id, similarity, distance_m=None, ideology=None):
+    return {
+        "user_id": user_id,
+        "similarity": similarity,
+        "distance_meters": distance_m,
+        "ideology_score": ideology,
+    }
+
+
+def test_candidates_from_harmony_rows():
+    candidates = candidates_from_matches(
+        [harmony_row("a", 0.9, 2_000, 3), harmony_row("b", 1.2), harmony_row("c", None)]
+    )
+    assert candidates.user_ids == ["a", "b", "c"]
+    np.testing.assert_allclose(candidates.similarity, [0.9, 1.0, 0.0])
+    assert candidates.distance_km[0] == 2.0
+    assert np.isnan(candidates.distance_km[1])
+    assert candidates.ideology[0] == 3
+    assert np.isnan(candidates.ideology[1])
+
+
+def test_candidates_from_contrast_rows_remove_geo_term():
+    distance_m = 4_000_000.0
+    geo = min(distance_m, CONTRAST_GEO_CAP_M) / CONTRAST_GEO_SCALE_M
+    candidates = candidates_from_matches(
+        [
+            {
+                "user_id": "a",
+                "diversity": 0.4 + geo,
+                "distance_meters": distance_m,
+                "ideology_score": 7,
+            }
+        ]
+    )
+    np.testing.assert_allclose(candidates.similarity, [0.6])
+    assert candidates.ideology[0] == 7
+
+
+def test_candidates_from_no_rows():
+    candidates = candidates_from_matches([])
+    assert len(candidates) == 0
+    assert composite_scores(candidates, Mode.HARMONY, 0).shape == (0,)
+
+
+def test_mode_weights_normalized(monkeypatch):
+    for mode in Mode:
+        assert mode_weights(mode).sum() == pytest.approx(1.0)
+    monkeypatch.setattr(settings, "search_harmony_weights", INTEREST_ONLY)
+    np.testing.assert_allclose(mode_weights(Mode.HARMONY), [1.0, 0.0, 0.0])
+    monkeypatch.setattr(settings, "search_harmony_weights", {f: 0 for f in FEATURES})
+    np.testing.assert_allclose(mode_weights(Mode.HARMONY), [1.0, 0.0, 0.0])
+
+
+def test_feature_matrix_unknowns_are_neutral():
+    candidates = candidates_from_matches([harmony_row("a", 0.8)])
+    features = feature_matrix(candidates, Mode.HARMONY, own_ideology=None)
+    np.testing.assert_allclose(features, [[0.8, 0.5, 0.5]])
+
+
+def test_ideology_feature_peaks_at_moderate_difference():
+    rows = [harmony_row(str(i), 0.5, ideology=i) for i in (0, 4, 9)]
+    ideology = feature_matrix(candidates_from_matches(rows), Mode.HARMONY, own_ideology=0)[:, 1]
+    assert ideology[1] == pytest.approx(1.0)
+    assert ideology[1] > ideology[0]
+    assert ideology[1] > ideology[2]
+
+
+def test_contrast_flips_interest_and_distance():
+    candidates = candidates_from_matches([harmony_row("a", 0.8, distance_m=0.0)])
+    features = feature_matrix(candidates, Mode.CONTRAST, own_ideology=None)
+    np.testing.assert_allclose(features, [[0.2, 0.5, 0.0]], atol=1e-12)
+
+
+def test_rerank_orders_by_score_and_is_stable(monkeypatch):
+    monkeypatch.setattr(settings, "search_harmony_weights", INTEREST_ONLY)
+    candidates = candidates_from_matches(
+        [harmony_row("a", 0.5), harmony_row("b", 0.9), harmony_row("c", 0.5), harmony_row("d", 0.7)]
+    )
+    order, scores = rerank(candidates, Mode.HARMONY, None, limit=3)
+    assert order.tolist() == [1, 3, 0]
+    np.testing.assert_allclose(scores, [0.5, 0.9, 0.5, 0.7])
+
+
+def test_rerank_prefers_nearby_in_harmony():
+    candidates = candidates_from_matches(
+        [harmony_row("far", 0.8, distance_m=5_000_000), harmony_row("near", 0.8, distance_m=1_000)]
+    )
+    order, _ = rerank(candidates, Mode.HARMONY, None, limit=2)
+    assert order.tolist() == [1, 0]
+
+
+def test_pairwise_similarity(monkeypatch):
+    monkeypatch.setattr(settings, "search_mmr_geo_weight", 0.5)
+    embeddings = np.asarray([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+    coordinates = np.asarray([[48.85, 2.35], [48.85, 2.35], [-33.9, 151.2], [np.nan, np.nan]])
+    similarity = pairwise_similarity(embeddings, coordinates)
+    assert similarity.shape == (4, 4)
+    assert similarity[0, 1] == pytest.approx(1.0)
+    assert similarity[0, 2] == pytest.approx(0.0, abs=1e-9)
+    assert similarity[0, 3] == pytest.approx(0.0)
+
+
+def test_mmr_without_diversity_is_relevance_order():
+    relevance = np.asarray([0.2, 0.9, 0.5])
+    assert mmr_select(relevance, np.eye(3), 2, diversity=0.0).tolist() == [1, 2]
+
+
+def test_mmr_skips_near_duplicates():
+    relevance = np.asarray([0.9, 0.89, 0.6])
+    similarity = np.asarray([[1.0, 0.99, 0.0], [0.99, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    assert mmr_select(relevance, similarity, 2, diversity=0.5).tolist() == [0, 2]
+
+
+def test_mmr_caps_k():
+    assert sorted(mmr_select(np.asarray([0.1, 0.2]), np.eye(2), 5, 0.5).tolist()) == [0, 1]
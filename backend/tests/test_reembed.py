@@ -0,0 +1,21 @@
+from app.core import reembed
+from app.core.reembed import ReembedProgress, _embed_batch, dna_fingerprint
+
+
+def test_dna_fingerprint_matches_postgres_md5():
+    # SELECT md5(''), md5('abc'), md5('café') in a UTF8 database
+    assert dna_fingerprint("") == "d41d8cd98f00b204e9800998ecf8427e"
+    assert dna_fingerprint("abc") == "900150983cd24fb0d6963f7d28e17f72"
+    assert dna_fingerprint("café") == "07117fe4a1ebd544965dc19573183da2"
+
+
+def test_embedded_rows_carry_the_fingerprint(monkeypatch):
+    monkeypatch.setattr(
+        reembed, "get_embeddings", lambda texts, model: [[float(len(t)), 1.0] for t in texts]
+    )
+    rows = [{"id": "a", "dna_string": "one"}, {"id": "b", "dna_string": "three"}]
+    embedded = _embed_batch(rows, model="m", max_retries=0, progress=ReembedProgress(total=2))
+    assert embedded == [
+        {"id": "a", "embedding": [3.0, 1.0], "dna_md5": dna_fingerprint("one")},
+        {"id": "b", "embedding": [5.0, 1.0], "dna_md5": dna_fingerprint("three")},
+    ]
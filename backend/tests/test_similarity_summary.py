@@ -0,0 +1,95 @@
+from app.core.similarity_summary import (
+    SharedInterest,
+    describe_shared_interests,
+    find_shared_interests,
+    normalize,
+    parse_interest,
+    parse_interests,
+    trigram_similarity,
+)
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize("  Pokémon: Let's GO! ") == "pokemon let s go"
+
+
+def test_parse_interest_prefixes():
+    game = parse_interest("Top owned: Terraria")
+    assert (game.kind, game.label, game.key) == ("game", "Terraria", "terraria")
+    assert parse_interest("Hiking").kind == "hobby"
+    assert parse_interest("Language: Python (42% of code)").label == "Python"
+
+
+def test_parse_interest_skips_accounts_and_blanks():
+    assert parse_interest("GitHub user: octocat") is None
+    assert parse_interest("Repo: dotfiles") is None
+    assert parse_interest("  ") is None
+
+
+def test_parse_interests_dedupes_by_kind_and_key():
+    parsed = parse_interests(["Recently played: Hades", "Top owned: hades", "Hades"])
+    assert [(i.kind, i.key) for i in parsed] == [("game", "hades"), ("hobby", "hades")]
+
+
+def test_trigram_similarity():
+    assert trigram_similarity("minecraft", "minecraft") == 1.0
+    assert trigram_similarity("minecraft", "") == 0.0
+    assert 0.0 < trigram_similarity("minecraft", "minecraft dungeons") < 1.0
+
+
+def test_exact_matches_across_prefixes():
+    shared = find_shared_interests(["Top owned: Terraria"], ["Recently played: terraria"])
+    assert shared == [SharedInterest("game", "Terraria", 1.0)]
+
+
+def test_fuzzy_match_within_kind_only():
+    shared = find_shared_interests(
+        ["Subscribed: Veritasium Channel"],
+        ["Subscribed: Veritasium Channels", "Veritasium Channel"],
+    )
+    assert len(shared) == 1
+    assert shared[0].kind == "channel"
+    assert 0.6 <= shared[0].score < 1.0
+
+    assert find_shared_interests(["Subscribed: Veritasium"], ["Veritasium"]) == []
+
+
+def test_fuzzy_threshold_one_disables_fuzzy():
+    shared = find_shared_interests(
+        ["Subscribed: Veritasium Channel"], ["Subscribed: Veritasium Channels"], fuzzy_threshold=1.0
+    )
+    assert shared == []
+
+
+def test_each_second_item_matches_once():
+    shared = find_shared_interests(["Rock climbing", "Rock climbings"], ["Rock climbing gym"], 0.5)
+    assert len(shared) == 1
+
+
+def test_order_by_kind_then_score():
+    shared = find_shared_interests(
+        ["Hiking", "Language: Python (80% of code)", "Top owned: Hades"],
+        ["hiking", "Language: Python (10% of code)", "Recently played: Hades"],
+    )
+    assert [s.kind for s in shared] == ["game", "hobby", "language"]
+
+
+def test_describe_shared_interests():
+    assert describe_shared_interests([]) == ""
+    text = describe_shared_interests(
+        [
+            SharedInterest("game", "Hades", 1.0),
+            SharedInterest("game", "Terraria", 1.0),
+            SharedInterest("hobby", "hiking", 1.0),
+        ]
+    )
+    assert text == (
+        "You both play Hades and Terraria and are into hiking, "
+        "so you already have something to team up on."
+    )
+
+
+def test_describe_caps_items():
+    shared = [SharedInterest("hobby", f"thing {i}", 1.0) for i in range(6)]
+    text = describe_shared_interests(shared, max_items=2)
+    assert "thing 1" in text and "thing 2" not in text
@@ -0,0 +1,116 @@
+import threading
+import time
+
+from app.core import singleflight
+from app.core.singleflight import do, make_key, render_prometheus
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def shared_count(operation):
+    return singleflight._stats.get((operation, "shared"), 0)
+
+
+def test_make_key():
+    assert make_key("similarity_summary", "a", 7) == "similarity_summary:a:7"
+
+
+def test_concurrent_callers_share_one_run():
+    release = threading.Event()
+    calls, results = [], []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    def caller():
+        results.append(do("shared:key", fn, distributed=False))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    wait_until(lambda: calls)
+    before = shared_count("shared")
+    waiters = [threading.Thread(target=caller) for _ in range(4)]
+    for waiter in waiters:
+        waiter.start()
+    wait_until(lambda: shared_count("shared") == before + 4)
+    release.set()
+    leader.join(5)
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert "shared:key" not in singleflight._calls
+
+
+def test_waiters_get_the_leaders_exception():
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    def caller():
+        try:
+            do("error:key", fn, distributed=False)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    before = shared_count("error")
+    waiter = threading.Thread(target=caller)
+    waiter.start()
+    wait_until(lambda: shared_count("error") == before + 1)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+    assert errors == ["boom", "boom"]
+
+
+def test_sequential_calls_run_again():
+    calls = []
+    assert do("test:sequential", lambda: calls.append(1) or len(calls), distributed=False) == 1
+    assert do("test:sequential", lambda: calls.append(1) or len(calls), distributed=False) == 2
+
+
+def test_waiter_runs_itself_after_timeout():
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "leader"
+
+    leader = threading.Thread(target=lambda: do("test:timeout", slow, distributed=False))
+    leader.start()
+    started.wait(5)
+    try:
+        assert do("test:timeout", lambda: "waiter", distributed=False, timeout=0.01) == "waiter"
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_distributed_degrades_without_redis(monkeypatch):
+    def unavailable():
+        raise singleflight.redis.ConnectionError("down")
+
+    monkeypatch.setattr(singleflight, "get_redis_sync", unavailable)
+    assert do("test:distributed", lambda: 42, distributed=True) == 42
+
+
+def test_render_prometheus():
+    do("metrics:x", lambda: None, distributed=False)
+    line = 'mosaic_singleflight_calls_total{operation="metrics",outcome="leader"}'
+    assert line in render_prometheus()
@@ -0,0 +1,7 @@
+-- ============================================================================
+-- Index for the proactive token refresher (app/core/token_refresher.py).
+-- It pages refreshable accounts by (expires_at, user_id, provider).
+-- ============================================================================
+CREATE INDEX IF NOT EXISTS idx_oauth_accounts_expires_at
+    ON oauth_accounts (expires_at, user_id, provider)
+    WHERE refresh_token IS NOT NULL;
@@ -0,0 +1,90 @@
+-- ============================================================================
+-- Re-embedding support (app/core/reembed.py)
+--
+-- A new embedding model is rolled out by writing vectors to a shadow column
+-- (embedding_next) while matching keeps using embedding, then swapping the
+-- columns in one transaction. The previous vectors are kept in
+-- embedding_prev until the next migration for rollback.
+-- ============================================================================
+
+-- Untyped so the new model may have a different dimension.
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS embedding_next VECTOR;
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS embedding_next_at TIMESTAMPTZ;
+
+-- Rows still to (re-)embed: no shadow vector yet, or the profile changed
+-- after its shadow vector was written.
+CREATE OR REPLACE FUNCTION profiles_pending_reembed(
+    after_id UUID DEFAULT NULL,
+    page_size INT DEFAULT 500
+)
+RETURNS TABLE (
+    id UUID,
+    dna_string TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT p.id, p.dna_string
+    FROM profiles p
+    WHERE p.dna_string IS NOT NULL
+        AND btrim(p.dna_string) <> ''
+        AND (p.embedding_next IS NULL OR p.updated_at > p.embedding_next_at)
+        AND (after_id IS NULL OR p.id > after_id)
+    ORDER BY p.id
+    LIMIT page_size;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION count_profiles_pending_reembed()
+RETURNS BIGINT AS $$
+    SELECT count(*)
+    FROM profiles p
+    WHERE p.dna_string IS NOT NULL
+        AND btrim(p.dna_string) <> ''
+        AND (p.embedding_next IS NULL OR p.updated_at > p.embedding_next_at);
+$$ LANGUAGE sql STABLE;
+
+-- Batched write of shadow vectors: rows = [{"id": "...", "embedding": [...]}, ...]
+CREATE OR REPLACE FUNCTION set_profile_embeddings_next(rows JSONB)
+RETURNS INT AS $$
+DECLARE
+    updated INT;
+BEGIN
+    UPDATE profiles p
+    SET embedding_next = (r->>'embedding')::VECTOR,
+        embedding_next_at = NOW()
+    FROM jsonb_array_elements(rows) AS r
+    WHERE p.id = (r->>'id')::UUID;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Atomically promote embedding_next to embedding. Refuses to run while rows
+-- are still pending. Rebuilds the HNSW index for the new dimension.
+CREATE OR REPLACE FUNCTION swap_profile_embeddings(dims INT)
+RETURNS BIGINT AS $$
+DECLARE
+    pending BIGINT;
+    swapped BIGINT;
+BEGIN
+    -- Block profile writes so nothing lands between the check and the swap.
+    LOCK TABLE profiles IN SHARE ROW EXCLUSIVE MODE;
+
+    pending := count_profiles_pending_reembed();
+    IF pending > 0 THEN
+        RAISE EXCEPTION '% profiles still pending re-embedding', pending;
+    END IF;
+
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding TO embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding_next TO embedding;
+    EXECUTE format('ALTER TABLE profiles ALTER COLUMN embedding TYPE VECTOR(%s)', dims);
+    ALTER TABLE profiles ADD COLUMN embedding_next VECTOR;
+    UPDATE profiles SET embedding_next_at = NULL;
+    CREATE INDEX idx_profiles_embedding ON profiles USING hnsw(embedding vector_cosine_ops);
+
+    SELECT count(*) INTO swapped FROM profiles WHERE embedding IS NOT NULL;
+    RETURN swapped;
+END;
+$$ LANGUAGE plpgsql;
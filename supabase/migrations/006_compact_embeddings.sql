@@ -0,0 +1,172 @@
+-- ============================================================================
+-- Compact embedding indexes and wire format
+--
+-- The heap keeps full float32 vectors for exact re-ranking; the compact
+-- representations live only in expression indexes:
+--   * halfvec:  float16 HNSW index, half the memory of the float32 one
+--   * binary:   1 bit per dimension (binary_quantize) with hamming distance,
+--               32x smaller, used as a coarse pass re-ranked exactly
+-- Requires pgvector >= 0.7.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_profiles_embedding_half
+    ON profiles USING hnsw ((embedding::halfvec(1024)) halfvec_cosine_ops);
+
+CREATE INDEX IF NOT EXISTS idx_profiles_embedding_bit
+    ON profiles USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops);
+
+-- Decode base64 little-endian float32 ('f32') or float16 ('f16') into a vector.
+CREATE OR REPLACE FUNCTION decode_embedding(payload TEXT, encoding TEXT DEFAULT 'f32')
+RETURNS VECTOR AS $$
+    WITH raw AS (
+        SELECT decode(payload, 'base64') AS b,
+               CASE WHEN encoding = 'f16' THEN 2 ELSE 4 END AS width
+    ),
+    words AS (
+        SELECT i,
+               CASE WHEN width = 2 THEN
+                   get_byte(b, i * 2)::BIGINT | (get_byte(b, i * 2 + 1)::BIGINT << 8)
+               ELSE
+                   get_byte(b, i * 4)::BIGINT
+                   | (get_byte(b, i * 4 + 1)::BIGINT << 8)
+                   | (get_byte(b, i * 4 + 2)::BIGINT << 16)
+                   | (get_byte(b, i * 4 + 3)::BIGINT << 24)
+               END AS w,
+               width
+        FROM raw, generate_series(0, length(b) / width - 1) AS i
+    )
+    SELECT array_agg(
+        CASE WHEN width = 2 THEN
+            (CASE WHEN (w >> 15) = 1 THEN -1 ELSE 1 END)
+            * CASE WHEN ((w >> 10) & 31) = 0
+                THEN ((w & 1023) / 1024.0) * power(2::FLOAT8, -14)
+                ELSE (1 + (w & 1023) / 1024.0) * power(2::FLOAT8, ((w >> 10) & 31) - 15)
+              END
+        ELSE
+            (CASE WHEN (w >> 31) = 1 THEN -1 ELSE 1 END)
+            * CASE WHEN ((w >> 23) & 255) = 0
+                THEN ((w & 8388607) / 8388608.0) * power(2::FLOAT8, -126)
+                ELSE (1 + (w & 8388607) / 8388608.0) * power(2::FLOAT8, ((w >> 23) & 255) - 127)
+              END
+        END
+        ORDER BY i
+    )::FLOAT4[]::VECTOR
+    FROM words;
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+-- Harmony matches with an encoded query and a choice of index:
+--   'vector'  - exact float32 HNSW (same as find_harmony_matches)
+--   'halfvec' - float16 HNSW for candidates, re-ranked on float32
+--   'binary'  - hamming HNSW over binary_quantize for candidates, re-ranked
+CREATE OR REPLACE FUNCTION find_harmony_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    index_mode TEXT DEFAULT 'vector',
+    rerank_factor INT DEFAULT 4
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+DECLARE
+    q VECTOR := decode_embedding(query_embedding, embedding_encoding);
+BEGIN
+    IF index_mode = 'halfvec' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+            ORDER BY p.embedding::halfvec(1024) <=> q::halfvec(1024)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    ELSIF index_mode = 'binary' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+            ORDER BY binary_quantize(p.embedding)::bit(1024) <~> binary_quantize(q)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    ELSE
+        RETURN QUERY SELECT * FROM find_harmony_matches(q, user_location, match_limit);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_contrast_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32'
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT
+) AS $$
+    SELECT * FROM find_contrast_matches(
+        decode_embedding(query_embedding, embedding_encoding),
+        user_location,
+        min_distance_meters,
+        match_limit
+    );
+$$ LANGUAGE sql;
+
+-- The re-embedding swap (005) must rebuild the compact indexes too, since
+-- they are tied to the column and its dimension.
+CREATE OR REPLACE FUNCTION swap_profile_embeddings(dims INT)
+RETURNS BIGINT AS $$
+DECLARE
+    pending BIGINT;
+    swapped BIGINT;
+BEGIN
+    LOCK TABLE profiles IN SHARE ROW EXCLUSIVE MODE;
+
+    pending := count_profiles_pending_reembed();
+    IF pending > 0 THEN
+        RAISE EXCEPTION '% profiles still pending re-embedding', pending;
+    END IF;
+
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    DROP INDEX IF EXISTS idx_profiles_embedding_half;
+    DROP INDEX IF EXISTS idx_profiles_embedding_bit;
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding TO embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding_next TO embedding;
+    EXECUTE format('ALTER TABLE profiles ALTER COLUMN embedding TYPE VECTOR(%s)', dims);
+    ALTER TABLE profiles ADD COLUMN embedding_next VECTOR;
+    UPDATE profiles SET embedding_next_at = NULL;
+    CREATE INDEX idx_profiles_embedding ON profiles USING hnsw(embedding vector_cosine_ops);
+    EXECUTE format(
+        'CREATE INDEX idx_profiles_embedding_half ON profiles '
+        'USING hnsw ((embedding::halfvec(%s)) halfvec_cosine_ops)', dims
+    );
+    EXECUTE format(
+        'CREATE INDEX idx_profiles_embedding_bit ON profiles '
+        'USING hnsw ((binary_quantize(embedding)::bit(%s)) bit_hamming_ops)', dims
+    );
+    -- find_harmony_matches_compact casts to halfvec(1024)/bit(1024); redefine
+    -- it with the new dimension when it changes.
+
+    SELECT count(*) INTO swapped FROM profiles WHERE embedding IS NOT NULL;
+    RETURN swapped;
+END;
+$$ LANGUAGE plpgsql;
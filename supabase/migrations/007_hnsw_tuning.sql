@@ -0,0 +1,170 @@
+-- ============================================================================
+-- HNSW tuning
+--
+-- * Index builds take m / ef_construction (pgvector defaults: 16 / 64).
+--   Higher values raise recall at a given ef_search for a slower build and a
+--   larger index. scripts/bench_hnsw.py measures the trade-off.
+-- * Match RPCs take ef_search per query (the API ties it to the requested
+--   limit). It is set with set_config(..., true), so it only lasts for the
+--   request's transaction.
+-- ============================================================================
+
+-- (Re)build the embedding indexes with explicit build parameters. Large
+-- tables may exceed the PostgREST statement timeout; run it from psql then.
+CREATE OR REPLACE FUNCTION rebuild_embedding_indexes(
+    m INT DEFAULT 16,
+    ef_construction INT DEFAULT 64,
+    dims INT DEFAULT 1024
+)
+RETURNS VOID AS $$
+BEGIN
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    DROP INDEX IF EXISTS idx_profiles_embedding_half;
+    DROP INDEX IF EXISTS idx_profiles_embedding_bit;
+    EXECUTE format(
+        'CREATE INDEX idx_profiles_embedding ON profiles '
+        'USING hnsw (embedding vector_cosine_ops) WITH (m = %s, ef_construction = %s)',
+        m, ef_construction
+    );
+    EXECUTE format(
+        'CREATE INDEX idx_profiles_embedding_half ON profiles '
+        'USING hnsw ((embedding::halfvec(%s)) halfvec_cosine_ops) '
+        'WITH (m = %s, ef_construction = %s)',
+        dims, m, ef_construction
+    );
+    EXECUTE format(
+        'CREATE INDEX idx_profiles_embedding_bit ON profiles '
+        'USING hnsw ((binary_quantize(embedding)::bit(%s)) bit_hamming_ops) '
+        'WITH (m = %s, ef_construction = %s)',
+        dims, m, ef_construction
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- The re-embedding swap now builds the indexes with the configured parameters.
+DROP FUNCTION IF EXISTS swap_profile_embeddings(INT);
+
+CREATE OR REPLACE FUNCTION swap_profile_embeddings(
+    dims INT,
+    m INT DEFAULT 16,
+    ef_construction INT DEFAULT 64
+)
+RETURNS BIGINT AS $$
+DECLARE
+    pending BIGINT;
+    swapped BIGINT;
+BEGIN
+    LOCK TABLE profiles IN SHARE ROW EXCLUSIVE MODE;
+
+    pending := count_profiles_pending_reembed();
+    IF pending > 0 THEN
+        RAISE EXCEPTION '% profiles still pending re-embedding', pending;
+    END IF;
+
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    DROP INDEX IF EXISTS idx_profiles_embedding_half;
+    DROP INDEX IF EXISTS idx_profiles_embedding_bit;
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding TO embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding_next TO embedding;
+    EXECUTE format('ALTER TABLE profiles ALTER COLUMN embedding TYPE VECTOR(%s)', dims);
+    ALTER TABLE profiles ADD COLUMN embedding_next VECTOR;
+    UPDATE profiles SET embedding_next_at = NULL;
+    PERFORM rebuild_embedding_indexes(m, ef_construction, dims);
+    -- find_harmony_matches_compact casts to halfvec(1024)/bit(1024); redefine
+    -- it with the new dimension when it changes.
+
+    SELECT count(*) INTO swapped FROM profiles WHERE embedding IS NOT NULL;
+    RETURN swapped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Harmony mode with a per-query ef_search.
+DROP FUNCTION IF EXISTS find_harmony_matches(VECTOR, GEOGRAPHY, INT);
+
+CREATE OR REPLACE FUNCTION find_harmony_matches(
+    query_embedding VECTOR(1024),
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    ef_search INT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        p.id,
+        1 - (p.embedding <=> query_embedding) AS similarity,
+        ST_Distance(p.location, user_location) AS distance_meters
+    FROM profiles p
+    WHERE p.embedding IS NOT NULL
+    ORDER BY p.embedding <=> query_embedding ASC
+    LIMIT match_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS find_harmony_matches_compact(TEXT, GEOGRAPHY, INT, TEXT, TEXT, INT);
+
+CREATE OR REPLACE FUNCTION find_harmony_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    index_mode TEXT DEFAULT 'vector',
+    rerank_factor INT DEFAULT 8,
+    ef_search INT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+DECLARE
+    q VECTOR := decode_embedding(query_embedding, embedding_encoding);
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+
+    IF index_mode = 'halfvec' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+            ORDER BY p.embedding::halfvec(1024) <=> q::halfvec(1024)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    ELSIF index_mode = 'binary' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+            ORDER BY binary_quantize(p.embedding)::bit(1024) <~> binary_quantize(q)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    ELSE
+        RETURN QUERY SELECT * FROM find_harmony_matches(q, user_location, match_limit);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
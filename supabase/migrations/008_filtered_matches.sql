@@ -0,0 +1,191 @@
+-- ============================================================================
+-- Filtered match RPCs
+--
+-- The caller (exclude_user_id) and an optional radius (max_distance_meters)
+-- are filtered in SQL instead of after the RPC, so a page is not short by
+-- the rows dropped afterwards. A plain HNSW scan returns ef_search
+-- candidates and filters them afterwards, which can still starve a page. With
+-- iterative index scans (pgvector >= 0.8) the scan keeps pulling candidates
+-- until match_limit rows pass the filters, or until hnsw.max_scan_tuples
+-- tuples have been visited (the cap). relaxed_order may return rows slightly
+-- out of order, so each query materializes its candidates and sorts them again.
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS find_harmony_matches(VECTOR, GEOGRAPHY, INT, INT);
+
+CREATE OR REPLACE FUNCTION find_harmony_matches(
+    query_embedding VECTOR(1024),
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    RETURN QUERY
+    WITH relaxed AS MATERIALIZED (
+        SELECT p.id, p.embedding <=> query_embedding AS cosine_distance, p.location
+        FROM profiles p
+        WHERE p.embedding IS NOT NULL
+            AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+            AND (max_distance_meters IS NULL
+                 OR ST_DWithin(p.location, user_location, max_distance_meters))
+        ORDER BY p.embedding <=> query_embedding ASC
+        LIMIT match_limit
+    )
+    SELECT
+        r.id,
+        1 - r.cosine_distance AS similarity,
+        ST_Distance(r.location, user_location) AS distance_meters
+    FROM relaxed r
+    ORDER BY r.cosine_distance ASC;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS find_harmony_matches_compact(TEXT, GEOGRAPHY, INT, TEXT, TEXT, INT, INT);
+
+CREATE OR REPLACE FUNCTION find_harmony_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    index_mode TEXT DEFAULT 'vector',
+    rerank_factor INT DEFAULT 8,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+DECLARE
+    q VECTOR := decode_embedding(query_embedding, embedding_encoding);
+BEGIN
+    IF index_mode NOT IN ('halfvec', 'binary') THEN
+        RETURN QUERY SELECT * FROM find_harmony_matches(
+            q, user_location, match_limit, ef_search,
+            exclude_user_id, max_distance_meters, max_scan_tuples
+        );
+        RETURN;
+    END IF;
+
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    IF index_mode = 'halfvec' THEN
+        RETURN QUERY
+        WITH candidates AS MATERIALIZED (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+                AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+                AND (max_distance_meters IS NULL
+                     OR ST_DWithin(p.location, user_location, max_distance_meters))
+            ORDER BY p.embedding::halfvec(1024) <=> q::halfvec(1024)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    ELSE
+        RETURN QUERY
+        WITH candidates AS MATERIALIZED (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+                AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+                AND (max_distance_meters IS NULL
+                     OR ST_DWithin(p.location, user_location, max_distance_meters))
+            ORDER BY binary_quantize(p.embedding)::bit(1024) <~> binary_quantize(q)
+            LIMIT match_limit * rerank_factor
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> q) AS similarity,
+               ST_Distance(c.location, user_location) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> q
+        LIMIT match_limit;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Contrast mode orders by a computed score, so it never uses the HNSW index
+-- and its filters are already exact; it only gains the same filter params.
+DROP FUNCTION IF EXISTS find_contrast_matches_compact(TEXT, GEOGRAPHY, FLOAT, INT, TEXT);
+DROP FUNCTION IF EXISTS find_contrast_matches(VECTOR, GEOGRAPHY, FLOAT, INT);
+
+CREATE OR REPLACE FUNCTION find_contrast_matches(
+    query_embedding VECTOR(1024),
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        (p.embedding <=> query_embedding) +
+            (LEAST(ST_Distance(p.location, user_location), 10000000) / 20000000.0) AS diversity,
+        ST_Distance(p.location, user_location) AS distance_meters
+    FROM profiles p
+    WHERE p.embedding IS NOT NULL
+        AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+        AND ST_Distance(p.location, user_location) > min_distance_meters
+        AND (max_distance_meters IS NULL
+             OR ST_DWithin(p.location, user_location, max_distance_meters))
+    ORDER BY diversity DESC
+    LIMIT match_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_contrast_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT
+) AS $$
+    SELECT * FROM find_contrast_matches(
+        decode_embedding(query_embedding, embedding_encoding),
+        user_location,
+        min_distance_meters,
+        match_limit,
+        exclude_user_id,
+        max_distance_meters
+    );
+$$ LANGUAGE sql;
@@ -0,0 +1,80 @@
+-- ============================================================================
+-- Map tiles (GET /map/tiles/{z}/{x}/{y})
+--
+-- Both functions read only id, location and marker_color and select rows
+-- through a GIST index on location::geometry, so rendering the mosaic never
+-- touches embeddings or profile text. The tile box is compared in geometry
+-- (planar lon/lat): cast to geography its edges become great-circle arcs,
+-- and the z0/z1 boxes spanning 180-360 degrees of longitude collapse.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_profiles_location_geom
+    ON profiles USING GIST ((location::geometry));
+
+-- Individual markers inside a lon/lat box, at most max_markers rows.
+CREATE OR REPLACE FUNCTION map_markers_in_bbox(
+    min_lon FLOAT,
+    min_lat FLOAT,
+    max_lon FLOAT,
+    max_lat FLOAT,
+    max_markers INT DEFAULT 5000
+)
+RETURNS TABLE (
+    id UUID,
+    lat FLOAT,
+    lon FLOAT,
+    marker_color VARCHAR(7)
+) AS $$
+    SELECT p.id,
+           ST_Y(p.location::geometry) AS lat,
+           ST_X(p.location::geometry) AS lon,
+           p.marker_color
+    FROM profiles p
+    WHERE p.location::geometry && ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+        AND ST_X(p.location::geometry) BETWEEN min_lon AND max_lon
+        AND ST_Y(p.location::geometry) BETWEEN min_lat AND max_lat
+    LIMIT max_markers;
+$$ LANGUAGE sql STABLE;
+
+-- Markers inside a lon/lat box aggregated on a Web Mercator grid of
+-- world_cells x world_cells cells (tiles per side at the zoom level times
+-- cells per tile), so cluster cells line up with tile edges.
+CREATE OR REPLACE FUNCTION map_clusters_in_bbox(
+    min_lon FLOAT,
+    min_lat FLOAT,
+    max_lon FLOAT,
+    max_lat FLOAT,
+    world_cells INT
+)
+RETURNS TABLE (
+    id UUID,
+    lat FLOAT,
+    lon FLOAT,
+    marker_color VARCHAR(7),
+    point_count INT
+) AS $$
+    WITH points AS (
+        SELECT p.id,
+               p.marker_color,
+               ST_X(p.location::geometry) AS lon,
+               -- Web Mercator latitude limit
+               LEAST(GREATEST(ST_Y(p.location::geometry), -85.0511), 85.0511) AS lat
+        FROM profiles p
+        WHERE p.location::geometry && ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
+    ),
+    cells AS (
+        SELECT points.*,
+               floor((lon + 180) / 360 * world_cells) AS cx,
+               floor((1 - ln(tan(radians(lat)) + 1 / cos(radians(lat))) / pi()) / 2
+                     * world_cells) AS cy
+        FROM points
+        WHERE lon BETWEEN min_lon AND max_lon AND lat BETWEEN min_lat AND max_lat
+    )
+    SELECT CASE WHEN count(*) = 1 THEN (array_agg(c.id))[1] END AS id,
+           avg(c.lat) AS lat,
+           avg(c.lon) AS lon,
+           mode() WITHIN GROUP (ORDER BY c.marker_color) AS marker_color,
+           count(*)::INT AS point_count
+    FROM cells c
+    GROUP BY c.cx, c.cy;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,185 @@
+-- ============================================================================
+-- Analytics rollups (GET /analytics/*)
+--
+-- The API reads only these relations; nothing here is computed per request.
+-- refresh_analytics() brings them up to date and is run on a schedule
+-- (pg_cron below when available, or the job worker with
+-- ANALYTICS_REFRESH_ENABLED=true):
+--   * messages are rolled up incrementally: each run aggregates only the
+--     messages created since the previous run's watermark (a few seconds
+--     behind now() so in-flight inserts are not skipped). Deleted messages
+--     stay counted.
+--   * profile snapshots (clusters, regions, interests) are materialized views
+--     refreshed CONCURRENTLY, so readers never block.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at);
+
+CREATE TABLE IF NOT EXISTS analytics_state (
+    name TEXT PRIMARY KEY,
+    watermark TIMESTAMPTZ NOT NULL DEFAULT '-infinity',
+    refreshed_at TIMESTAMPTZ
+);
+
+INSERT INTO analytics_state (name) VALUES ('messages'), ('profiles')
+ON CONFLICT (name) DO NOTHING;
+
+-- One row per conversation (unordered user pair) per UTC day with messages.
+CREATE TABLE IF NOT EXISTS analytics_conversation_days (
+    day DATE NOT NULL,
+    user_a UUID NOT NULL,
+    user_b UUID NOT NULL,
+    messages BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_a, user_b)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_message_daily (
+    day DATE PRIMARY KEY,
+    messages BIGINT NOT NULL DEFAULT 0,
+    active_conversations BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS analytics_totals (
+    metric TEXT PRIMARY KEY,
+    value BIGINT NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- ----------------------------------------------------------------------------
+-- Profile snapshots
+-- ----------------------------------------------------------------------------
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_clusters AS
+    SELECT COALESCE(marker_color, '') AS marker_color, count(*)::BIGINT AS users
+    FROM profiles
+    GROUP BY 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_clusters
+    ON analytics_clusters (marker_color);
+
+-- Coarse regions from lon/lat boxes; checked in order, first match wins.
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_regions AS
+    WITH points AS (
+        SELECT ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon
+        FROM profiles
+        WHERE location IS NOT NULL
+    )
+    SELECT
+        CASE
+            WHEN lat BETWEEN 12 AND 42 AND lon BETWEEN 35 AND 63 THEN 'Middle East'
+            WHEN lat >= 35 AND lon BETWEEN -25 AND 60 THEN 'Europe'
+            WHEN lat < 35 AND lon BETWEEN -20 AND 52 THEN 'Africa'
+            WHEN lat >= 15 AND lon BETWEEN -170 AND -50 THEN 'North America'
+            WHEN lat < 15 AND lon BETWEEN -120 AND -30 THEN 'Latin America'
+            WHEN lat BETWEEN 5 AND 37 AND lon BETWEEN 60 AND 92 THEN 'South Asia'
+            WHEN lat >= 20 AND lon BETWEEN 92 AND 150 THEN 'East Asia'
+            WHEN lat BETWEEN -11 AND 20 AND lon BETWEEN 92 AND 150 THEN 'Southeast Asia'
+            WHEN lat < -11 AND lon >= 110 THEN 'Oceania'
+            ELSE 'Other'
+        END AS region,
+        count(*)::BIGINT AS users
+    FROM points
+    GROUP BY 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_regions ON analytics_regions (region);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_top_interests AS
+    SELECT lower(trim(i.interest)) AS interest, count(DISTINCT p.id)::BIGINT AS users
+    FROM profiles p,
+         jsonb_array_elements_text(
+             CASE WHEN jsonb_typeof(p.metadata -> 'all_interests') = 'array'
+                  THEN p.metadata -> 'all_interests' ELSE '[]'::JSONB END
+         ) AS i(interest)
+    WHERE trim(i.interest) <> ''
+    GROUP BY 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_top_interests
+    ON analytics_top_interests (interest);
+CREATE INDEX IF NOT EXISTS idx_analytics_top_interests_users
+    ON analytics_top_interests (users DESC);
+
+-- ----------------------------------------------------------------------------
+-- Refresh
+-- ----------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION refresh_analytics(lag_seconds INT DEFAULT 5)
+RETURNS JSONB AS $$
+DECLARE
+    lower_bound TIMESTAMPTZ;
+    upper_bound TIMESTAMPTZ := NOW() - make_interval(secs => lag_seconds);
+    new_messages BIGINT;
+BEGIN
+    -- One refresh at a time; overlapping schedules just skip.
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_analytics')) THEN
+        RETURN jsonb_build_object('skipped', true);
+    END IF;
+
+    SELECT watermark INTO lower_bound FROM analytics_state WHERE name = 'messages';
+
+    WITH fresh AS (
+        SELECT (created_at AT TIME ZONE 'UTC')::DATE AS day,
+               LEAST(sender_id, receiver_id) AS user_a,
+               GREATEST(sender_id, receiver_id) AS user_b,
+               count(*) AS messages
+        FROM messages
+        WHERE created_at > lower_bound AND created_at <= upper_bound
+        GROUP BY 1, 2, 3
+    ),
+    upserted AS (
+        INSERT INTO analytics_conversation_days AS d (day, user_a, user_b, messages)
+        SELECT day, user_a, user_b, messages FROM fresh
+        ON CONFLICT (day, user_a, user_b)
+            DO UPDATE SET messages = d.messages + EXCLUDED.messages
+    )
+    SELECT COALESCE(sum(messages), 0) INTO new_messages FROM fresh;
+
+    -- Re-derive only the days that can have changed.
+    INSERT INTO analytics_message_daily AS m (day, messages, active_conversations)
+    SELECT day, sum(messages), count(*)
+    FROM analytics_conversation_days
+    WHERE day >= (lower_bound AT TIME ZONE 'UTC')::DATE
+    GROUP BY day
+    ON CONFLICT (day) DO UPDATE
+        SET messages = EXCLUDED.messages,
+            active_conversations = EXCLUDED.active_conversations;
+
+    UPDATE analytics_state
+    SET watermark = upper_bound, refreshed_at = NOW()
+    WHERE name = 'messages';
+
+    REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_clusters;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_regions;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_top_interests;
+    UPDATE analytics_state SET refreshed_at = NOW() WHERE name = 'profiles';
+
+    INSERT INTO analytics_totals AS t (metric, value, refreshed_at)
+    VALUES
+        ('users', (SELECT COALESCE(sum(users), 0) FROM analytics_clusters), NOW()),
+        ('messages', (SELECT COALESCE(sum(messages), 0) FROM analytics_message_daily), NOW()),
+        ('active_conversations_7d',
+         (SELECT count(DISTINCT (user_a, user_b)) FROM analytics_conversation_days
+          WHERE day > (NOW() AT TIME ZONE 'UTC')::DATE - 7), NOW()),
+        ('active_conversations_30d',
+         (SELECT count(DISTINCT (user_a, user_b)) FROM analytics_conversation_days
+          WHERE day > (NOW() AT TIME ZONE 'UTC')::DATE - 30), NOW())
+    ON CONFLICT (metric) DO UPDATE
+        SET value = EXCLUDED.value, refreshed_at = EXCLUDED.refreshed_at;
+
+    RETURN jsonb_build_object(
+        'skipped', false,
+        'new_messages', new_messages,
+        'watermark', upper_bound
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial fill, then every 5 minutes with pg_cron when it is installed.
+SELECT refresh_analytics();
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('refresh-analytics', '*/5 * * * *', 'SELECT refresh_analytics()');
+    END IF;
+END;
+$$;
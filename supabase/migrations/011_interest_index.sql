@@ -0,0 +1,212 @@
+-- ============================================================================
+-- Normalized interest dictionary and user <-> interest inverted index
+--
+-- metadata->'all_interests' stays the profile's display list; these tables
+-- make exact shared-interest questions index lookups:
+--   * interest_dictionary interns each normalized interest (lower case,
+--     trimmed, whitespace collapsed) to a small integer id, keeping the first
+--     spelling seen as its label.
+--   * user_interests holds one row per (user, interest). Its primary key
+--     answers "what does this user like", idx_user_interests_interest answers
+--     "who likes this".
+-- The profile pipeline calls sync_user_interests() after every save.
+-- ============================================================================
+
+-- Platform sources were never allowed here.
+ALTER TABLE interests DROP CONSTRAINT IF EXISTS interests_source_check;
+ALTER TABLE interests ADD CONSTRAINT interests_source_check CHECK (
+    source IN (
+        'spotify', 'steam', 'youtube', 'discord', 'github',
+        'manual', 'manual_beli', 'manual_hevy'
+    )
+);
+
+CREATE OR REPLACE FUNCTION normalize_interest(raw TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(btrim(regexp_replace(COALESCE(raw, ''), '\s+', ' ', 'g')));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE TABLE IF NOT EXISTS interest_dictionary (
+    id INT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE CHECK (name <> '' AND name = normalize_interest(name)),
+    label TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user_interests (
+    user_id UUID NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    interest_id INT NOT NULL REFERENCES interest_dictionary(id),
+    source TEXT CHECK (source IN ('manual', 'youtube', 'steam', 'discord', 'github')),
+    PRIMARY KEY (user_id, interest_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_interests_interest
+    ON user_interests (interest_id, user_id);
+
+-- ----------------------------------------------------------------------------
+-- Maintenance
+-- ----------------------------------------------------------------------------
+
+-- The normalized entries of a merged interest list (JSON array of strings).
+-- ``platform`` maps youtube/steam/discord/github to the interests fetched
+-- from each (metadata->'pipeline'->'platform'); an interest is attributed to
+-- the first platform listing it, else to 'manual'. The first spelling wins.
+CREATE OR REPLACE FUNCTION interest_entries(interests JSONB, platform JSONB)
+RETURNS TABLE (
+    name TEXT,
+    label TEXT,
+    source TEXT
+) AS $$
+    WITH platform_interests AS (
+        SELECT DISTINCT ON (normalize_interest(x.value))
+            normalize_interest(x.value) AS name, p.source
+        FROM unnest(ARRAY['youtube', 'steam', 'discord', 'github'])
+             WITH ORDINALITY AS p(source, rank),
+             jsonb_array_elements_text(
+                 CASE WHEN jsonb_typeof(platform -> p.source) = 'array'
+                      THEN platform -> p.source ELSE '[]'::JSONB END
+             ) AS x(value)
+        ORDER BY normalize_interest(x.value), p.rank
+    )
+    SELECT DISTINCT ON (normalize_interest(i.value))
+        normalize_interest(i.value),
+        btrim(i.value),
+        COALESCE(pi.source, 'manual')
+    FROM jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(interests) = 'array' THEN interests ELSE '[]'::JSONB END
+    ) WITH ORDINALITY AS i(value, position)
+    LEFT JOIN platform_interests pi ON pi.name = normalize_interest(i.value)
+    WHERE normalize_interest(i.value) <> ''
+    ORDER BY normalize_interest(i.value), i.position;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Replace a user's interests with ``interests`` (see interest_entries);
+-- returns how many the user now has.
+CREATE OR REPLACE FUNCTION sync_user_interests(
+    p_user_id UUID,
+    interests JSONB,
+    platform JSONB DEFAULT '{}'::JSONB
+)
+RETURNS INT AS $$
+DECLARE
+    synced INT;
+BEGIN
+    INSERT INTO interest_dictionary (name, label)
+    SELECT e.name, e.label FROM interest_entries(interests, platform) e
+    ON CONFLICT (name) DO NOTHING;
+
+    DELETE FROM user_interests ui
+    WHERE ui.user_id = p_user_id
+      AND ui.interest_id NOT IN (
+          SELECT d.id
+          FROM interest_entries(interests, platform) e
+          JOIN interest_dictionary d ON d.name = e.name
+      );
+
+    INSERT INTO user_interests AS ui (user_id, interest_id, source)
+    SELECT p_user_id, d.id, e.source
+    FROM interest_entries(interests, platform) e
+    JOIN interest_dictionary d ON d.name = e.name
+    ON CONFLICT (user_id, interest_id) DO UPDATE
+        SET source = EXCLUDED.source
+        WHERE ui.source IS DISTINCT FROM EXCLUDED.source;
+
+    SELECT count(*) INTO synced FROM user_interests WHERE user_id = p_user_id;
+    RETURN synced;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ----------------------------------------------------------------------------
+-- Lookups
+-- ----------------------------------------------------------------------------
+
+-- Users who have an interest (exact match after normalization).
+CREATE OR REPLACE FUNCTION users_sharing_interest(
+    target_interest TEXT,
+    max_results INT DEFAULT 50,
+    exclude_user_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    username TEXT,
+    marker_color TEXT,
+    source TEXT,
+    total_users BIGINT
+) AS $$
+    WITH target AS (
+        SELECT d.id FROM interest_dictionary d WHERE d.name = normalize_interest(target_interest)
+    ),
+    holders AS MATERIALIZED (
+        SELECT ui.user_id, ui.source
+        FROM user_interests ui
+        JOIN target t ON ui.interest_id = t.id
+        WHERE exclude_user_id IS NULL OR ui.user_id <> exclude_user_id
+    )
+    SELECT p.id, p.username, p.marker_color, h.source, count(*) OVER ()
+    FROM holders h
+    JOIN profiles p ON p.id = h.user_id
+    ORDER BY p.id
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
+
+-- Interests most often held by the users who have ``target_interest``.
+CREATE OR REPLACE FUNCTION co_occurring_interests(
+    target_interest TEXT,
+    max_results INT DEFAULT 20
+)
+RETURNS TABLE (
+    interest TEXT,
+    shared_users BIGINT
+) AS $$
+    WITH target AS (
+        SELECT d.id FROM interest_dictionary d WHERE d.name = normalize_interest(target_interest)
+    ),
+    holders AS MATERIALIZED (
+        SELECT ui.user_id
+        FROM user_interests ui
+        JOIN target t ON ui.interest_id = t.id
+    )
+    SELECT d.label, count(*) AS shared_users
+    FROM holders h
+    JOIN user_interests ui ON ui.user_id = h.user_id
+    JOIN interest_dictionary d ON d.id = ui.interest_id
+    WHERE ui.interest_id NOT IN (SELECT t.id FROM target t)
+    GROUP BY d.id, d.label
+    ORDER BY shared_users DESC, d.label
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
+
+-- Exact interest overlap between two users.
+CREATE OR REPLACE FUNCTION interest_overlap(user_a UUID, user_b UUID)
+RETURNS TABLE (
+    shared INT,
+    a_total INT,
+    b_total INT,
+    interests TEXT[]
+) AS $$
+    SELECT
+        (SELECT count(*)::INT
+         FROM user_interests a JOIN user_interests b USING (interest_id)
+         WHERE a.user_id = user_a AND b.user_id = user_b),
+        (SELECT count(*)::INT FROM user_interests WHERE user_id = user_a),
+        (SELECT count(*)::INT FROM user_interests WHERE user_id = user_b),
+        COALESCE(
+            (SELECT array_agg(d.label ORDER BY d.label)
+             FROM user_interests a
+             JOIN user_interests b USING (interest_id)
+             JOIN interest_dictionary d ON d.id = a.interest_id
+             WHERE a.user_id = user_a AND b.user_id = user_b),
+            '{}'
+        );
+$$ LANGUAGE sql STABLE;
+
+-- ----------------------------------------------------------------------------
+-- Backfill from the profiles written so far
+-- ----------------------------------------------------------------------------
+
+SELECT sync_user_interests(
+    id,
+    metadata -> 'all_interests',
+    COALESCE(metadata -> 'pipeline' -> 'platform', '{}'::JSONB)
+)
+FROM profiles
+WHERE jsonb_typeof(metadata -> 'all_interests') = 'array';
@@ -0,0 +1,20 @@
+-- ============================================================================
+-- Batched marker color updates for the offline recolor job
+-- (python -m app.core.clusters). ``rows`` is a JSON array of
+-- {"id", "marker_color"}; only rows whose color actually changes are touched.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION set_marker_colors(rows JSONB)
+RETURNS INT AS $$
+DECLARE
+    updated INT;
+BEGIN
+    UPDATE profiles p
+    SET marker_color = r.marker_color
+    FROM jsonb_to_recordset(rows) AS r(id UUID, marker_color TEXT)
+    WHERE p.id = r.id
+      AND p.marker_color IS DISTINCT FROM r.marker_color;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,32 @@
+-- ============================================================================
+-- Marker color centroids learned from profile embeddings
+-- (python -m app.core.cluster_centroids). New profiles take the color of the
+-- nearest centroid for the embedding model they were embedded with.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS cluster_centroids (
+    idx INT PRIMARY KEY,
+    cluster TEXT NOT NULL,
+    marker_color TEXT NOT NULL,
+    centroid REAL[] NOT NULL,
+    members BIGINT NOT NULL DEFAULT 0,
+    embed_model TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Replace the whole set in one transaction so readers never see a mix.
+CREATE OR REPLACE FUNCTION replace_cluster_centroids(rows JSONB)
+RETURNS INT AS $$
+DECLARE
+    inserted INT;
+BEGIN
+    DELETE FROM cluster_centroids;
+    INSERT INTO cluster_centroids (idx, cluster, marker_color, centroid, members, embed_model)
+    SELECT r.idx, r.cluster, r.marker_color, r.centroid, r.members, r.embed_model
+    FROM jsonb_to_recordset(rows) AS r(
+        idx INT, cluster TEXT, marker_color TEXT, centroid REAL[], members BIGINT, embed_model TEXT
+    );
+    GET DIAGNOSTICS inserted = ROW_COUNT;
+    RETURN inserted;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,289 @@
+-- ============================================================================
+-- Embedding model rollout without long locks (replaces the 005-007 swap)
+--
+-- 1. python -m app.core.reembed --model M
+--      types embedding_next for M's dimension (prepare_profile_embeddings_next,
+--      a catalog-only column re-add) and fills it while matching keeps using
+--      embedding.
+-- 2. psql "$DATABASE_URL" -v target=next -v dims=N \
+--         -f supabase/scripts/build_embedding_indexes.sql
+--      builds the HNSW indexes of embedding_next with CREATE INDEX
+--      CONCURRENTLY. That cannot run inside a function, so it is a psql
+--      script; profile writes continue during the build.
+-- 3. python -m app.core.reembed --model M --swap
+--      catches up and calls swap_profile_embeddings(M). Writes are blocked
+--      only while the pending rows are counted; the swap itself drops the
+--      old indexes and renames columns and indexes under a short ACCESS
+--      EXCLUSIVE lock, and records M as the active model.
+--
+-- The API embeds with embedding_config.active_model (cached for
+-- EMBED_MODEL_CACHE_SECONDS, falling back to EMBED_MODEL while no swap has
+-- happened), so it switches models with the swap rather than at the next
+-- deploy. A write made with another model (X-Embed-Model request header)
+-- inside that cache window keeps the row's previous vector; the pipeline
+-- re-embeds it on its next run because its fingerprint names the old model.
+--
+-- The match RPCs are redefined without a fixed dimension; the compact one
+-- builds its halfvec/bit casts from the query's dimension so they keep
+-- matching the expression indexes after a dimension change.
+-- ============================================================================
+
+-- Index (re)builds moved to supabase/scripts/build_embedding_indexes.sql:
+-- as an RPC they ran in one transaction, dropped the live indexes first and
+-- blocked profile writes for the whole build.
+DROP FUNCTION IF EXISTS rebuild_embedding_indexes(INT, INT, INT);
+
+CREATE TABLE IF NOT EXISTS embedding_config (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    active_model TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION guard_profile_embedding_model()
+RETURNS TRIGGER AS $$
+DECLARE
+    writer_model TEXT :=
+        NULLIF(current_setting('request.headers', true), '')::JSON->>'x-embed-model';
+    active TEXT;
+BEGIN
+    IF writer_model IS NULL THEN
+        RETURN NEW;
+    END IF;
+    SELECT c.active_model INTO active FROM embedding_config c;
+    IF active IS NOT NULL AND writer_model <> active THEN
+        NEW.embedding := CASE WHEN TG_OP = 'UPDATE' THEN OLD.embedding END;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS profiles_embedding_model_guard ON profiles;
+CREATE TRIGGER profiles_embedding_model_guard
+    BEFORE INSERT OR UPDATE OF embedding ON profiles
+    FOR EACH ROW EXECUTE FUNCTION guard_profile_embedding_model();
+
+-- Give embedding_next the new model's dimension (HNSW needs a typed column).
+-- No-op when it already has it, so an interrupted re-embed resumes; otherwise
+-- the column (and any index on it) is dropped and re-added empty.
+CREATE OR REPLACE FUNCTION prepare_profile_embeddings_next(dims INT)
+RETURNS BOOLEAN AS $$
+DECLARE
+    current_type TEXT;
+BEGIN
+    SELECT format_type(a.atttypid, a.atttypmod) INTO current_type
+    FROM pg_attribute a
+    WHERE a.attrelid = 'profiles'::REGCLASS
+        AND a.attname = 'embedding_next'
+        AND NOT a.attisdropped;
+    IF current_type = format('vector(%s)', dims) THEN
+        RETURN FALSE;
+    END IF;
+
+    PERFORM set_config('lock_timeout', '5s', true);
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_next;
+    EXECUTE format('ALTER TABLE profiles ADD COLUMN embedding_next VECTOR(%s)', dims);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS swap_profile_embeddings(INT, INT, INT);
+
+CREATE OR REPLACE FUNCTION swap_profile_embeddings(model TEXT)
+RETURNS BIGINT AS $$
+DECLARE
+    missing TEXT[];
+    pending BIGINT;
+    swapped BIGINT;
+BEGIN
+    SELECT array_agg(name) INTO missing
+    FROM unnest(ARRAY[
+        'idx_profiles_embedding_next',
+        'idx_profiles_embedding_next_half',
+        'idx_profiles_embedding_next_bit'
+    ]) AS name
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = name AND i.indisvalid
+    );
+    IF missing IS NOT NULL THEN
+        RAISE EXCEPTION 'indexes % missing; run build_embedding_indexes.sql with target=next',
+            missing;
+    END IF;
+
+    -- Give up instead of queueing every profile query behind this lock.
+    PERFORM set_config('lock_timeout', '5s', true);
+
+    -- Block writes (not reads) so nothing lands between the check and the swap.
+    LOCK TABLE profiles IN SHARE ROW EXCLUSIVE MODE;
+    SELECT count(*) FILTER (
+               WHERE p.dna_string IS NOT NULL
+                   AND btrim(p.dna_string) <> ''
+                   AND (p.embedding_next IS NULL OR p.updated_at > p.embedding_next_at)
+           ),
+           count(*) FILTER (WHERE p.embedding_next IS NOT NULL)
+    INTO pending, swapped
+    FROM profiles p;
+    IF pending > 0 THEN
+        RAISE EXCEPTION '% profiles still pending re-embedding', pending;
+    END IF;
+
+    -- Catalog-only from here on.
+    LOCK TABLE profiles IN ACCESS EXCLUSIVE MODE;
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    DROP INDEX IF EXISTS idx_profiles_embedding_half;
+    DROP INDEX IF EXISTS idx_profiles_embedding_bit;
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding TO embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding_next TO embedding;
+    ALTER TABLE profiles ADD COLUMN embedding_next VECTOR;
+    ALTER INDEX idx_profiles_embedding_next RENAME TO idx_profiles_embedding;
+    ALTER INDEX idx_profiles_embedding_next_half RENAME TO idx_profiles_embedding_half;
+    ALTER INDEX idx_profiles_embedding_next_bit RENAME TO idx_profiles_embedding_bit;
+
+    INSERT INTO embedding_config (id, active_model)
+    VALUES (TRUE, model)
+    ON CONFLICT (id) DO UPDATE SET active_model = EXCLUDED.active_model, updated_at = NOW();
+
+    RETURN swapped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------------------------------------------------------------------------
+-- Match RPCs without a fixed dimension (bodies as in 008)
+-- ---------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION find_harmony_matches(
+    query_embedding VECTOR,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    RETURN QUERY
+    WITH relaxed AS MATERIALIZED (
+        SELECT p.id, p.embedding <=> query_embedding AS cosine_distance, p.location
+        FROM profiles p
+        WHERE p.embedding IS NOT NULL
+            AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+            AND (max_distance_meters IS NULL
+                 OR ST_DWithin(p.location, user_location, max_distance_meters))
+        ORDER BY p.embedding <=> query_embedding ASC
+        LIMIT match_limit
+    )
+    SELECT
+        r.id,
+        1 - r.cosine_distance AS similarity,
+        ST_Distance(r.location, user_location) AS distance_meters
+    FROM relaxed r
+    ORDER BY r.cosine_distance ASC;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_harmony_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    index_mode TEXT DEFAULT 'vector',
+    rerank_factor INT DEFAULT 8,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT
+) AS $$
+DECLARE
+    q VECTOR := decode_embedding(query_embedding, embedding_encoding);
+    -- Must match the expression indexes, e.g. (embedding::halfvec(1024)).
+    candidate_order TEXT := CASE index_mode
+        WHEN 'halfvec' THEN format('p.embedding::halfvec(%1$s) <=> $1::halfvec(%1$s)', vector_dims(q))
+        ELSE format('binary_quantize(p.embedding)::bit(%1$s) <~> binary_quantize($1)', vector_dims(q))
+    END;
+BEGIN
+    IF index_mode NOT IN ('halfvec', 'binary') THEN
+        RETURN QUERY SELECT * FROM find_harmony_matches(
+            q, user_location, match_limit, ef_search,
+            exclude_user_id, max_distance_meters, max_scan_tuples
+        );
+        RETURN;
+    END IF;
+
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    RETURN QUERY EXECUTE format(
+        'WITH candidates AS MATERIALIZED (
+            SELECT p.id, p.embedding, p.location
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+                AND ($3::UUID IS NULL OR p.id <> $3)
+                AND ($4::FLOAT IS NULL OR ST_DWithin(p.location, $2, $4))
+            ORDER BY %s
+            LIMIT $5
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> $1) AS similarity,
+               ST_Distance(c.location, $2) AS distance_meters
+        FROM candidates c
+        ORDER BY c.embedding <=> $1
+        LIMIT $6',
+        candidate_order
+    )
+    USING q, user_location, exclude_user_id, max_distance_meters,
+        match_limit * rerank_factor, match_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_contrast_matches(
+    query_embedding VECTOR,
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        (p.embedding <=> query_embedding) +
+            (LEAST(ST_Distance(p.location, user_location), 10000000) / 20000000.0) AS diversity,
+        ST_Distance(p.location, user_location) AS distance_meters
+    FROM profiles p
+    WHERE p.embedding IS NOT NULL
+        AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+        AND ST_Distance(p.location, user_location) > min_distance_meters
+        AND (max_distance_meters IS NULL
+             OR ST_DWithin(p.location, user_location, max_distance_meters))
+    ORDER BY diversity DESC
+    LIMIT match_limit;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,288 @@
+-- ============================================================================
+-- Incremental analytics rollups
+--
+-- 010 rescanned every profile on each refresh (three materialized views) and
+-- rolled messages up by a created_at watermark, which skipped for good any
+-- message whose insert committed after the watermark had passed it.
+--
+-- Now triggers log changes into append-only queues, and refresh_analytics()
+-- drains them with DELETE ... RETURNING, so it only ever touches what
+-- changed, and a row is consumed exactly once, when it is visible, however
+-- late its transaction commits:
+--   * analytics_count_deltas: +1/-1 per (rollup, key) from profile writes
+--     that change marker_color or region, and from user_interests rows
+--     (the 011 index) added or removed. Folded into analytics_counts.
+--   * analytics_message_queue: per-statement message counts per
+--     conversation day. Folded into analytics_conversation_days.
+-- The writers never update a shared row, so hot counters (a popular
+-- interest, the default color) are not a lock point on profile saves.
+-- analytics_clusters, analytics_regions and analytics_top_interests keep
+-- their names and columns as views over analytics_counts.
+-- ============================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS analytics_clusters;
+DROP MATERIALIZED VIEW IF EXISTS analytics_regions;
+DROP MATERIALIZED VIEW IF EXISTS analytics_top_interests;
+
+CREATE TABLE IF NOT EXISTS analytics_counts (
+    rollup TEXT NOT NULL CHECK (rollup IN ('cluster', 'region', 'interest')),
+    key TEXT NOT NULL,
+    users BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (rollup, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_counts_users
+    ON analytics_counts (rollup, users DESC);
+
+CREATE TABLE IF NOT EXISTS analytics_count_deltas (
+    rollup TEXT NOT NULL,
+    key TEXT NOT NULL,
+    delta BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS analytics_message_queue (
+    day DATE NOT NULL,
+    user_a UUID NOT NULL,
+    user_b UUID NOT NULL,
+    messages BIGINT NOT NULL
+);
+
+-- Coarse regions from lon/lat boxes; checked in order, first match wins.
+CREATE OR REPLACE FUNCTION analytics_region(location GEOGRAPHY)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN location IS NULL THEN NULL
+        WHEN lat BETWEEN 12 AND 42 AND lon BETWEEN 35 AND 63 THEN 'Middle East'
+        WHEN lat >= 35 AND lon BETWEEN -25 AND 60 THEN 'Europe'
+        WHEN lat < 35 AND lon BETWEEN -20 AND 52 THEN 'Africa'
+        WHEN lat >= 15 AND lon BETWEEN -170 AND -50 THEN 'North America'
+        WHEN lat < 15 AND lon BETWEEN -120 AND -30 THEN 'Latin America'
+        WHEN lat BETWEEN 5 AND 37 AND lon BETWEEN 60 AND 92 THEN 'South Asia'
+        WHEN lat >= 20 AND lon BETWEEN 92 AND 150 THEN 'East Asia'
+        WHEN lat BETWEEN -11 AND 20 AND lon BETWEEN 92 AND 150 THEN 'Southeast Asia'
+        WHEN lat < -11 AND lon >= 110 THEN 'Oceania'
+        ELSE 'Other'
+    END
+    FROM (SELECT ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon) AS point;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE VIEW analytics_clusters AS
+    SELECT key AS marker_color, users
+    FROM analytics_counts
+    WHERE rollup = 'cluster' AND users > 0;
+
+CREATE OR REPLACE VIEW analytics_regions AS
+    SELECT key AS region, users
+    FROM analytics_counts
+    WHERE rollup = 'region' AND users > 0;
+
+CREATE OR REPLACE VIEW analytics_top_interests AS
+    SELECT key AS interest, users
+    FROM analytics_counts
+    WHERE rollup = 'interest' AND users > 0;
+
+-- ----------------------------------------------------------------------------
+-- Change capture
+-- ----------------------------------------------------------------------------
+
+CREATE OR REPLACE FUNCTION log_profile_analytics()
+RETURNS TRIGGER AS $$
+DECLARE
+    cluster_old TEXT;
+    cluster_new TEXT;
+    region_old TEXT;
+    region_new TEXT;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        cluster_old := COALESCE(OLD.marker_color, '');
+        region_old := analytics_region(OLD.location);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        cluster_new := COALESCE(NEW.marker_color, '');
+        region_new := analytics_region(NEW.location);
+    END IF;
+
+    INSERT INTO analytics_count_deltas (rollup, key, delta)
+    SELECT d.rollup, d.key, d.delta
+    FROM (VALUES
+        ('cluster', cluster_old, -1),
+        ('cluster', cluster_new, 1),
+        ('region', region_old, -1),
+        ('region', region_new, 1)
+    ) AS d(rollup, key, delta)
+    WHERE d.key IS NOT NULL
+      AND (
+          (d.rollup = 'cluster' AND cluster_old IS DISTINCT FROM cluster_new)
+          OR (d.rollup = 'region' AND region_old IS DISTINCT FROM region_new)
+      );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS profiles_analytics ON profiles;
+CREATE TRIGGER profiles_analytics
+    AFTER INSERT OR DELETE OR UPDATE OF marker_color, location ON profiles
+    FOR EACH ROW EXECUTE FUNCTION log_profile_analytics();
+
+-- user_interests has one row per (user, interest), so rows are user counts.
+-- Interests are keyed by their normalized name.
+CREATE OR REPLACE FUNCTION log_interest_analytics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO analytics_count_deltas (rollup, key, delta)
+        SELECT 'interest', d.name, count(*)
+        FROM new_rows r JOIN interest_dictionary d ON d.id = r.interest_id
+        GROUP BY d.name;
+    ELSE
+        INSERT INTO analytics_count_deltas (rollup, key, delta)
+        SELECT 'interest', d.name, -count(*)
+        FROM old_rows r JOIN interest_dictionary d ON d.id = r.interest_id
+        GROUP BY d.name;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_interests_analytics_insert ON user_interests;
+CREATE TRIGGER user_interests_analytics_insert
+    AFTER INSERT ON user_interests
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_interest_analytics();
+
+DROP TRIGGER IF EXISTS user_interests_analytics_delete ON user_interests;
+CREATE TRIGGER user_interests_analytics_delete
+    AFTER DELETE ON user_interests
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_interest_analytics();
+
+CREATE OR REPLACE FUNCTION log_message_analytics()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO analytics_message_queue (day, user_a, user_b, messages)
+    SELECT (created_at AT TIME ZONE 'UTC')::DATE,
+           LEAST(sender_id, receiver_id),
+           GREATEST(sender_id, receiver_id),
+           count(*)
+    FROM new_rows
+    GROUP BY 1, 2, 3;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS messages_analytics ON messages;
+CREATE TRIGGER messages_analytics
+    AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION log_message_analytics();
+
+-- ----------------------------------------------------------------------------
+-- Backfill. The triggers above already lock out concurrent writes to these
+-- tables until this migration commits, so nothing is counted twice or missed.
+-- ----------------------------------------------------------------------------
+
+TRUNCATE analytics_counts, analytics_count_deltas;
+
+INSERT INTO analytics_counts (rollup, key, users)
+SELECT 'cluster', COALESCE(marker_color, ''), count(*) FROM profiles GROUP BY 2
+UNION ALL
+SELECT 'region', analytics_region(location), count(*)
+FROM profiles WHERE location IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'interest', d.name, count(*)
+FROM user_interests ui JOIN interest_dictionary d ON d.id = ui.interest_id
+GROUP BY d.name;
+
+-- Messages the old watermark had not reached yet.
+INSERT INTO analytics_message_queue (day, user_a, user_b, messages)
+SELECT (m.created_at AT TIME ZONE 'UTC')::DATE,
+       LEAST(m.sender_id, m.receiver_id),
+       GREATEST(m.sender_id, m.receiver_id),
+       count(*)
+FROM messages m, analytics_state s
+WHERE s.name = 'messages' AND m.created_at > s.watermark
+GROUP BY 1, 2, 3;
+
+-- ----------------------------------------------------------------------------
+-- Refresh
+-- ----------------------------------------------------------------------------
+
+DROP FUNCTION IF EXISTS refresh_analytics(INT);
+
+CREATE OR REPLACE FUNCTION refresh_analytics()
+RETURNS JSONB AS $$
+DECLARE
+    new_messages BIGINT;
+    touched_days DATE[];
+    count_changes BIGINT;
+BEGIN
+    -- One refresh at a time; overlapping schedules just skip.
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_analytics')) THEN
+        RETURN jsonb_build_object('skipped', true);
+    END IF;
+
+    WITH consumed AS (
+        DELETE FROM analytics_message_queue RETURNING day, user_a, user_b, messages
+    ),
+    fresh AS (
+        SELECT day, user_a, user_b, sum(messages) AS messages
+        FROM consumed
+        GROUP BY 1, 2, 3
+    ),
+    upserted AS (
+        INSERT INTO analytics_conversation_days AS d (day, user_a, user_b, messages)
+        SELECT day, user_a, user_b, messages FROM fresh
+        ON CONFLICT (day, user_a, user_b)
+            DO UPDATE SET messages = d.messages + EXCLUDED.messages
+    )
+    SELECT COALESCE(sum(messages), 0), array_agg(DISTINCT day)
+    INTO new_messages, touched_days
+    FROM fresh;
+
+    -- Re-derive only the days that changed.
+    INSERT INTO analytics_message_daily AS m (day, messages, active_conversations)
+    SELECT day, sum(messages), count(*)
+    FROM analytics_conversation_days
+    WHERE day = ANY(COALESCE(touched_days, '{}'))
+    GROUP BY day
+    ON CONFLICT (day) DO UPDATE
+        SET messages = EXCLUDED.messages,
+            active_conversations = EXCLUDED.active_conversations;
+
+    UPDATE analytics_state SET refreshed_at = NOW() WHERE name = 'messages';
+
+    WITH consumed AS (
+        DELETE FROM analytics_count_deltas RETURNING rollup, key, delta
+    ),
+    upserted AS (
+        INSERT INTO analytics_counts AS c (rollup, key, users)
+        SELECT rollup, key, sum(delta) FROM consumed GROUP BY 1, 2
+        ON CONFLICT (rollup, key) DO UPDATE SET users = c.users + EXCLUDED.users
+        RETURNING 1
+    )
+    SELECT count(*) INTO count_changes FROM upserted;
+
+    UPDATE analytics_state SET refreshed_at = NOW() WHERE name = 'profiles';
+
+    INSERT INTO analytics_totals AS t (metric, value, refreshed_at)
+    VALUES
+        ('users', (SELECT COALESCE(sum(users), 0) FROM analytics_clusters), NOW()),
+        ('messages', (SELECT COALESCE(sum(messages), 0) FROM analytics_message_daily), NOW()),
+        ('active_conversations_7d',
+         (SELECT count(DISTINCT (user_a, user_b)) FROM analytics_conversation_days
+          WHERE day > (NOW() AT TIME ZONE 'UTC')::DATE - 7), NOW()),
+        ('active_conversations_30d',
+         (SELECT count(DISTINCT (user_a, user_b)) FROM analytics_conversation_days
+          WHERE day > (NOW() AT TIME ZONE 'UTC')::DATE - 30), NOW())
+    ON CONFLICT (metric) DO UPDATE
+        SET value = EXCLUDED.value, refreshed_at = EXCLUDED.refreshed_at;
+
+    RETURN jsonb_build_object(
+        'skipped', false,
+        'new_messages', new_messages,
+        'count_changes', count_changes
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_analytics();
@@ -0,0 +1,185 @@
+-- ============================================================================
+-- Match RPCs return ideology_score
+--
+-- POST /search re-ranks the over-fetched candidates on ideology, which used
+-- to cost a second round trip for the candidates' ideology scores. The
+-- score now comes back with each match. Adding an output column changes the
+-- return type, so the functions are dropped and recreated; the bodies are
+-- those of 014_embedding_rollout.sql (harmony) and 008_filtered_matches.sql
+-- (contrast).
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS find_harmony_matches_compact(
+    TEXT, GEOGRAPHY, INT, TEXT, TEXT, INT, INT, UUID, FLOAT, INT
+);
+DROP FUNCTION IF EXISTS find_harmony_matches(VECTOR, GEOGRAPHY, INT, INT, UUID, FLOAT, INT);
+DROP FUNCTION IF EXISTS find_contrast_matches_compact(
+    TEXT, GEOGRAPHY, FLOAT, INT, TEXT, UUID, FLOAT
+);
+DROP FUNCTION IF EXISTS find_contrast_matches(VECTOR, GEOGRAPHY, FLOAT, INT, UUID, FLOAT);
+
+CREATE OR REPLACE FUNCTION find_harmony_matches(
+    query_embedding VECTOR,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT,
+    ideology_score INT
+) AS $$
+BEGIN
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    RETURN QUERY
+    WITH relaxed AS MATERIALIZED (
+        SELECT p.id, p.embedding <=> query_embedding AS cosine_distance, p.location,
+               p.ideology_score
+        FROM profiles p
+        WHERE p.embedding IS NOT NULL
+            AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+            AND (max_distance_meters IS NULL
+                 OR ST_DWithin(p.location, user_location, max_distance_meters))
+        ORDER BY p.embedding <=> query_embedding ASC
+        LIMIT match_limit
+    )
+    SELECT
+        r.id,
+        1 - r.cosine_distance AS similarity,
+        ST_Distance(r.location, user_location) AS distance_meters,
+        r.ideology_score
+    FROM relaxed r
+    ORDER BY r.cosine_distance ASC;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_harmony_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    index_mode TEXT DEFAULT 'vector',
+    rerank_factor INT DEFAULT 8,
+    ef_search INT DEFAULT NULL,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL,
+    max_scan_tuples INT DEFAULT 20000
+)
+RETURNS TABLE (
+    user_id UUID,
+    similarity FLOAT,
+    distance_meters FLOAT,
+    ideology_score INT
+) AS $$
+DECLARE
+    q VECTOR := decode_embedding(query_embedding, embedding_encoding);
+    -- Must match the expression indexes, e.g. (embedding::halfvec(1024)).
+    candidate_order TEXT := CASE index_mode
+        WHEN 'halfvec' THEN format('p.embedding::halfvec(%1$s) <=> $1::halfvec(%1$s)', vector_dims(q))
+        ELSE format('binary_quantize(p.embedding)::bit(%1$s) <~> binary_quantize($1)', vector_dims(q))
+    END;
+BEGIN
+    IF index_mode NOT IN ('halfvec', 'binary') THEN
+        RETURN QUERY SELECT * FROM find_harmony_matches(
+            q, user_location, match_limit, ef_search,
+            exclude_user_id, max_distance_meters, max_scan_tuples
+        );
+        RETURN;
+    END IF;
+
+    IF ef_search IS NOT NULL THEN
+        PERFORM set_config('hnsw.ef_search', ef_search::TEXT, true);
+    END IF;
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    PERFORM set_config('hnsw.max_scan_tuples', max_scan_tuples::TEXT, true);
+
+    RETURN QUERY EXECUTE format(
+        'WITH candidates AS MATERIALIZED (
+            SELECT p.id, p.embedding, p.location, p.ideology_score
+            FROM profiles p
+            WHERE p.embedding IS NOT NULL
+                AND ($3::UUID IS NULL OR p.id <> $3)
+                AND ($4::FLOAT IS NULL OR ST_DWithin(p.location, $2, $4))
+            ORDER BY %s
+            LIMIT $5
+        )
+        SELECT c.id,
+               1 - (c.embedding <=> $1) AS similarity,
+               ST_Distance(c.location, $2) AS distance_meters,
+               c.ideology_score
+        FROM candidates c
+        ORDER BY c.embedding <=> $1
+        LIMIT $6',
+        candidate_order
+    )
+    USING q, user_location, exclude_user_id, max_distance_meters,
+        match_limit * rerank_factor, match_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_contrast_matches(
+    query_embedding VECTOR,
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT,
+    ideology_score INT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        p.id,
+        (p.embedding <=> query_embedding) +
+            (LEAST(ST_Distance(p.location, user_location), 10000000) / 20000000.0) AS diversity,
+        ST_Distance(p.location, user_location) AS distance_meters,
+        p.ideology_score
+    FROM profiles p
+    WHERE p.embedding IS NOT NULL
+        AND (exclude_user_id IS NULL OR p.id <> exclude_user_id)
+        AND ST_Distance(p.location, user_location) > min_distance_meters
+        AND (max_distance_meters IS NULL
+             OR ST_DWithin(p.location, user_location, max_distance_meters))
+    ORDER BY diversity DESC
+    LIMIT match_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION find_contrast_matches_compact(
+    query_embedding TEXT,
+    user_location GEOGRAPHY,
+    min_distance_meters FLOAT DEFAULT 0,
+    match_limit INT DEFAULT 10,
+    embedding_encoding TEXT DEFAULT 'f32',
+    exclude_user_id UUID DEFAULT NULL,
+    max_distance_meters FLOAT DEFAULT NULL
+)
+RETURNS TABLE (
+    user_id UUID,
+    diversity FLOAT,
+    distance_meters FLOAT,
+    ideology_score INT
+) AS $$
+    SELECT * FROM find_contrast_matches(
+        decode_embedding(query_embedding, embedding_encoding),
+        user_location,
+        min_distance_meters,
+        match_limit,
+        exclude_user_id,
+        max_distance_meters
+    );
+$$ LANGUAGE sql;
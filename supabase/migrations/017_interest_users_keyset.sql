@@ -0,0 +1,50 @@
+-- ============================================================================
+-- Keyset pages for users_sharing_interest
+--
+-- 011's version numbered every holder (count(*) OVER ()) and sorted the
+-- join with profiles before applying LIMIT, so a popular interest joined
+-- every holder on each call. Adding after_user_id changes the signature,
+-- hence the DROP.
+-- ============================================================================
+
+DROP FUNCTION IF EXISTS users_sharing_interest(TEXT, INT, UUID);
+
+-- Users who have an interest (exact match after normalization), a keyset
+-- page in user id order: pass the last id of a page as ``after_user_id`` for
+-- the next one. The page is read off idx_user_interests_interest and only
+-- its rows are joined to profiles; total_users counts the holders on that
+-- index alone (one uncorrelated subquery, evaluated once).
+CREATE OR REPLACE FUNCTION users_sharing_interest(
+    target_interest TEXT,
+    max_results INT DEFAULT 50,
+    exclude_user_id UUID DEFAULT NULL,
+    after_user_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    username TEXT,
+    marker_color TEXT,
+    source TEXT,
+    total_users BIGINT
+) AS $$
+    WITH target AS (
+        SELECT d.id FROM interest_dictionary d WHERE d.name = normalize_interest(target_interest)
+    ),
+    page AS (
+        SELECT ui.user_id, ui.source
+        FROM user_interests ui
+        JOIN target t ON ui.interest_id = t.id
+        WHERE (after_user_id IS NULL OR ui.user_id > after_user_id)
+          AND (exclude_user_id IS NULL OR ui.user_id <> exclude_user_id)
+        ORDER BY ui.user_id
+        LIMIT max_results
+    )
+    SELECT p.id, p.username, p.marker_color, pg.source,
+           (SELECT count(*)
+            FROM user_interests ui
+            JOIN target t ON ui.interest_id = t.id
+            WHERE exclude_user_id IS NULL OR ui.user_id <> exclude_user_id)
+    FROM page pg
+    JOIN profiles p ON p.id = pg.user_id
+    ORDER BY p.id;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,138 @@
+-- ============================================================================
+-- Re-embed pending rows by dna_string fingerprint
+--
+-- 005 counted a profile as pending when updated_at was newer than its shadow
+-- vector, so any profile edit during a migration (a new bio, a moved
+-- marker) re-embedded an unchanged dna_string. embedding_next_dna_md5 now
+-- records md5(dna_string) of the text each shadow vector was computed from
+-- (sent by app.core.reembed with the vector, so a dna_string that changes
+-- while its batch is in flight stays pending), and a row is pending only
+-- when it has no shadow vector or its dna_string no longer matches.
+-- ============================================================================
+
+ALTER TABLE profiles ADD COLUMN IF NOT EXISTS embedding_next_dna_md5 TEXT;
+
+-- Shadow vectors written before this migration that were current under the
+-- old rule keep counting as done.
+UPDATE profiles
+SET embedding_next_dna_md5 = md5(dna_string)
+WHERE embedding_next IS NOT NULL
+    AND embedding_next_dna_md5 IS NULL
+    AND dna_string IS NOT NULL
+    AND updated_at <= embedding_next_at;
+
+CREATE OR REPLACE FUNCTION profiles_pending_reembed(
+    after_id UUID DEFAULT NULL,
+    page_size INT DEFAULT 500
+)
+RETURNS TABLE (
+    id UUID,
+    dna_string TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT p.id, p.dna_string
+    FROM profiles p
+    WHERE p.dna_string IS NOT NULL
+        AND btrim(p.dna_string) <> ''
+        AND (p.embedding_next IS NULL
+             OR p.embedding_next_dna_md5 IS DISTINCT FROM md5(p.dna_string))
+        AND (after_id IS NULL OR p.id > after_id)
+    ORDER BY p.id
+    LIMIT page_size;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION count_profiles_pending_reembed()
+RETURNS BIGINT AS $$
+    SELECT count(*)
+    FROM profiles p
+    WHERE p.dna_string IS NOT NULL
+        AND btrim(p.dna_string) <> ''
+        AND (p.embedding_next IS NULL
+             OR p.embedding_next_dna_md5 IS DISTINCT FROM md5(p.dna_string));
+$$ LANGUAGE sql STABLE;
+
+-- rows = [{"id": "...", "embedding": [...], "dna_md5": "..."}, ...]
+CREATE OR REPLACE FUNCTION set_profile_embeddings_next(rows JSONB)
+RETURNS INT AS $$
+DECLARE
+    updated INT;
+BEGIN
+    UPDATE profiles p
+    SET embedding_next = (r->>'embedding')::VECTOR,
+        embedding_next_at = NOW(),
+        embedding_next_dna_md5 = r->>'dna_md5'
+    FROM jsonb_array_elements(rows) AS r
+    WHERE p.id = (r->>'id')::UUID;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- As in 014, with the pending rule above. The fingerprints describe the old
+-- shadow column, so they are dropped with it (catalog-only, no row rewrite).
+CREATE OR REPLACE FUNCTION swap_profile_embeddings(model TEXT)
+RETURNS BIGINT AS $$
+DECLARE
+    missing TEXT[];
+    pending BIGINT;
+    swapped BIGINT;
+BEGIN
+    SELECT array_agg(name) INTO missing
+    FROM unnest(ARRAY[
+        'idx_profiles_embedding_next',
+        'idx_profiles_embedding_next_half',
+        'idx_profiles_embedding_next_bit'
+    ]) AS name
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = name AND i.indisvalid
+    );
+    IF missing IS NOT NULL THEN
+        RAISE EXCEPTION 'indexes % missing; run build_embedding_indexes.sql with target=next',
+            missing;
+    END IF;
+
+    -- Give up instead of queueing every profile query behind this lock.
+    PERFORM set_config('lock_timeout', '5s', true);
+
+    -- Block writes (not reads) so nothing lands between the check and the swap.
+    LOCK TABLE profiles IN SHARE ROW EXCLUSIVE MODE;
+    SELECT count(*) FILTER (
+               WHERE p.dna_string IS NOT NULL
+                   AND btrim(p.dna_string) <> ''
+                   AND (p.embedding_next IS NULL
+                        OR p.embedding_next_dna_md5 IS DISTINCT FROM md5(p.dna_string))
+           ),
+           count(*) FILTER (WHERE p.embedding_next IS NOT NULL)
+    INTO pending, swapped
+    FROM profiles p;
+    IF pending > 0 THEN
+        RAISE EXCEPTION '% profiles still pending re-embedding', pending;
+    END IF;
+
+    -- Catalog-only from here on.
+    LOCK TABLE profiles IN ACCESS EXCLUSIVE MODE;
+    DROP INDEX IF EXISTS idx_profiles_embedding;
+    DROP INDEX IF EXISTS idx_profiles_embedding_half;
+    DROP INDEX IF EXISTS idx_profiles_embedding_bit;
+    ALTER TABLE profiles DROP COLUMN IF EXISTS embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding TO embedding_prev;
+    ALTER TABLE profiles RENAME COLUMN embedding_next TO embedding;
+    ALTER TABLE profiles ADD COLUMN embedding_next VECTOR;
+    ALTER TABLE profiles DROP COLUMN embedding_next_dna_md5;
+    ALTER TABLE profiles ADD COLUMN embedding_next_dna_md5 TEXT;
+    ALTER INDEX idx_profiles_embedding_next RENAME TO idx_profiles_embedding;
+    ALTER INDEX idx_profiles_embedding_next_half RENAME TO idx_profiles_embedding_half;
+    ALTER INDEX idx_profiles_embedding_next_bit RENAME TO idx_profiles_embedding_bit;
+
+    INSERT INTO embedding_config (id, active_model)
+    VALUES (TRUE, model)
+    ON CONFLICT (id) DO UPDATE SET active_model = EXCLUDED.active_model, updated_at = NOW();
+
+    RETURN swapped;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,84 @@
+-- ============================================================================
+-- Build the profile embedding HNSW indexes without blocking writes
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction, so this is a
+-- psql script rather than an RPC. Every statement runs on its own.
+--
+--   psql "$DATABASE_URL" -v target=next -v dims=1536 \
+--        -f supabase/scripts/build_embedding_indexes.sql
+--
+-- target=next     indexes embedding_next before a re-embed swap (see
+--                 supabase/migrations/014_embedding_rollout.sql); the swap
+--                 renames them to the live names.
+-- target=current  rebuilds the live indexes, e.g. after changing HNSW_M /
+--                 HNSW_EF_CONSTRUCTION: each is built as *_new next to the
+--                 old one, then the old one is dropped concurrently and the
+--                 new one renamed, so searches keep an index throughout.
+--
+-- Optional: -v m=16 -v ef_construction=64 (HNSW_M / HNSW_EF_CONSTRUCTION).
+-- Leftover invalid indexes from an interrupted run are dropped first; valid
+-- ones are kept, so the script can be re-run.
+-- ============================================================================
+
+\set ON_ERROR_STOP on
+
+\if :{?m}
+\else
+    \set m 16
+\endif
+\if :{?ef_construction}
+\else
+    \set ef_construction 64
+\endif
+\if :{?target}
+\else
+    \echo 'target is required, e.g. -v target=next'
+    \quit
+\endif
+\if :{?dims}
+\else
+    \echo 'dims is required, e.g. -v dims=1024'
+    \quit
+\endif
+
+SELECT :'target' = 'next' AS is_next, :'target' = 'current' AS is_current \gset
+\if :is_next
+    \set col embedding_next
+    \set idx idx_profiles_embedding_next
+\elif :is_current
+    \set col embedding
+    \set idx idx_profiles_embedding_new
+\else
+    \echo 'unknown target ' :'target' '; expected next or current'
+    \quit
+\endif
+\set idx_half :idx '_half'
+\set idx_bit :idx '_bit'
+
+SELECT format('DROP INDEX CONCURRENTLY %I', c.relname)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE NOT i.indisvalid
+    AND c.relname IN (:'idx', :'idx_half', :'idx_bit')
+\gexec
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS :"idx" ON profiles
+    USING hnsw (:"col" vector_cosine_ops)
+    WITH (m = :m, ef_construction = :ef_construction);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS :"idx_half" ON profiles
+    USING hnsw ((:"col"::halfvec(:dims)) halfvec_cosine_ops)
+    WITH (m = :m, ef_construction = :ef_construction);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS :"idx_bit" ON profiles
+    USING hnsw ((binary_quantize(:"col")::bit(:dims)) bit_hamming_ops)
+    WITH (m = :m, ef_construction = :ef_construction);
+
+\if :is_current
+    DROP INDEX CONCURRENTLY IF EXISTS idx_profiles_embedding;
+    ALTER INDEX idx_profiles_embedding_new RENAME TO idx_profiles_embedding;
+    DROP INDEX CONCURRENTLY IF EXISTS idx_profiles_embedding_half;
+    ALTER INDEX idx_profiles_embedding_new_half RENAME TO idx_profiles_embedding_half;
+    DROP INDEX CONCURRENTLY IF EXISTS idx_profiles_embedding_bit;
+    ALTER INDEX idx_profiles_embedding_new_bit RENAME TO idx_profiles_embedding_bit;
+\endif